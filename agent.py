@@ -0,0 +1,135 @@
+# Remote agent: samples this host the same way the dashboard samples its own
+# and pushes gzip'd batches to /api/ingest. Only needs psutil and requests.
+#
+#   INGEST_TOKEN=... python agent.py --server http://dashboard:5000
+#   python agent.py --server ... --instances 50   # simulate 50 hosts (load test)
+#
+# Samples are buffered in memory (bounded, oldest dropped first) while the
+# server is unreachable and sent in order once it is back.
+import argparse
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from collections import deque
+
+import requests
+
+from collector import RateTracker, sample_metrics
+from hosts import encode_payload
+
+
+class Agent:
+    def __init__(self, server, token, host, batch_size=5, flush_interval=10.0, buffer_size=10000, timeout=10.0):
+        self.url = server.rstrip('/') + '/api/ingest'
+        self.host = host
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self._buffer = deque(maxlen=buffer_size)
+        self._session = requests.Session()
+        self._session.headers.update({
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/json',
+            'Content-Encoding': 'gzip',
+        })
+        self._last_flush = time.monotonic()
+        self._retry_at = 0
+        self._failures = 0
+
+    def add(self, timestamp, data):
+        self._buffer.append({'timestamp': timestamp, 'data': data})
+
+    def due(self, now):
+        if not self._buffer or now < self._retry_at:
+            return False
+        return len(self._buffer) >= self.batch_size or now - self._last_flush >= self.flush_interval
+
+    def flush(self):
+        # Oldest first, in batches; stops at the first failure and keeps
+        # everything unsent for the next attempt
+        while self._buffer:
+            batch = [self._buffer[i] for i in range(min(len(self._buffer), 500))]
+            try:
+                response = self._session.post(self.url, data=encode_payload({'host': self.host, 'samples': batch}),
+                                              timeout=self.timeout)
+            except requests.RequestException as e:
+                self._backoff(f'{e.__class__.__name__}: {e}')
+                return
+            if response.status_code >= 500 or response.status_code in (401, 403, 429):
+                self._backoff(f'HTTP {response.status_code} {response.text[:200]}')
+                return
+            if response.status_code >= 400:
+                # The server will never accept this batch: drop it
+                print(f"[{self.host}] Batch rejected: HTTP {response.status_code} {response.text[:200]}")
+            for _ in batch:
+                self._buffer.popleft()
+            self._failures = 0
+            self._retry_at = 0
+        self._last_flush = time.monotonic()
+
+    def _backoff(self, reason):
+        self._failures += 1
+        delay = min(2 ** self._failures, 300) * random.uniform(0.8, 1.2)
+        self._retry_at = time.monotonic() + delay
+        print(f"[{self.host}] Send failed ({reason}); {len(self._buffer)} samples buffered, retry in {delay:.0f}s")
+
+
+def run(agents, interval, stop):
+    # One sampler feeds every agent (--instances share the real host's data)
+    tracker = RateTracker()
+    next_tick = time.monotonic()
+    while not stop.is_set():
+        try:
+            data = sample_metrics(tracker)
+            timestamp = time.time()
+            for agent in agents:
+                agent.add(timestamp, data)
+        except Exception as e:
+            print(f"Sampling error: {e}")
+        now = time.monotonic()
+        for agent in agents:
+            if agent.due(now):
+                agent.flush()
+        next_tick += interval
+        now = time.monotonic()
+        if next_tick < now:
+            next_tick = now
+        stop.wait(next_tick - now)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Agente remoto de NetDashboard')
+    parser.add_argument('--server', required=True, help='URL del dashboard, ej. http://10.0.0.5:5000')
+    parser.add_argument('--token', default=os.environ.get('INGEST_TOKEN'), help='Por defecto $INGEST_TOKEN')
+    parser.add_argument('--host-id', default=socket.gethostname(), help='Nombre del host en el dashboard')
+    parser.add_argument('--interval', type=float, default=2.0, help='Segundos entre muestras')
+    parser.add_argument('--batch', type=int, default=5, help='Muestras por envio')
+    parser.add_argument('--flush-interval', type=float, default=10.0, help='Envio maximo cada N segundos')
+    parser.add_argument('--buffer', type=int, default=10000, help='Muestras retenidas sin conexion')
+    parser.add_argument('--instances', type=int, default=1, help='Simular N hosts (<host-id>-1..N)')
+    args = parser.parse_args(argv)
+    if not args.token:
+        parser.error('falta --token o INGEST_TOKEN')
+
+    if args.instances > 1:
+        names = [f'{args.host_id}-{i}' for i in range(1, args.instances + 1)]
+    else:
+        names = [args.host_id]
+    agents = [Agent(args.server, args.token, name, args.batch, args.flush_interval, args.buffer) for name in names]
+    print(f"Enviando {len(agents)} host(s) a {args.server} cada {args.interval}s")
+
+    stop = threading.Event()
+    try:
+        run(agents, args.interval, stop)
+    except KeyboardInterrupt:
+        stop.set()
+        for agent in agents:
+            agent.flush()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,249 @@
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+
+from instrumentation import ALERT_SEND_SECONDS, ALERT_SENDS
+
+CHANNELS = ('telegram', 'whatsapp')
+
+# Per-message budget: Telegram counts characters (4096 max), CallMeBot sends
+# the text URL-encoded in a GET, so there the encoded length is what counts
+MESSAGE_LIMITS = {'telegram': 4000, 'whatsapp': 1500}
+
+
+class AlertDeliveryError(Exception):
+    pass
+
+
+def format_alert(rows):
+    if len(rows) == 1:
+        return f"🚨 *{rows[0].title}*\n\n{rows[0].message}\n\n_NetDashboard Alert_"
+    # Burst: one digest message instead of one message per alert
+    lines = '\n'.join(alert_line(row) for row in rows)
+    return f"🚨 *{len(rows)} alertas*\n\n{lines}\n\n_NetDashboard Alert_"
+
+
+def alert_line(row):
+    return f"• *{row.title}*: {row.message}"
+
+
+def message_size(channel, text):
+    return len(urllib.parse.quote(text)) if channel == 'whatsapp' else len(text)
+
+
+def split_digest(rows, channel):
+    # Consecutive chunks whose digest fits the channel's budget, so a burst
+    # becomes several messages instead of one the provider rejects
+    limit = MESSAGE_LIMITS[channel] - message_size(channel, format_alert([]))
+    chunks = [[]]
+    used = 0
+    for row in rows:
+        size = message_size(channel, alert_line(row) + '\n')
+        if chunks[-1] and used + size > limit:
+            chunks.append([])
+            used = 0
+        chunks[-1].append(row)
+        used += size
+    return chunks
+
+
+def fit_message(channel, text):
+    # Last resort for a single alert that alone exceeds the budget
+    limit = MESSAGE_LIMITS[channel]
+    while message_size(channel, text) > limit:
+        text = text[:len(text) * limit // message_size(channel, text) - 1]
+    return text
+
+
+def redact(text, secrets):
+    # requests puts the full URL (bot token, apikey) in its exception text
+    for secret in secrets:
+        if secret:
+            text = text.replace(secret, '***').replace(urllib.parse.quote(secret, safe=''), '***')
+    return text
+
+
+def channel_configured(settings, channel):
+    if channel == 'telegram':
+        return bool(settings.telegram_bot_token and settings.telegram_chat_id)
+    if channel == 'whatsapp':
+        return bool(settings.whatsapp_phone and settings.whatsapp_apikey)
+    return False
+
+
+def send_telegram(base_url, token, chat_id, text, timeout=5):
+    url = f"{base_url}/bot{token}/sendMessage"
+    payload = {
+        'chat_id': chat_id,
+        'text': text,
+        'parse_mode': 'Markdown'
+    }
+    response = requests.post(url, json=payload, timeout=timeout)
+    response.raise_for_status()
+
+
+def send_whatsapp(base_url, phone, apikey, text, timeout=10):
+    # URL Encode the text
+    encoded_text = urllib.parse.quote(text)
+    url = f"{base_url}?phone={phone}&text={encoded_text}&apikey={apikey}"
+    response = requests.get(url, timeout=timeout)
+    response.raise_for_status()
+
+
+def enqueue_alert(users, title, message):
+    # Request path side: only writes outbox rows (committed by the caller).
+    # Delivery happens in AlertWorker.
+    from models import AlertOutbox
+    from extensions import db
+
+    now = datetime.now()
+    for user in users:
+        settings = user.settings
+        if not settings or not settings.notifications_enabled:
+            continue
+        for channel in CHANNELS:
+            if channel_configured(settings, channel):
+                db.session.add(AlertOutbox(user_id=user.id, channel=channel, title=title, message=message,
+                                           created_at=now, next_attempt_at=now))
+
+
+# Drains the AlertOutbox table in the background. Pending rows are grouped
+# per (user, channel) into one digest message, sent over a small thread
+# pool, and retried with exponential backoff when the provider fails.
+class AlertWorker:
+    def __init__(self):
+        self.app = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._last_prune = 0
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['alert_worker'] = self
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='alert-worker', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    self.drain()
+            except Exception as e:
+                print(f"Alert worker error: {e}")
+            self._wake.wait(self.app.config['ALERT_POLL_INTERVAL'])
+            self._wake.clear()
+
+    def drain(self):
+        from models import AlertOutbox, AppSettings
+        from extensions import db
+
+        config = self.app.config
+        now = datetime.now()
+        # Leave very recent rows for the next pass so a burst (e.g. several
+        # services going down in one sweep) lands in the same digest
+        settle = now - timedelta(seconds=config['ALERT_COALESCE_WINDOW'])
+        rows = (AlertOutbox.query
+                .filter(AlertOutbox.status == 'pending', AlertOutbox.next_attempt_at <= now)
+                .order_by(AlertOutbox.id)
+                .limit(config['ALERT_BATCH_SIZE'])
+                .all())
+        groups = defaultdict(list)
+        for row in rows:
+            groups[(row.user_id, row.channel)].append(row)
+        groups = {key: group for key, group in groups.items() if group[0].created_at <= settle or group[0].attempts}
+
+        if groups:
+            settings = {s.user_id: s for s in AppSettings.query.filter(AppSettings.user_id.in_({k[0] for k in groups})).all()}
+            jobs = []
+            for (user_id, channel), group in groups.items():
+                user_settings = settings.get(user_id)
+                if not user_settings or not user_settings.notifications_enabled or not channel_configured(user_settings, channel):
+                    # Channel was disabled after the alert was queued
+                    for row in group:
+                        row.status = 'cancelled'
+                    ALERT_SENDS.labels(channel, 'cancelled').inc(len(group))
+                    continue
+                for chunk in split_digest(group, channel):
+                    jobs.append((chunk, self._send_job(user_settings, channel, fit_message(channel, format_alert(chunk)))))
+
+            with ThreadPoolExecutor(max_workers=config['ALERT_WORKERS'], thread_name_prefix='alert-send') as pool:
+                futures = [(group, pool.submit(job)) for group, job in jobs]
+                for group, future in futures:
+                    error = future.exception()
+                    self._record(group, error)
+            db.session.commit()
+
+        if time.time() - self._last_prune > 3600:
+            self._last_prune = time.time()
+            cutoff = now - timedelta(days=config['ALERT_RETENTION_DAYS'])
+            AlertOutbox.query.filter(AlertOutbox.status != 'pending', AlertOutbox.created_at < cutoff).delete()
+            db.session.commit()
+
+    def _send_job(self, settings, channel, text):
+        # Copy what the sender needs: pool threads never touch ORM objects
+        config = self.app.config
+        if channel == 'telegram':
+            send = send_telegram
+            args = (config['TELEGRAM_API_URL'], settings.telegram_bot_token, settings.telegram_chat_id, text)
+            secrets = (settings.telegram_bot_token,)
+        else:
+            send = send_whatsapp
+            args = (config['CALLMEBOT_API_URL'], settings.whatsapp_phone, settings.whatsapp_apikey, text)
+            secrets = (settings.whatsapp_apikey,)
+
+        def job():
+            with ALERT_SEND_SECONDS.time(channel):
+                try:
+                    send(*args)
+                except Exception as e:
+                    # Only the redacted text leaves the job: it is stored and printed
+                    raise AlertDeliveryError(redact(f'{type(e).__name__}: {e}', secrets)) from None
+        return job
+
+    def _record(self, group, error):
+        config = self.app.config
+        now = datetime.now()
+        for row in group:
+            row.attempts = (row.attempts or 0) + 1
+            if error is None:
+                row.status = 'sent'
+                row.sent_at = now
+                row.last_error = None
+                outcome = 'sent'
+            else:
+                row.last_error = str(error)[:255]
+                if row.attempts >= config['ALERT_MAX_ATTEMPTS']:
+                    row.status = 'failed'
+                    outcome = 'failed'
+                else:
+                    delay = min(config['ALERT_RETRY_BASE'] * 2 ** (row.attempts - 1), config['ALERT_RETRY_MAX'])
+                    row.next_attempt_at = now + timedelta(seconds=delay)
+                    outcome = 'retry'
+            ALERT_SENDS.labels(row.channel, outcome).inc()
+        if error is not None:
+            print(f"Alert delivery error ({group[0].channel}): {error}")
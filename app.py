@@ -1,31 +1,208 @@
 from flask import Flask, render_template, redirect, url_for, flash
-from extensions import db, login_manager
-from models import User
-from routes import main_bp
+from sqlalchemy import event
+from extensions import (db, login_manager, collector, scheduler, latency_monitor, alert_worker, notification_feed,
+                        connection_table, network_scanner, instrumentation, events, cluster, host_inventory, uptime,
+                        http_probe, user_cache, anomaly_detector, process_table)
+from routes import (main_bp, record_metrics_history, record_services_history,
+                    record_ping_history, publish_metrics, publish_ping, publish_service_updates)
 import os
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
-    app.config['SECRET_KEY'] = 'dev_key_secret_123' # En produccion usar variable de entorno
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev_key_secret_123') # En produccion usar variable de entorno
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///db.sqlite3'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['METRICS_INTERVAL'] = float(os.environ.get('METRICS_INTERVAL', 2.0)) # Segundos entre muestras
+    app.config['SERVICE_CHECK_TIMEOUT'] = 5.0 # Timeout por chequeo (s)
+    app.config['SERVICE_CHECK_DEADLINE'] = 20.0 # Tiempo maximo por barrido completo (s)
+    app.config['SERVICE_CHECK_WORKERS'] = 32
+    app.config['SERVICE_CHECK_INTERVAL'] = 60 # Intervalo por defecto entre chequeos (s)
+    app.config['SERVICE_CHECK_JITTER'] = 0.1 # +/-10% para no chequear todo a la vez
+    app.config['SERVICE_CHECK_MAX_BACKOFF'] = 900 # Intervalo maximo para servicios caidos (s)
+    app.config['DNS_CACHE_TTL'] = 300 # Cache de resolucion DNS para chequeos HTTP (s)
+    app.config['HTTP_POOL_SIZE'] = 4 # Conexiones keep-alive inactivas por host
+    app.config['HTTP_IDLE_TIMEOUT'] = 30 # Cerrar conexiones inactivas tras este tiempo (s)
+    app.config['HTTP_MAX_BODY'] = 64 * 1024 # Bytes leidos de la respuesta (busqueda de keyword)
+    app.config['PING_TARGET'] = os.environ.get('PING_TARGET', '8.8.8.8') # Google DNS
+    app.config['PING_INTERVAL'] = 5.0
+    app.config['PING_COUNT'] = 3 # Muestras por medicion (latencia, perdida y jitter)
+    app.config['TELEGRAM_API_URL'] = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org')
+    app.config['CALLMEBOT_API_URL'] = os.environ.get('CALLMEBOT_API_URL', 'https://api.callmebot.com/whatsapp.php')
+    app.config['ALERT_POLL_INTERVAL'] = 2.0 # Revision de la cola de alertas (s)
+    app.config['ALERT_COALESCE_WINDOW'] = 3.0 # Alertas dentro de esta ventana se agrupan en un solo mensaje (s)
+    app.config['ALERT_WORKERS'] = 4
+    app.config['ALERT_BATCH_SIZE'] = 500
+    app.config['ALERT_MAX_ATTEMPTS'] = 6
+    app.config['ALERT_RETRY_BASE'] = 10 # Primer reintento (s), luego se duplica
+    app.config['ALERT_RETRY_MAX'] = 1800
+    app.config['ALERT_RETENTION_DAYS'] = 7
+    app.config['NOTIFICATION_DEDUP_WINDOW'] = 300 # No repetir la misma alerta en 5 min (s)
+    app.config['NOTIFICATION_RETENTION_DAYS'] = 30 # Notificaciones leidas
+    app.config['NOTIFICATION_MAX_AGE_DAYS'] = 90 # Todas las notificaciones
+    app.config['NOTIFICATION_COMPACT_INTERVAL'] = 3600
+    app.config['CONNECTIONS_CACHE_TTL'] = 2.0 # Reutilizar la tabla de conexiones (s)
+    app.config['PROCESS_REFRESH_INTERVAL'] = 2.0 # Relectura minima de la tabla de procesos (s)
+    app.config['PROCESS_TOP_MAX'] = 100 # Maximo de procesos por consulta
+    app.config['SCAN_SUBNET'] = os.environ.get('SCAN_SUBNET') # Ej. 192.168.1.0/24; vacio = redes locales
+    app.config['SCAN_WINDOW'] = 64 # Sondas en curso a la vez; cada una que termina da paso a la siguiente
+    app.config['SCAN_TIMEOUT'] = 0.5 # Espera por host (s)
+    app.config['SCAN_PORT'] = 80 # Puerto TCP si no hay ICMP
+    app.config['SCAN_TTL'] = 600 # No volver a sondear dispositivos vistos hace menos (s)
+    app.config['SCAN_MAX_HOSTS'] = 1024
+    app.config['USER_CACHE_TTL'] = 60 # Usuario y ajustes en memoria por request autenticada (s)
+    app.config['RULES_RELOAD_INTERVAL'] = 10 # Releer reglas de alerta cambiadas en otro worker (s)
+    app.config['RULES_RECORD_FILE'] = os.environ.get('RULES_RECORD_FILE') # NDJSON de muestras para `python rules.py`
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN') # Token Bearer para /metrics (opcional)
+    app.config['INGEST_TOKEN'] = os.environ.get('INGEST_TOKEN') # Token de los agentes remotos; vacio = ingesta deshabilitada
+    app.config['INGEST_MAX_BYTES'] = 8 * 1024 * 1024 # Tamano maximo de un lote (descomprimido)
+    app.config['INGEST_MAX_SAMPLES'] = 1000 # Muestras por lote
+    app.config['HOST_STALE_AFTER'] = 30 # Host "offline" si no reporta en este tiempo (s)
+    app.config['HOST_SAMPLE_RETENTION_HOURS'] = 24
+    app.config['HOST_PRUNE_INTERVAL'] = 600 # (s)
+    app.config['CHECK_RESULT_RETENTION_HOURS'] = 48 # Resultados individuales de chequeos
+    app.config['CHECK_ROLLUP_RETENTION_DAYS'] = 90 # Resumen por hora (uptime, media, p95)
+    app.config['BACKGROUND_JOBS'] = True # Desactivar para pruebas/benchmarks que arrancan los hilos a mano
+    app.config['CLUSTER_MODE'] = os.environ.get('NETDASH_CLUSTER') == '1' # Varios workers (gunicorn), ver wsgi.py
+    app.config['SHARED_STATE_FILE'] = 'shared-state.mmap' # En la carpeta instance/
+    app.config['SHARED_SLOT_SIZE'] = 1 << 20 # Bytes por tipo de dato compartido
+    app.config['LEADER_LOCK_FILE'] = 'leader.lock'
+    app.config['LEADER_RETRY_INTERVAL'] = 2.0 # Reintento de liderazgo si el lider muere (s)
+    app.config['CLUSTER_POLL_INTERVAL'] = 0.25 # Lectura de la memoria compartida (s)
+    app.config['SQLITE_BUSY_TIMEOUT'] = 15.0 # Espera por el bloqueo de escritura (s)
+    app.config['SQLITE_CACHE_KB'] = 16384 # Cache de paginas por conexion
+    app.config['SQLITE_MMAP_SIZE'] = 64 * 1024 * 1024
+    app.config['DB_POOL_SIZE'] = 10 # Conexiones por proceso
+    app.config['DB_MAX_OVERFLOW'] = 20
+    if config:
+        app.config.update(config)
+
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if uri.startswith('sqlite:///') and ':memory:' not in uri:
+        app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {
+            'pool_size': app.config['DB_POOL_SIZE'],
+            'max_overflow': app.config['DB_MAX_OVERFLOW'],
+            'pool_timeout': 30,
+            'connect_args': {'timeout': app.config['SQLITE_BUSY_TIMEOUT'], 'check_same_thread': False},
+        })
 
     db.init_app(app)
+    instrumentation.init_app(app)
+    cluster.init_app(app)
     login_manager.init_app(app)
     login_manager.login_view = 'main.login'
+    user_cache.init_app(app)
+
+    collector.init_app(app)
+    collector.add_listener(record_metrics_history)
+    collector.add_listener(anomaly_detector.on_metrics)
+    collector.add_listener(publish_metrics)
+    collector.add_listener(cluster.share_snapshot)
+    scheduler.init_app(app)
+    http_probe.init_app(app)
+    scheduler.add_listener(record_services_history)
+    scheduler.add_listener(publish_service_updates)
+    scheduler.add_listener(anomaly_detector.on_services)
+    latency_monitor.init_app(app)
+    latency_monitor.add_listener(record_ping_history)
+    latency_monitor.add_listener(publish_ping)
+    alert_worker.init_app(app)
+    notification_feed.init_app(app)
+    connection_table.init_app(app)
+    process_table.init_app(app)
+    collector.add_listener(process_table.on_snapshot)
+    network_scanner.init_app(app)
+    host_inventory.init_app(app)
+    uptime.init_app(app)
+    anomaly_detector.init_app(app)
+    events.add_listener(cluster.share_event)
+    # Non-leader workers rebuild their in-memory history from shared data
+    cluster.add_listener('metrics', record_metrics_history)
+    cluster.add_listener('services', record_services_history)
+    cluster.add_listener('ping', record_ping_history)
 
     app.register_blueprint(main_bp)
 
+    # Started lazily so the reloader's parent process never samples
+    if app.config['BACKGROUND_JOBS']:
+        app.before_request(start_background_jobs)
+
     with app.app_context():
-        db.create_all()
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', sqlite_pragmas(app.config))
+        with cluster.exclusive('schema'):
+            db.create_all()
+            upgrade_schema()
+            anomaly_detector.seed_defaults()
 
     return app
 
+def start_background_jobs():
+    # In cluster mode only the elected worker runs the jobs
+    cluster.start(start_jobs)
+
+def start_jobs():
+    collector.start()
+    scheduler.start()
+    latency_monitor.start()
+    alert_worker.start()
+    notification_feed.start()
+
+def sqlite_pragmas(config):
+    # WAL lets every worker read while one writer commits; busy_timeout makes
+    # writers queue for the lock instead of failing with "database is locked"
+    pragmas = [
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT'] * 1000)}",
+        f"PRAGMA cache_size=-{int(config['SQLITE_CACHE_KB'])}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+        'PRAGMA temp_store=MEMORY',
+    ]
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+    return set_pragmas
+
+def upgrade_schema():
+    # create_all() only creates missing tables; add columns and indexes
+    # introduced after an existing table was created (SQLite supports ADD COLUMN)
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column.type.compile(db.engine.dialect)}'
+            default = column.default.arg if column.default is not None and column.default.is_scalar else None
+            if isinstance(default, bool):
+                ddl += f' DEFAULT {int(default)}'
+            elif isinstance(default, (int, float)):
+                ddl += f' DEFAULT {default}'
+            elif isinstance(default, str):
+                ddl += " DEFAULT '{}'".format(default.replace("'", "''"))
+            db.session.execute(db.text(ddl))
+        db.session.commit()
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(db.engine)
+    db.session.commit()
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
-
-app = create_app()
+    # Cached snapshot (user + settings); no query on a hit
+    return user_cache.get(int(user_id))
 
 if __name__ == '__main__':
+    # Built here and in wsgi.py, never at import: importing create_app (bench.py,
+    # rules.py) must not touch instance/db.sqlite3
+    app = create_app()
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        # Reloader child: start checking before the first browser connects
+        start_background_jobs()
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,458 @@
+# Load and latency benchmark for the dashboard API.
+#
+#   python bench.py                      # full suite, writes bench-results.json
+#   python bench.py --quick              # short run
+#   python bench.py --compare old.json   # flag p95 regressions against a previous run
+#
+# The app is built with create_app() against a throwaway SQLite database,
+# host metrics come from an in-process fake psutil and HTTP services point at
+# a local stub server, so runs are reproducible and never touch the real host
+# or network. Simulated dashboard clients hit a real threaded WSGI server.
+import argparse
+import collections
+import json
+import logging
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from werkzeug.serving import make_server
+
+import collector as collector_module
+import connections as connections_module
+
+# Requests a dashboard tab makes, weighted by how often it makes them
+ENDPOINTS = {
+    'metrics': ('GET', '/api/metrics', 10),
+    'notifications': ('GET', '/api/notifications', 4),
+    'services': ('GET', '/api/services', 2),
+    'connections': ('GET', '/api/connections?per_page=50', 1),
+    'login': ('POST', '/login', 0.5),
+}
+
+BENCH_USER = ('bench', 'bench-password')
+
+
+# --- Fake psutil --------------------------------------------------------------
+
+snetio = collections.namedtuple('snetio', ['bytes_sent', 'bytes_recv', 'packets_sent', 'packets_recv',
+                                           'errin', 'errout', 'dropin', 'dropout'])
+snicstats = collections.namedtuple('snicstats', ['isup', 'duplex', 'speed', 'mtu', 'flags'])
+snicaddr = collections.namedtuple('snicaddr', ['family', 'address', 'netmask', 'broadcast', 'ptp'])
+svmem = collections.namedtuple('svmem', ['total', 'available', 'percent', 'used', 'free'])
+sdiskusage = collections.namedtuple('sdiskusage', ['total', 'used', 'free', 'percent'])
+addr = collections.namedtuple('addr', ['ip', 'port'])
+sconn = collections.namedtuple('sconn', ['fd', 'family', 'type', 'laddr', 'raddr', 'status', 'pid'])
+
+
+class FakeProcess:
+    def __init__(self, pid):
+        if pid > FakePsutil.max_pid:
+            raise FakePsutil.NoSuchProcess(pid)
+        self.pid = pid
+
+    def create_time(self):
+        return 1700000000.0 + self.pid
+
+    def name(self):
+        return f'proc-{self.pid % 50}'
+
+    def username(self):
+        return 'bench'
+
+    @contextmanager
+    def oneshot(self):
+        yield
+
+
+# Just the subset of the psutil API the collector and connection table use.
+# Counters grow deterministically so rates and ETags behave like a live host.
+class FakePsutil:
+    AF_INET = socket.AF_INET
+    max_pid = 500
+
+    class Error(Exception):
+        pass
+
+    class NoSuchProcess(Error):
+        pass
+
+    class ZombieProcess(NoSuchProcess):
+        pass
+
+    class AccessDenied(Error):
+        pass
+
+    Process = FakeProcess
+
+    def __init__(self, interfaces=4, connections=100, seed=0):
+        self.interfaces = interfaces
+        self.connections = connections
+        self._random = random.Random(seed)
+        self._started = time.monotonic()
+
+    def cpu_percent(self, interval=None):
+        return round(self._random.uniform(5, 60), 1)
+
+    def virtual_memory(self):
+        return svmem(16 * 2 ** 30, 8 * 2 ** 30, 50.0, 8 * 2 ** 30, 8 * 2 ** 30)
+
+    def disk_usage(self, path):
+        return sdiskusage(500 * 2 ** 30, 200 * 2 ** 30, 300 * 2 ** 30, 40.0)
+
+    def _counters(self, index):
+        elapsed = time.monotonic() - self._started
+        base = int(elapsed * 125000 * (index + 1))
+        return snetio(base, base * 3, base // 1000, base // 400, 0, 0, int(elapsed) // 60, 0)
+
+    def net_io_counters(self, pernic=False):
+        per_nic = {f'eth{i}': self._counters(i) for i in range(self.interfaces)}
+        if pernic:
+            return per_nic
+        return snetio(*(sum(values) for values in zip(*per_nic.values())))
+
+    def net_if_stats(self):
+        return {f'eth{i}': snicstats(True, 2, 1000, 1500, 'up') for i in range(self.interfaces)}
+
+    def net_if_addrs(self):
+        return {f'eth{i}': [snicaddr(socket.AF_INET, f'10.0.{i}.2', '255.255.255.0', None, None)]
+                for i in range(self.interfaces)}
+
+    def net_connections(self, kind='inet'):
+        rows = []
+        for i in range(self.connections):
+            status = 'ESTABLISHED' if i % 4 else 'TIME_WAIT'
+            rows.append(sconn(i + 10, socket.AF_INET, socket.SOCK_STREAM, addr('10.0.0.2', 40000 + i % 20000),
+                              addr(f'93.184.{i // 256 % 256}.{i % 256}', 443), status, i % (self.max_pid + 50) or None))
+        return rows
+
+
+def install_fake_psutil(fake):
+    # The collector and connection modules look psutil up at call time
+    collector_module.psutil = fake
+    connections_module.psutil = fake
+    connections_module.process_cache._entries.clear()
+
+
+# --- Stub HTTP targets --------------------------------------------------------
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        # /delay/<ms> answers after a pause, anything else right away
+        if self.path.startswith('/delay/'):
+            time.sleep(int(self.path.rsplit('/', 1)[1]) / 1000.0)
+        body = b'ok'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+# --- Data set -----------------------------------------------------------------
+
+def seed_user(app):
+    from extensions import db
+    from models import User
+    with app.app_context():
+        if not User.query.filter_by(username=BENCH_USER[0]).first():
+            user = User(username=BENCH_USER[0])
+            user.set_password(BENCH_USER[1])
+            db.session.add(user)
+            db.session.commit()
+
+
+def seed_services(app, count, stub_url):
+    from extensions import db, scheduler
+    from models import MonitoredService
+    with app.app_context():
+        for service in MonitoredService.query.all():
+            scheduler.remove(service.id)
+        MonitoredService.query.delete()
+        rng = random.Random(count)
+        services = [MonitoredService(name=f'bench-{i}', url=f'{stub_url}/delay/{rng.randint(1, 30)}', type='http',
+                                     check_interval=30) for i in range(count)]
+        db.session.add_all(services)
+        db.session.commit()
+        for service in services:
+            scheduler.schedule(service.id)
+
+
+def seed_notifications(app, count):
+    from extensions import db, notification_feed
+    from models import Notification
+    with app.app_context():
+        Notification.query.delete()
+        db.session.commit()
+        rows = [{'title': f'Bench {i % 20}', 'message': f'Notificacion de prueba {i}', 'type': 'info',
+                 'timestamp': datetime.now(), 'read': i % 3 == 0} for i in range(count)]
+        for i in range(0, len(rows), 5000):
+            db.session.execute(Notification.__table__.insert(), rows[i:i + 5000])
+        db.session.commit()
+        notification_feed.resync()
+
+
+# --- Load generation ----------------------------------------------------------
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    # Nearest-rank
+    index = max(0, min(len(sorted_values) - 1, math.ceil(q / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, errors, duration):
+    latencies = sorted(samples)
+    return {
+        'count': len(latencies),
+        'errors': errors,
+        'throughput': round(len(latencies) / duration, 2),
+        'mean_ms': round(sum(latencies) / len(latencies), 3) if latencies else None,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'max_ms': latencies[-1] if latencies else None,
+    }
+
+
+def login(session, base_url):
+    return session.post(base_url + '/login', data={'username': BENCH_USER[0], 'password': BENCH_USER[1]},
+                        allow_redirects=False)
+
+
+def client_loop(index, base_url, ready, stop, results, errors):
+    rng = random.Random(index)
+    names = list(ENDPOINTS)
+    weights = [ENDPOINTS[name][2] for name in names]
+    session = requests.Session()
+    login(session, base_url)
+    # Password hashing is slow: log everyone in before the clock starts
+    ready.wait()
+    while not stop.is_set():
+        name = rng.choices(names, weights)[0]
+        method, path, _ = ENDPOINTS[name]
+        started = time.perf_counter()
+        try:
+            if name == 'login':
+                # Fresh session so the dashboard session stays logged in
+                with requests.Session() as other:
+                    response = login(other, base_url)
+                ok = response.status_code == 302
+            else:
+                response = session.request(method, base_url + path, allow_redirects=False)
+                ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        elapsed = round((time.perf_counter() - started) * 1000, 3)
+        if ok:
+            results[name].append(elapsed)
+        else:
+            errors[name] += 1
+
+
+def run_load(base_url, clients, duration):
+    results = collections.defaultdict(list)
+    errors = collections.Counter()
+    stop = threading.Event()
+    ready = threading.Barrier(clients + 1)
+    threads = [threading.Thread(target=client_loop, args=(i, base_url, ready, stop, results, errors), daemon=True)
+               for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    endpoints = {name: summarize(results[name], errors[name], duration) for name in ENDPOINTS}
+    return {
+        'requests': sum(e['count'] for e in endpoints.values()),
+        'errors': sum(errors.values()),
+        'throughput': round(sum(e['count'] for e in endpoints.values()) / duration, 2),
+        'endpoints': endpoints,
+    }
+
+
+# --- Suite --------------------------------------------------------------------
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except Exception:
+        return None
+
+
+def run_suite(args):
+    from app import create_app
+    from extensions import collector, scheduler
+
+    workdir = tempfile.mkdtemp(prefix='netdash-bench-')
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(workdir, 'bench.sqlite3'),
+        'BACKGROUND_JOBS': False,
+        'METRICS_INTERVAL': 1.0,
+        'SERVICE_CHECK_TIMEOUT': 2.0,
+    })
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    fake = FakePsutil(connections=args.base_connections, seed=args.seed)
+    install_fake_psutil(fake)
+    seed_user(app)
+
+    stub = start_server(ThreadingHTTPServer(('127.0.0.1', 0), StubHandler))
+    stub_url = f'http://127.0.0.1:{stub.server_port}'
+    server = start_server(make_server('127.0.0.1', 0, app, threaded=True))
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    collector.start()
+    scheduler.start()
+
+    # (dimension, values): one curve per dimension, the others at baseline
+    curves = [
+        ('clients', args.clients),
+        ('services', args.services),
+        ('connections', args.connections),
+        ('notifications', args.notifications),
+    ]
+    baseline = {
+        'clients': args.base_clients,
+        'services': args.base_services,
+        'connections': args.base_connections,
+        'notifications': args.base_notifications,
+    }
+
+    scenarios = []
+    try:
+        for dimension, values in curves:
+            for value in values:
+                params = dict(baseline, **{dimension: value})
+                seed_services(app, params['services'], stub_url)
+                seed_notifications(app, params['notifications'])
+                fake.connections = params['connections']
+                # Let the collector publish a snapshot of the new data set
+                time.sleep(args.warmup)
+                result = run_load(base_url, params['clients'], args.duration)
+                result.update({'name': f'{dimension}={value}', 'dimension': dimension, 'value': value,
+                               'params': params, 'duration': args.duration})
+                scenarios.append(result)
+                print_scenario(result)
+    finally:
+        collector.stop()
+        scheduler.stop()
+        server.shutdown()
+        stub.shutdown()
+
+    return {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'args': vars(args),
+        },
+        'scenarios': scenarios,
+    }
+
+
+def print_scenario(result):
+    print(f"\n{result['name']}: {result['throughput']} req/s, {result['errors']} errores")
+    print(f"  {'endpoint':<14}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'err':>6}")
+    for name, stats in result['endpoints'].items():
+        if not stats['count'] and not stats['errors']:
+            continue
+        print(f"  {name:<14}{stats['throughput']:>9}{_ms(stats['p50_ms'])}{_ms(stats['p95_ms'])}"
+              f"{_ms(stats['p99_ms'])}{stats['errors']:>6}")
+
+
+def _ms(value):
+    return f'{value:>9.1f}' if value is not None else f'{"-":>9}'
+
+
+def compare(previous, current, threshold):
+    # Scenario/endpoint pairs whose p95 got worse by more than `threshold`
+    before = {(s['name'], name): stats for s in previous['scenarios'] for name, stats in s['endpoints'].items()}
+    regressions = []
+    for scenario in current['scenarios']:
+        for name, stats in scenario['endpoints'].items():
+            old = before.get((scenario['name'], name))
+            if not old or not old['p95_ms'] or not stats['p95_ms']:
+                continue
+            change = stats['p95_ms'] / old['p95_ms'] - 1
+            if change > threshold:
+                regressions.append((scenario['name'], name, old['p95_ms'], stats['p95_ms'], change))
+    return regressions
+
+
+def int_list(value):
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark de carga y latencia de la API del dashboard')
+    parser.add_argument('--clients', type=int_list, default=[1, 4, 16, 32], help='Curva de clientes concurrentes')
+    parser.add_argument('--services', type=int_list, default=[0, 50, 200, 500])
+    parser.add_argument('--connections', type=int_list, default=[100, 1000, 10000])
+    parser.add_argument('--notifications', type=int_list, default=[0, 1000, 10000, 100000])
+    parser.add_argument('--base-clients', type=int, default=8)
+    parser.add_argument('--base-services', type=int, default=20)
+    parser.add_argument('--base-connections', type=int, default=200)
+    parser.add_argument('--base-notifications', type=int, default=500)
+    parser.add_argument('--duration', type=float, default=10.0, help='Segundos por escenario')
+    parser.add_argument('--warmup', type=float, default=1.5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench-results.json')
+    parser.add_argument('--compare', help='Resultados anteriores para detectar regresiones')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Empeoramiento de p95 tolerado (0.2 = 20%%)')
+    parser.add_argument('--quick', action='store_true', help='Curvas cortas de 2 s por escenario')
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.clients, args.services, args.connections, args.notifications = [1, 8], [0, 50], [100, 2000], [0, 5000]
+        args.duration, args.warmup = 2.0, 1.0
+
+    results = run_suite(args)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResultados guardados en {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        regressions = compare(previous, results, args.threshold)
+        for scenario, endpoint, old, new, change in regressions:
+            print(f"REGRESION {scenario} {endpoint}: p95 {old:.1f} -> {new:.1f} ms (+{change:.0%})")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import prober
+from httpprobe import HttpProbe, parse_status_codes, status_matches
+from instrumentation import SERVICE_CHECK_SECONDS, SERVICE_CHECKS
+
+# Plain data in and out: worker threads never touch ORM objects or the session.
+# timings: HTTP phase breakdown in ms (dns, connect, tls, ttfb), None for ping
+CheckTarget = namedtuple('CheckTarget', ['id', 'type', 'url', 'timeout', 'method', 'expected_status', 'keyword'],
+                         defaults=('HEAD', '200-299', None))
+CheckResult = namedtuple('CheckResult', ['id', 'status', 'response_time', 'error', 'timings'], defaults=(None,))
+
+# Used when the caller does not pass the app's configured engine
+default_probe = HttpProbe()
+
+
+def check_pings(targets, count=3):
+    # Every ping target of the sweep goes through one multiplexed probe
+    # instead of forking a `ping` process per service
+    timeout = max(target.timeout for target in targets)
+    with SERVICE_CHECK_SECONDS.time('ping'):
+        probed = prober.probe([target.url for target in targets], count=count, timeout=timeout)
+    results = {}
+    for target in targets:
+        result = probed[target.url]
+        if result.received:
+            results[target.id] = CheckResult(target.id, 'Up', round(result.rtt_avg, 2), None)
+        else:
+            results[target.id] = CheckResult(target.id, 'Down', 0, result.error)
+        SERVICE_CHECKS.labels('ping', results[target.id].status).inc()
+    return results
+
+
+def check_http(target, engine):
+    expected = parse_status_codes(target.expected_status or '200-299')
+    result = engine.probe(target.url, method=target.method or 'HEAD', timeout=target.timeout,
+                          read_body=bool(target.keyword))
+    timings = {'dns': result.dns, 'connect': result.connect, 'tls': result.tls, 'ttfb': result.ttfb}
+    # Time to the response headers, as before: handshakes plus first byte
+    response_time = round(result.dns + result.connect + result.tls + result.ttfb, 2)
+    error = None
+    if not status_matches(expected, result.status_code):
+        error = f'HTTP {result.status_code}'
+    elif target.keyword and target.keyword.encode('utf-8') not in result.body:
+        error = f'Keyword not found: {target.keyword}'
+    return CheckResult(target.id, 'Down' if error else 'Up', response_time, error, timings)
+
+
+def check_one(target, engine):
+    started = time.perf_counter()
+    try:
+        result = check_http(target, engine)
+    except Exception as e:
+        result = CheckResult(target.id, 'Down', 0, str(e))
+    SERVICE_CHECK_SECONDS.labels(target.type).observe(time.perf_counter() - started)
+    SERVICE_CHECKS.labels(target.type, result.status).inc()
+    return result
+
+
+def run_checks(targets, max_workers=32, deadline=20.0, engine=None):
+    # Fan the checks out over a bounded pool. The sweep as a whole is capped
+    # by `deadline`; anything still running by then is reported as Down so
+    # one hung host cannot hold the caller hostage.
+    results = {}
+    if not targets:
+        return results
+
+    ping_targets = [target for target in targets if target.type == 'ping']
+    http_targets = [target for target in targets if target.type != 'ping']
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(http_targets) + 1)), thread_name_prefix='service-check')
+    try:
+        engine = engine or default_probe
+        futures = {executor.submit(check_one, target, engine): [target] for target in http_targets}
+        if ping_targets:
+            futures[executor.submit(check_pings, ping_targets)] = ping_targets
+        done, pending = wait(futures, timeout=deadline)
+        for future in done:
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {target.id: CheckResult(target.id, 'Down', 0, str(e)) for target in futures[future]}
+            if isinstance(result, CheckResult):
+                results[result.id] = result
+            else:
+                results.update(result)
+        for future in pending:
+            for target in futures[future]:
+                results[target.id] = CheckResult(target.id, 'Down', 0, 'deadline exceeded')
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return results
@@ -0,0 +1,293 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process mode only
+    fcntl = None
+
+from collector import Snapshot
+
+# Per-slot header: sequence (odd while a write is in progress), payload
+# length and the pid of the writing process
+HEADER = struct.Struct('<QII')
+SEQ = struct.Struct('<Q')
+
+SLOTS = ('snapshot', 'ping', 'services', 'notifications', 'users', 'processes')
+
+
+# Fixed-size slots in one memory-mapped file shared by every worker. Each
+# slot is a seqlock: the writer bumps the sequence to odd, writes, then bumps
+# it to even; readers retry if the sequence was odd or moved while copying.
+# Checking for a new version is a single 8-byte read.
+class SharedMemory:
+    def __init__(self, path, slots=SLOTS, slot_size=1 << 20):
+        self.slot_size = slot_size
+        self._offsets = {name: i * slot_size for i, name in enumerate(slots)}
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = slot_size * len(slots)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._mm = mmap.mmap(self._fd, size)
+        self._lock = threading.Lock()
+
+    def version(self, name):
+        return SEQ.unpack_from(self._mm, self._offsets[name])[0]
+
+    def read(self, name, retries=1000):
+        # Returns (seq, writer pid, payload bytes) or None if no consistent
+        # copy could be taken (a writer kept the slot busy)
+        offset = self._offsets[name]
+        for _ in range(retries):
+            seq, length, pid = HEADER.unpack_from(self._mm, offset)
+            if seq & 1 or length > self.slot_size - HEADER.size:
+                time.sleep(0)
+                continue
+            start = offset + HEADER.size
+            data = self._mm[start:start + length]
+            if SEQ.unpack_from(self._mm, offset)[0] == seq:
+                return seq, pid, data
+        return None
+
+    def write(self, name, data):
+        if len(data) > self.slot_size - HEADER.size:
+            raise ValueError(f'{name}: {len(data)} bytes does not fit in a {self.slot_size} byte slot')
+        offset = self._offsets[name]
+        # Record locks exclude other processes, the mutex other threads
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, self.slot_size, offset)
+            try:
+                seq = SEQ.unpack_from(self._mm, offset)[0]
+                if seq & 1:
+                    # A writer died mid-write; start from the next even value
+                    seq += 1
+                SEQ.pack_into(self._mm, offset, seq + 1)
+                start = offset + HEADER.size
+                self._mm[start:start + len(data)] = data
+                HEADER.pack_into(self._mm, offset, seq + 1, len(data), os.getpid())
+                SEQ.pack_into(self._mm, offset, seq + 2)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self.slot_size, offset)
+
+
+def encode_snapshot(snapshot):
+    header = json.dumps({'seq': snapshot.seq, 'timestamp': snapshot.timestamp, 'etags': snapshot.etags})
+    return header.encode('utf-8') + b'\n' + snapshot.body
+
+
+def decode_snapshot(data):
+    header, body = data.split(b'\n', 1)
+    header = json.loads(header)
+    return Snapshot(header['seq'], header['timestamp'], json.loads(body), body, header['etags'])
+
+
+# Multi-worker mode (gunicorn). Workers race for an exclusive file lock: the
+# winner runs the background jobs (sampling, checks, alerts) and publishes
+# its results to shared memory; every other worker serves requests from
+# there and keeps retrying the lock so a replacement takes over if the
+# leader dies. Without CLUSTER_MODE (or without fcntl) the process simply
+# runs the jobs itself.
+class Cluster:
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.is_leader = False
+        self.shared = None
+        self._listeners = {}
+        self._on_leader = None
+        self._lock_fd = None
+        self._versions = {}
+        self._snapshot = None
+        self._ping = None
+        self._checked = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['cluster'] = self
+        self.enabled = bool(app.config['CLUSTER_MODE'])
+        if self.enabled and fcntl is None:
+            print("CLUSTER_MODE requiere fcntl (Linux/macOS); se ejecuta en modo de un solo proceso")
+            self.enabled = False
+        if self.enabled:
+            os.makedirs(app.instance_path, exist_ok=True)
+            self.shared = SharedMemory(os.path.join(app.instance_path, app.config['SHARED_STATE_FILE']),
+                                       slot_size=app.config['SHARED_SLOT_SIZE'])
+
+    @contextmanager
+    def exclusive(self, name):
+        # Cross-process critical section (e.g. schema setup while several
+        # workers boot at once); a no-op in single-process mode
+        if not self.enabled:
+            yield
+            return
+        fd = os.open(os.path.join(self.app.instance_path, f'{name}.lock'), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def add_listener(self, kind, listener):
+        # Followers feed mirrored data to these, with the same arguments the
+        # leader's own listeners get: 'metrics' (Snapshot), 'ping' (result)
+        # and 'services' (services whose check completed)
+        listeners = self._listeners.setdefault(kind, [])
+        if listener not in listeners:
+            listeners.append(listener)
+
+    def start(self, on_leader):
+        if not self.enabled:
+            on_leader()
+            return
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._on_leader = on_leader
+            self._stop.clear()
+            self._try_lead()
+            self._thread = threading.Thread(target=self._run, name='cluster-mirror', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def _try_lead(self):
+        from extensions import collector, latency_monitor
+
+        path = os.path.join(self.app.instance_path, self.app.config['LEADER_LOCK_FILE'])
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            collector.set_source(self.snapshot)
+            latency_monitor.set_source(self.ping)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._lock_fd = fd
+        self.is_leader = True
+        collector.set_source(None)
+        latency_monitor.set_source(None)
+        print(f"Worker {os.getpid()} es el lider: muestreo, chequeos y alertas")
+        self._on_leader()
+        return True
+
+    def _run(self):
+        interval = self.app.config['CLUSTER_POLL_INTERVAL']
+        retry = self.app.config['LEADER_RETRY_INTERVAL']
+        last_attempt = time.monotonic()
+        while not self._stop.wait(interval):
+            try:
+                if not self.is_leader and time.monotonic() - last_attempt >= retry:
+                    last_attempt = time.monotonic()
+                    self._try_lead()
+                self._mirror()
+            except Exception as e:
+                print(f"Cluster error: {e}")
+
+    # --- Leader side (listeners) ---
+
+    def share_snapshot(self, snapshot):
+        if self.enabled and self.is_leader:
+            self.shared.write('snapshot', encode_snapshot(snapshot))
+
+    def share_processes(self, processes):
+        if self.enabled and self.is_leader:
+            self.shared.write('processes', json.dumps(processes, separators=(',', ':')).encode('utf-8'))
+
+    def share_event(self, event, payload):
+        # Any worker: services/notifications change on API writes too
+        if self.enabled and event in SLOTS:
+            self.shared.write(event, json.dumps(payload).encode('utf-8'))
+
+    # --- Follower side ---
+
+    def snapshot(self):
+        # Cheap version check on every call; decoded once per new snapshot
+        version = self.shared.version('snapshot')
+        cached = self._snapshot
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        read = self.shared.read('snapshot')
+        if read is None or not read[2]:
+            return cached[1] if cached else None
+        snapshot = decode_snapshot(read[2])
+        self._snapshot = (read[0], snapshot)
+        return snapshot
+
+    def ping(self):
+        return self._ping
+
+    def _mirror(self):
+        from extensions import events, scheduler, notification_feed, user_cache, process_table
+
+        for name in SLOTS:
+            version = self.shared.version(name)
+            if version == self._versions.get(name):
+                continue
+            read = self.shared.read(name)
+            if read is None:
+                continue
+            seq, pid, data = read
+            self._versions[name] = seq
+            if pid == os.getpid() or not data:
+                continue
+
+            if name == 'snapshot':
+                if self.is_leader:
+                    continue
+                snapshot = decode_snapshot(data)
+                self._snapshot = (seq, snapshot)
+                events.publish('metrics', snapshot.data, propagate=False)
+                self._notify('metrics', snapshot)
+                continue
+            if name == 'processes':
+                if not self.is_leader:
+                    process_table.load(json.loads(data))
+                continue
+            if name == 'users':
+                # Settings changed through another worker; only the latest
+                # write survives in the slot, so drop every cached user
+                user_cache.clear()
+                continue
+
+            payload = json.loads(data)
+            events.publish(name, payload, propagate=False)
+            if name == 'ping':
+                self._ping = payload
+                self._notify('ping', payload)
+            elif name == 'services':
+                checked = [SimpleNamespace(**s) for s in payload
+                           if s['last_checked'] and self._checked.get(s['id']) != s['last_checked']]
+                self._checked = {s['id']: s['last_checked'] for s in payload}
+                with self.app.app_context():
+                    if self.is_leader:
+                        # Services added/removed through another worker
+                        scheduler.sync()
+                    else:
+                        self._notify('services', checked)
+            elif name == 'notifications':
+                with self.app.app_context():
+                    notification_feed.resync()
+
+    def _notify(self, kind, argument):
+        for listener in self._listeners.get(kind, []):
+            try:
+                listener(argument)
+            except Exception as e:
+                print(f"Cluster listener error: {e}")
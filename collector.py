@@ -0,0 +1,288 @@
+import hashlib
+import json
+import socket
+import threading
+import time
+from collections import namedtuple
+
+import psutil
+
+from connections import process_cache
+from instrumentation import COLLECTOR_SAMPLE_SECONDS, timed_call
+
+# Immutable view of one sampling pass. `body` is the pre-encoded JSON served
+# by /api/metrics, so readers never touch psutil or re-serialize; `etags`
+# holds a digest per section for conditional requests.
+Snapshot = namedtuple('Snapshot', ['seq', 'timestamp', 'data', 'body', 'etags'])
+
+# Sections selectable with /api/metrics?fields=
+METRIC_FIELDS = ('cpu', 'memory', 'disk', 'total', 'interfaces', 'connections')
+
+COUNTERS = ('bytes_sent', 'bytes_recv', 'packets_sent', 'packets_recv', 'errin', 'errout', 'dropin', 'dropout')
+
+
+def counter_delta(previous, current):
+    # psutil already folds most 32-bit wraps (nowrap=True); a decrease that
+    # still gets here is either a wrap it missed or a reset (interface
+    # re-created, driver reload). A reset has no meaningful delta.
+    if current >= previous:
+        return current - previous
+    if previous < 2 ** 32:
+        wrapped = current + 2 ** 32 - previous
+        if wrapped < 2 ** 31:
+            return wrapped
+    return None
+
+
+# Per-second rates of the interface counters, from monotonic timestamps so
+# clock adjustments and a slow or backgrounded client never skew them.
+class RateTracker:
+    def __init__(self):
+        self._previous = {}
+
+    def update(self, counters, now):
+        # counters: {key: psutil snetio}. Returns {key: rates or None}
+        rates = {}
+        for key, current in counters.items():
+            previous = self._previous.get(key)
+            rates[key] = None
+            if previous is not None and now > previous[0]:
+                elapsed = now - previous[0]
+                rates[key] = {}
+                for name in COUNTERS:
+                    delta = counter_delta(getattr(previous[1], name), getattr(current, name))
+                    rates[key][name] = round(delta / elapsed, 2) if delta is not None else None
+        # Forget interfaces that went away
+        self._previous = {key: (now, current) for key, current in counters.items()}
+        return rates
+
+
+def sample_metrics(tracker=None):
+    # System Metrics (Keep them as summary)
+    cpu_percent = timed_call('cpu_percent', psutil.cpu_percent, interval=None)
+    memory = timed_call('virtual_memory', psutil.virtual_memory)
+    disk = timed_call('disk_usage', psutil.disk_usage, '/')
+
+    # 1. Per-Interface Traffic
+    net_io_per_nic = timed_call('net_io_counters', psutil.net_io_counters, pernic=True)
+    net_io_total = timed_call('net_io_counters', psutil.net_io_counters)
+    sampled = time.monotonic()
+    rates = tracker.update(dict(net_io_per_nic, **{'': net_io_total}), sampled) if tracker else {}
+    net_if_stats = timed_call('net_if_stats', psutil.net_if_stats)
+    net_if_addrs = timed_call('net_if_addrs', psutil.net_if_addrs)
+
+    interfaces_data = {}
+    for nic, stats in net_io_per_nic.items():
+        if_info = net_if_stats.get(nic)
+        if_addr = net_if_addrs.get(nic)
+
+        # Only show interfaces that are UP to reduce clutter
+        if if_info and if_info.isup:
+            ip_address = "N/A"
+            if if_addr:
+                for addr in if_addr:
+                    if addr.family == socket.AF_INET:
+                        ip_address = addr.address
+                        break
+
+            interfaces_data[nic] = {
+                'bytes_sent': stats.bytes_sent,
+                'bytes_recv': stats.bytes_recv,
+                'rates': rates.get(nic),
+                'is_up': if_info.isup,
+                'speed': if_info.speed,
+                'ip': ip_address
+            }
+
+    # 2. Active Connections (summary; the full table is served by /api/connections)
+    # Process names come from the shared (pid, create_time) cache
+    connections = []
+    try:
+        # Requires permissions on some OS, handles errors gracefully
+        conns = timed_call('net_connections', psutil.net_connections, kind='inet')
+        established_conns = [c for c in conns if c.status == 'ESTABLISHED']
+
+        for c in established_conns[:15]:
+            process_name = process_cache.name(c.pid)
+            connections.append({
+                'fd': c.fd,
+                'family': c.family,
+                'type': c.type,
+                'laddr': f"{c.laddr.ip}:{c.laddr.port}" if c.laddr else "N/A",
+                'raddr': f"{c.raddr.ip}:{c.raddr.port}" if c.raddr else "N/A",
+                'status': c.status,
+                'pid': c.pid,
+                'process': process_name
+            })
+    except Exception as e:
+        print(f"Error getting connections: {e}")
+
+    return {
+        'cpu': cpu_percent,
+        'memory': {
+            'total': memory.total,
+            'percent': memory.percent,
+            'used': memory.used
+        },
+        'disk': {
+            'percent': disk.percent,
+            'free': disk.free
+        },
+        'network': {
+            'total': {
+                'bytes_sent': net_io_total.bytes_sent,
+                'bytes_recv': net_io_total.bytes_recv,
+                'rates': rates.get('')
+            },
+            'interfaces': interfaces_data,
+            'connections': connections
+        }
+    }
+
+
+def _digest(value):
+    return hashlib.blake2b(json.dumps(value, sort_keys=True).encode('utf-8'), digest_size=8).hexdigest()
+
+
+def section_etags(data):
+    network = data['network']
+    etags = {
+        'cpu': _digest(data['cpu']),
+        'memory': _digest(data['memory']),
+        'disk': _digest(data['disk']),
+        'total': _digest(network['total']),
+        'connections': _digest(network['connections']),
+    }
+    for nic, info in network['interfaces'].items():
+        etags['iface:' + nic] = _digest(info)
+    etags['*'] = select_metrics(data, etags)[1]
+    return etags
+
+
+def select_metrics(data, etags, fields=None, interfaces=None):
+    # Returns (payload, etag) with only the requested sections. The ETag is
+    # derived from the section digests, so it changes only when something
+    # the client asked for changed.
+    fields = set(fields or METRIC_FIELDS)
+    network = data['network']
+    nics = [nic for nic in network['interfaces'] if not interfaces or nic in interfaces]
+
+    parts = [f'{name}={etags[name]}' for name in METRIC_FIELDS if name in fields and name != 'interfaces']
+    if 'interfaces' in fields:
+        parts += [f'iface:{nic}={etags["iface:" + nic]}' for nic in nics]
+    etag = hashlib.blake2b('&'.join(parts).encode('utf-8'), digest_size=8).hexdigest()
+
+    payload = {name: data[name] for name in ('cpu', 'memory', 'disk') if name in fields}
+    selected = {}
+    if 'total' in fields:
+        selected['total'] = network['total']
+    if 'interfaces' in fields:
+        selected['interfaces'] = {nic: network['interfaces'][nic] for nic in nics}
+    if 'connections' in fields:
+        selected['connections'] = network['connections']
+    if selected:
+        payload['network'] = selected
+    return payload, etag
+
+
+# Samples the host on a fixed cadence in a single background thread and
+# publishes the result as an immutable Snapshot, so the cost of monitoring
+# does not depend on how many dashboards are open.
+class MetricsCollector:
+    def __init__(self, interval=2.0):
+        self.interval = interval
+        self.app = None
+        self._snapshot = None
+        self._seq = 0
+        self._listeners = []
+        self._rates = RateTracker()
+        self._source = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config.get('METRICS_INTERVAL', self.interval)
+        app.extensions['metrics_collector'] = self
+
+    def add_listener(self, listener):
+        # Listeners run in the collector thread, inside an app context,
+        # once per published snapshot.
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            # First cpu_percent() call only primes psutil's internal counters
+            psutil.cpu_percent(interval=None)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='metrics-collector', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+        self._thread = None
+
+    def set_source(self, source):
+        # Worker processes that do not sample read snapshots from `source`
+        # (shared memory) instead; None restores local sampling
+        self._source = source
+
+    def snapshot(self):
+        if self._source is not None:
+            snapshot = self._source()
+            if snapshot is not None:
+                return snapshot
+        snapshot = self._snapshot
+        if snapshot is None:
+            # Nothing published yet (collector just started): take one
+            # sample inline so the very first request still gets data.
+            with self._lock:
+                if self._snapshot is None:
+                    self._publish(self._sample())
+                snapshot = self._snapshot
+        return snapshot
+
+    def _sample(self):
+        with COLLECTOR_SAMPLE_SECONDS.time():
+            return sample_metrics(self._rates)
+
+    def _publish(self, data):
+        self._seq += 1
+        snapshot = Snapshot(self._seq, time.time(), data, json.dumps(data).encode('utf-8'), section_etags(data))
+        self._snapshot = snapshot
+        return snapshot
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                with self._lock:
+                    snapshot = self._publish(self._sample())
+                self._notify(snapshot)
+            except Exception as e:
+                print(f"Collector error: {e}")
+            # Fixed cadence: schedule from the previous deadline, not from
+            # the end of this pass, and skip ticks we already missed.
+            next_tick += self.interval
+            now = time.monotonic()
+            if next_tick < now:
+                next_tick = now
+            self._stop.wait(next_tick - now)
+
+    def _notify(self, snapshot):
+        if not self._listeners:
+            return
+        with self.app.app_context():
+            for listener in self._listeners:
+                try:
+                    listener(snapshot)
+                except Exception as e:
+                    print(f"Collector listener error: {e}")
@@ -0,0 +1,290 @@
+import ipaddress
+import os
+import socket
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import psutil
+
+from instrumentation import PSUTIL_SECONDS, timed_call
+
+# /proc/net/tcp state codes
+TCP_STATES = {
+    '01': 'ESTABLISHED', '02': 'SYN_SENT', '03': 'SYN_RECV', '04': 'FIN_WAIT1',
+    '05': 'FIN_WAIT2', '06': 'TIME_WAIT', '07': 'CLOSE', '08': 'CLOSE_WAIT',
+    '09': 'LAST_ACK', '0A': 'LISTEN', '0B': 'CLOSING',
+}
+
+SORT_KEYS = {
+    'process': lambda c: (c['process'] or '').lower(),
+    'pid': lambda c: c['pid'] or 0,
+    'status': lambda c: c['status'],
+    'lport': lambda c: c['lport'] or 0,
+    'rport': lambda c: c['rport'] or 0,
+    'raddr': lambda c: c['raddr'] or '',
+}
+
+
+# PID -> process info, keyed on (pid, create_time) so a recycled PID is never
+# reported under the previous owner's name. Entries are re-validated at most
+# every `revalidate` seconds, expire after `ttl` and are evicted LRU beyond
+# `max_size`.
+class ProcessCache:
+    def __init__(self, max_size=4096, ttl=300, revalidate=10):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.revalidate = revalidate
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, pid):
+        if not pid:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(pid)
+            if entry and now - entry['checked'] < self.revalidate and now - entry['loaded'] < self.ttl:
+                self._entries.move_to_end(pid)
+                return entry['info']
+        try:
+            with PSUTIL_SECONDS.time('process'):
+                process = psutil.Process(pid)
+                create_time = process.create_time()
+                if entry and entry['key'] == (pid, create_time) and now - entry['loaded'] < self.ttl:
+                    info = entry['info']
+                    loaded = entry['loaded']
+                else:
+                    with process.oneshot():
+                        info = {'name': process.name(), 'username': _safe(process.username)}
+                    loaded = now
+        except (psutil.NoSuchProcess, psutil.ZombieProcess):
+            with self._lock:
+                self._entries.pop(pid, None)
+            return None
+        except psutil.AccessDenied:
+            return None
+        with self._lock:
+            self._entries[pid] = {'key': (pid, create_time), 'info': info, 'loaded': loaded, 'checked': now}
+            self._entries.move_to_end(pid)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return info
+
+    def name(self, pid, default="Unknown/System"):
+        info = self.lookup(pid)
+        return info['name'] if info else default
+
+
+def _safe(getter):
+    try:
+        return getter()
+    except (psutil.AccessDenied, psutil.NoSuchProcess, KeyError):
+        return None
+
+
+process_cache = ProcessCache()
+
+
+def _hex_ipv4(value):
+    return socket.inet_ntop(socket.AF_INET, bytes.fromhex(value)[::-1])
+
+
+def _hex_ipv6(value):
+    # Four 32-bit words, each in host (little-endian) order
+    raw = bytes.fromhex(value)
+    return socket.inet_ntop(socket.AF_INET6, b''.join(raw[i:i + 4][::-1] for i in range(0, 16, 4)))
+
+
+def read_proc_net(families=('tcp', 'tcp6', 'udp', 'udp6')):
+    # Linux fast path: the kernel's socket tables, read directly. Rows carry
+    # the socket inode but no pid/process; see ConnectionTable for those.
+    rows = []
+    for name in families:
+        path = f'/proc/net/{name}'
+        decode = _hex_ipv6 if name.endswith('6') else _hex_ipv4
+        family = socket.AF_INET6 if name.endswith('6') else socket.AF_INET
+        proto = name.rstrip('6')
+        try:
+            with open(path) as f:
+                next(f)
+                for line in f:
+                    fields = line.split()
+                    local, remote, state, inode = fields[1], fields[2], fields[3], int(fields[9])
+                    lip, lport = local.split(':')
+                    rip, rport = remote.split(':')
+                    rport = int(rport, 16)
+                    rows.append({
+                        'family': family,
+                        'proto': proto,
+                        'laddr': decode(lip),
+                        'lport': int(lport, 16),
+                        'raddr': decode(rip) if rport else None,
+                        'rport': rport or None,
+                        # UDP has no connection state; psutil reports NONE
+                        'status': TCP_STATES.get(state, state) if proto == 'tcp' else 'NONE',
+                        'inode': inode,
+                        'pid': None,
+                        'process': None,
+                    })
+        except FileNotFoundError:
+            continue
+    return rows
+
+
+def socket_owners():
+    # socket inode -> pid from the /proc/<pid>/fd links, the same walk psutil
+    # does for net_connections(); processes we may not inspect are skipped
+    owners = {}
+    with PSUTIL_SECONDS.time('socket_owners'):
+        for pid in os.listdir('/proc'):
+            if not pid.isdigit():
+                continue
+            fd_dir = f'/proc/{pid}/fd'
+            try:
+                fds = os.listdir(fd_dir)
+            except (FileNotFoundError, PermissionError, ProcessLookupError):
+                continue
+            for fd in fds:
+                try:
+                    link = os.readlink(f'{fd_dir}/{fd}')
+                except (FileNotFoundError, PermissionError, ProcessLookupError):
+                    continue
+                if link.startswith('socket:['):
+                    owners[int(link[8:-1])] = int(pid)
+    return owners
+
+
+def read_psutil(resolve=True):
+    rows = []
+    for c in timed_call('net_connections', psutil.net_connections, kind='inet'):
+        rows.append({
+            'family': c.family,
+            'proto': 'tcp' if c.type == socket.SOCK_STREAM else 'udp',
+            'laddr': c.laddr.ip if c.laddr else None,
+            'lport': c.laddr.port if c.laddr else None,
+            'raddr': c.raddr.ip if c.raddr else None,
+            'rport': c.raddr.port if c.raddr else None,
+            'status': c.status,
+            'pid': c.pid,
+            'process': process_cache.name(c.pid) if resolve else None,
+        })
+    return rows
+
+
+def proc_net_available():
+    return os.path.exists('/proc/net/tcp')
+
+
+# Server-side view over the full TCP and UDP socket table: filter, sort,
+# paginate and aggregate. Raw tables are cached for `ttl` seconds so paging
+# through results, or several tabs asking at once, costs a single read.
+# On Linux the table comes from /proc/net and PIDs from an inode -> pid map
+# that is only rebuilt (one /proc/<pid>/fd walk) when a socket shows up
+# that the map has not seen; long-lived sockets never pay for it again.
+# psutil is the fallback where /proc/net is missing.
+class ConnectionTable:
+    def __init__(self, ttl=2.0):
+        self.ttl = ttl
+        self._cache = {}
+        self._owners = {}
+        self._unowned = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl = app.config.get('CONNECTIONS_CACHE_TTL', self.ttl)
+        app.extensions['connection_table'] = self
+
+    def rows(self, with_process):
+        source = 'proc' if proc_net_available() else 'psutil'
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get((source, with_process))
+            if cached and now - cached[0] < self.ttl:
+                return source, cached[1]
+            if source == 'psutil':
+                rows = read_psutil(resolve=with_process)
+            else:
+                rows = read_proc_net()
+                if with_process:
+                    self._resolve(rows)
+            self._cache[(source, with_process)] = (now, rows)
+            return source, rows
+
+    def _resolve(self, rows):
+        inodes = {row['inode'] for row in rows if row['inode']}
+        if not inodes <= self._owners.keys() | self._unowned:
+            owners = socket_owners()
+            # Only sockets still open are kept, so the map stays bounded;
+            # ones we cannot attribute (other users' processes without
+            # root) are remembered so they do not force a walk every read
+            self._owners = {inode: owners[inode] for inode in inodes if inode in owners}
+            self._unowned = inodes - self._owners.keys()
+        for row in rows:
+            pid = self._owners.get(row['inode'])
+            row['pid'] = pid
+            row['process'] = process_cache.name(pid)
+
+    def query(self, state=None, process=None, port=None, cidr=None, sort=None, descending=False,
+              page=1, per_page=50, group=None, with_process=True, top=20, proto=None):
+        needs_process = with_process or bool(process) or sort in ('process', 'pid') or group == 'process'
+        source, rows = self.rows(needs_process)
+
+        if proto not in (None, 'tcp', 'udp'):
+            raise ValueError("proto must be tcp or udp")
+        states = {s.strip().upper() for s in state.split(',')} if state else None
+        network = ipaddress.ip_network(cidr, strict=False) if cidr else None
+        process = process.lower() if process else None
+
+        matched = []
+        for row in rows:
+            if proto and row['proto'] != proto:
+                continue
+            if states and row['status'] not in states:
+                continue
+            if port and port not in (row['lport'], row['rport']):
+                continue
+            if process and process not in (row['process'] or '').lower():
+                continue
+            if network:
+                if not row['raddr']:
+                    continue
+                address = ipaddress.ip_address(row['raddr'])
+                if address.version == 6 and address.ipv4_mapped:
+                    address = address.ipv4_mapped
+                if address.version != network.version or address not in network:
+                    continue
+            matched.append(row)
+
+        result = {
+            'source': source,
+            'total': len(matched),
+            'by_state': dict(Counter(row['status'] for row in matched)),
+        }
+        if group in ('process', 'remote'):
+            key = 'process' if group == 'process' else 'raddr'
+            counts = Counter(row[key] for row in matched if row[key])
+            result['groups'] = [{'key': k, 'count': n} for k, n in counts.most_common(top)]
+            return result
+
+        if sort in SORT_KEYS:
+            matched.sort(key=SORT_KEYS[sort], reverse=descending)
+        per_page = max(1, min(per_page, 500))
+        page = max(1, page)
+        result.update({
+            'page': page,
+            'per_page': per_page,
+            'items': [_format(row) for row in matched[(page - 1) * per_page:page * per_page]],
+        })
+        return result
+
+
+def _format(row):
+    return {
+        'proto': row['proto'],
+        'laddr': f"{row['laddr']}:{row['lport']}" if row['laddr'] else "N/A",
+        'raddr': f"{row['raddr']}:{row['rport']}" if row['raddr'] else "N/A",
+        'status': row['status'],
+        'pid': row['pid'],
+        'process': row['process'],
+    }
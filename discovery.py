@@ -0,0 +1,235 @@
+import ipaddress
+import itertools
+import re
+import socket
+import subprocess
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+
+import psutil
+
+import prober
+
+
+def _usable(ip):
+    # Filter out multicast/broadcast
+    return not ip.startswith('224.') and not ip.startswith('239.') and ip != '255.255.255.255'
+
+
+def read_proc_arp(path='/proc/net/arp'):
+    # IP address  HW type  Flags  HW address  Mask  Device
+    entries = {}
+    with open(path) as f:
+        next(f)
+        for line in f:
+            fields = line.split()
+            if len(fields) < 6:
+                continue
+            ip, flags, mac, device = fields[0], int(fields[2], 16), fields[3], fields[5]
+            # Flag 0x2 = complete entry; incomplete ones have no MAC yet
+            if flags & 0x2 and mac != '00:00:00:00:00:00' and _usable(ip):
+                entries[ip] = {'mac': mac, 'interface': device}
+    return entries
+
+
+def read_arp_command():
+    # Fallback for systems without /proc (Windows `arp -a` layout)
+    # Interface: 192.168.1.10 --- 0x12
+    #   Internet Address      Physical Address      Type
+    #   192.168.1.1           00-11-22-33-44-55     dynamic
+    output = subprocess.check_output(['arp', '-a'], timeout=10).decode('utf-8', errors='ignore')
+    entries = {}
+    current_interface = ""
+    for line in output.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('Interface:'):
+            current_interface = line.split()[1]
+            continue
+        parts = line.split()
+        if len(parts) >= 2 and re.match(r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$", parts[0]) and _usable(parts[0]):
+            entries[parts[0]] = {'mac': parts[1], 'interface': current_interface}
+    return entries
+
+
+def read_arp_table():
+    try:
+        return read_proc_arp()
+    except FileNotFoundError:
+        try:
+            return read_arp_command()
+        except Exception as e:
+            print(f"Scan error: {e}")
+            return {}
+
+
+def local_subnets(max_prefix=22):
+    # IPv4 networks of the interfaces that are up, excluding loopback.
+    # Anything larger than /max_prefix is narrowed around our own address
+    # so an odd netmask never turns into a sweep of millions of hosts.
+    stats = psutil.net_if_stats()
+    subnets = []
+    for nic, addrs in psutil.net_if_addrs().items():
+        if not stats.get(nic) or not stats[nic].isup:
+            continue
+        for addr in addrs:
+            if addr.family != socket.AF_INET or not addr.netmask or addr.address.startswith('127.'):
+                continue
+            network = ipaddress.ip_network(f'{addr.address}/{addr.netmask}', strict=False)
+            if network.prefixlen < max_prefix:
+                network = ipaddress.ip_network(f'{addr.address}/{max_prefix}', strict=False)
+            subnets.append((network, nic))
+    return subnets
+
+
+def probe_host(host, timeout, tcp_port):
+    return host, prober.probe([host], count=1, timeout=timeout, tcp_port=tcp_port)[host]
+
+
+def sweep(hosts, window=64, timeout=0.5, tcp_port=80, flush_every=0.25):
+    # Sliding window: up to `window` probes in flight, the next host starts
+    # as soon as any probe finishes. Live hosts are yielded in small batches
+    # (at most every `flush_every` seconds) so callers can stream them
+    # without one commit per host.
+    hosts = iter(hosts)
+    pool = ThreadPoolExecutor(max_workers=window, thread_name_prefix='scan')
+    try:
+        pending = {pool.submit(probe_host, host, timeout, tcp_port) for host in itertools.islice(hosts, window)}
+        alive = []
+        flushed = time.monotonic()
+        while pending:
+            done, pending = wait(pending, timeout=flush_every, return_when=FIRST_COMPLETED)
+            for future in done:
+                host, result = future.result()
+                if result.received:
+                    alive.append((host, result))
+                for host in itertools.islice(hosts, 1):
+                    pending.add(pool.submit(probe_host, host, timeout, tcp_port))
+            if alive and (not pending or time.monotonic() - flushed >= flush_every):
+                yield alive
+                alive = []
+                flushed = time.monotonic()
+    finally:
+        # A client that stops reading abandons the hosts not started yet
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def device_to_dict(device, source):
+    return {
+        'ip': device.ip,
+        'mac': device.mac or 'N/A',
+        'interface': device.interface or '',
+        'first_seen': device.first_seen.isoformat() if device.first_seen else None,
+        'last_seen': device.last_seen.isoformat() if device.last_seen else None,
+        'source': source,
+    }
+
+
+# Subnet discovery backed by the Device inventory. A scan reports the kernel
+# neighbour table first, then sweeps the configured (or local) subnets with
+# the multiplexed prober, skipping hosts seen within SCAN_TTL so repeated
+# scans only probe what is unknown or stale. Results are yielded as they
+# arrive so the route can stream them.
+class NetworkScanner:
+    def __init__(self):
+        self.app = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['network_scanner'] = self
+
+    def subnets(self):
+        configured = self.app.config.get('SCAN_SUBNET')
+        if configured:
+            return [(ipaddress.ip_network(s.strip(), strict=False), None) for s in configured.split(',') if s.strip()]
+        return local_subnets()
+
+    def targets(self):
+        limit = self.app.config['SCAN_MAX_HOSTS']
+        hosts = {}
+        for network, nic in self.subnets():
+            for address in network.hosts():
+                if len(hosts) >= limit:
+                    return hosts
+                hosts.setdefault(str(address), nic)
+        return hosts
+
+    def devices(self):
+        from models import Device
+        return [device_to_dict(d, 'cache') for d in Device.query.order_by(Device.last_seen.desc()).all()]
+
+    def scan(self, full=False):
+        # Only one sweep at a time; a concurrent request gets the inventory
+        if not self._lock.acquire(blocking=False):
+            yield from self.devices()
+            return
+        try:
+            yield from self._scan(full)
+        finally:
+            self._lock.release()
+
+    def _scan(self, full):
+        from models import Device
+
+        config = self.app.config
+        now = datetime.now()
+        fresh_after = now - timedelta(seconds=config['SCAN_TTL'])
+        reported = set()
+
+        arp = read_arp_table()
+        if arp:
+            for device in self._upsert(arp, now, 'arp'):
+                reported.add(device['ip'])
+                yield device
+
+        targets = self.targets()
+        if not full:
+            for device in Device.query.filter(Device.last_seen >= fresh_after).all():
+                targets.pop(device.ip, None)
+                if device.ip not in reported:
+                    reported.add(device.ip)
+                    yield device_to_dict(device, 'cache')
+        for ip in reported:
+            targets.pop(ip, None)
+
+        for alive in sweep(targets, window=config['SCAN_WINDOW'], timeout=config['SCAN_TIMEOUT'],
+                           tcp_port=config['SCAN_PORT']):
+            if not alive:
+                continue
+            entries = {host: {'interface': targets.get(host)} for host, result in alive}
+            yield from self._upsert(entries, datetime.now(), 'probe')
+
+        # Probing makes the kernel resolve neighbours, so hosts that ignored
+        # the probe itself (filtered ports, no ICMP) still show up here with
+        # their MAC address
+        if targets:
+            late = {ip: entry for ip, entry in read_arp_table().items() if ip not in arp}
+            yield from self._upsert(late, datetime.now(), 'arp')
+
+    def _upsert(self, entries, seen, source):
+        # Returns device dicts built before the commit, which would expire
+        # the rows and cost one SELECT per device to read them back
+        from models import Device
+        from extensions import db
+
+        if not entries:
+            return []
+        existing = {d.ip: d for d in Device.query.filter(Device.ip.in_(list(entries))).all()}
+        devices = []
+        for ip, entry in entries.items():
+            device = existing.get(ip)
+            if device is None:
+                device = Device(ip=ip, first_seen=seen)
+                db.session.add(device)
+            if entry.get('mac'):
+                device.mac = entry['mac']
+            if entry.get('interface'):
+                device.interface = entry['interface']
+            device.last_seen = seen
+            devices.append(device_to_dict(device, source))
+        db.session.commit()
+        return devices
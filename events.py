@@ -0,0 +1,89 @@
+import json
+import threading
+
+
+# In-process pub/sub for the dashboard event stream. Only the latest payload
+# of each event type is kept: a slow subscriber skips intermediate states
+# and catches up with the current one instead of queueing a backlog.
+class EventHub:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._latest = {}
+        self._listeners = []
+
+    def add_listener(self, listener):
+        # Called with (event, payload) after each publish, e.g. to share it
+        # with other worker processes
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def publish(self, event, payload, propagate=True):
+        with self._cond:
+            self._seq += 1
+            self._latest[event] = (self._seq, payload)
+            self._cond.notify_all()
+        if propagate:
+            for listener in self._listeners:
+                try:
+                    listener(event, payload)
+                except Exception as e:
+                    print(f"Event listener error: {e}")
+
+    def has(self, event):
+        return event in self._latest
+
+    def wait(self, since, timeout=15.0):
+        # Returns [(seq, event, payload)] newer than `since`, blocking up to
+        # `timeout` seconds when there is nothing new yet.
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > since, timeout=timeout)
+            return sorted((seq, event, payload) for event, (seq, payload) in self._latest.items() if seq > since)
+
+
+# Per-connection memory of what was already sent, so each event only carries
+# what changed for that client.
+class StreamState:
+    def __init__(self):
+        self.interfaces = {}
+        self.connections = None
+        self.services = {}
+        self.last = {}
+
+    def diff(self, event, payload):
+        if event == 'metrics':
+            return self._diff_metrics(payload)
+        if event == 'services':
+            return self._diff_services(payload)
+        # Other events are small: send them only when they changed
+        if self.last.get(event) == payload:
+            return None
+        self.last[event] = payload
+        return payload
+
+    def _diff_metrics(self, data):
+        network = data['network']
+        interfaces = {nic: info for nic, info in network['interfaces'].items() if self.interfaces.get(nic) != info}
+        removed = [nic for nic in self.interfaces if nic not in network['interfaces']]
+        self.interfaces = dict(network['interfaces'])
+
+        delta = {key: value for key, value in data.items() if key != 'network'}
+        delta['network'] = {'total': network['total'], 'interfaces': interfaces, 'removed': removed}
+        if network['connections'] != self.connections:
+            self.connections = network['connections']
+            delta['network']['connections'] = network['connections']
+        return delta
+
+    def _diff_services(self, services):
+        current = {service['id']: service for service in services}
+        changed = [service for sid, service in current.items() if self.services.get(sid) != service]
+        removed = [sid for sid in self.services if sid not in current]
+        self.services = current
+        if not changed and not removed and self.last.get('services') is not None:
+            return None
+        self.last['services'] = True
+        return {'changed': changed, 'removed': removed}
+
+
+def format_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
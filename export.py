@@ -0,0 +1,68 @@
+import csv
+import io
+import json
+import zlib
+
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+# Rows fetched per round trip; the result is walked with yield_per, so an
+# export never holds more than one batch in memory
+BATCH_SIZE = 2000
+
+# Encoded text is compressed in chunks of about this size
+CHUNK_SIZE = 64 * 1024
+
+
+def encode_rows(columns, rows, fmt):
+    # Yields text chunks of roughly CHUNK_SIZE: one CSV header line (or
+    # nothing for NDJSON) followed by the rows
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.writer(buffer, lineterminator='\n')
+        writer.writerow(columns)
+        write = writer.writerow
+    else:
+        def write(row):
+            buffer.write(json.dumps(dict(zip(columns, row)), separators=(',', ':'), default=str))
+            buffer.write('\n')
+    for row in rows:
+        write(row)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_chunks(chunks, level=6):
+    # Streaming gzip (wbits 31 = gzip header and trailer): memory stays at
+    # the compressor's window however many chunks go through
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def query_rows(statement):
+    # Server-side cursor: rows come from SQLite in BATCH_SIZE batches as the
+    # response is written, never as one list
+    from extensions import db
+
+    result = db.session.execute(statement.execution_options(yield_per=BATCH_SIZE))
+    for partition in result.partitions():
+        yield from partition
+
+
+def history_rows(store, names, start, end):
+    # In-memory series at the finest resolution that still reaches `start`;
+    # each series is bounded by its ring size
+    for name in names:
+        found = store.query(name, start, end, max_points=float('inf'))
+        if found is None:
+            continue
+        resolution, points = found
+        for timestamp, low, avg, high, last in points:
+            yield name, resolution, timestamp, low, avg, high, last
@@ -1,5 +1,39 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
+from collector import MetricsCollector
+from scheduler import CheckScheduler
+from timeseries import TimeSeriesStore
+from latency import LatencyMonitor
+from events import EventHub
+from alerts import AlertWorker
+from notifications import NotificationFeed
+from connections import ConnectionTable
+from discovery import NetworkScanner
+from instrumentation import Instrumentation
+from cluster import Cluster
+from hosts import HostInventory
+from uptime import UptimeTracker
+from httpprobe import HttpProbe
+from usercache import UserCache
+from rules import AnomalyDetector
+from processes import ProcessTable
 
 db = SQLAlchemy()
 login_manager = LoginManager()
+collector = MetricsCollector()
+scheduler = CheckScheduler()
+history = TimeSeriesStore()
+latency_monitor = LatencyMonitor()
+events = EventHub()
+alert_worker = AlertWorker()
+notification_feed = NotificationFeed()
+connection_table = ConnectionTable()
+network_scanner = NetworkScanner()
+instrumentation = Instrumentation()
+cluster = Cluster()
+host_inventory = HostInventory()
+uptime = UptimeTracker()
+http_probe = HttpProbe()
+user_cache = UserCache()
+anomaly_detector = AnomalyDetector()
+process_table = ProcessTable()
@@ -0,0 +1,21 @@
+import multiprocessing
+import os
+
+bind = os.environ.get('NETDASH_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('NETDASH_WORKERS', multiprocessing.cpu_count()))
+# Threaded workers: every open dashboard keeps one /api/stream request (and
+# so one thread) busy
+worker_class = 'gthread'
+threads = int(os.environ.get('NETDASH_THREADS', 16))
+timeout = 60
+keepalive = 5
+# Each worker builds its own app after the fork; nothing is started in the
+# master process
+preload_app = False
+
+
+def post_worker_init(worker):
+    # Run the leader election at boot so sampling and checks start without
+    # waiting for the first request
+    from app import start_background_jobs
+    start_background_jobs()
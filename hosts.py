@@ -0,0 +1,233 @@
+import gzip
+import json
+import math
+import re
+import threading
+import time
+import zlib
+from datetime import datetime
+
+HOST_NAME = re.compile(r'^[A-Za-z0-9._-]{1,100}$')
+
+
+class IngestError(ValueError):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def decode_payload(body, encoding, max_bytes):
+    # Agents send gzip'd JSON; the decompressed size is capped so a small
+    # malicious body cannot expand into gigabytes
+    if encoding == 'gzip':
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            body = decompressor.decompress(body, max_bytes + 1)
+        except zlib.error as e:
+            raise IngestError(f'Invalid gzip body: {e}')
+        if len(body) > max_bytes or decompressor.unconsumed_tail:
+            raise IngestError('Payload too large', 413)
+    elif encoding not in (None, '', 'identity'):
+        raise IngestError(f'Unsupported Content-Encoding: {encoding}', 415)
+    try:
+        payload = json.loads(body)
+    except ValueError as e:
+        raise IngestError(f'Invalid JSON: {e}')
+    if not isinstance(payload, dict) or not HOST_NAME.match(str(payload.get('host', ''))):
+        raise IngestError('Missing or invalid host')
+    if not isinstance(payload.get('samples'), list):
+        raise IngestError('Missing samples')
+    return payload
+
+
+def encode_payload(payload):
+    return gzip.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+
+
+def lookup(data, *path):
+    value = data
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            raise IngestError(f"Malformed sample: missing {'.'.join(path)}")
+        value = value[key]
+    return value
+
+
+def number(value, field, optional=False):
+    # Agent values end up in Float columns and charts: finite numbers only
+    if value is None and optional:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise IngestError(f'Malformed sample: {field} must be a number')
+    try:
+        value = float(value)
+    except ValueError:
+        raise IngestError(f'Malformed sample: {field} must be a number')
+    if not math.isfinite(value):
+        raise IngestError(f'Malformed sample: {field} must be a finite number')
+    return value
+
+
+def sample_row(sample, now):
+    # Flatten one agent sample into the columns used for per-host charts;
+    # IngestError on anything malformed. Timestamps from the future (clock
+    # skew) are clamped to the receive time.
+    data = sample['data']
+    total = lookup(data, 'network', 'total')
+    if not isinstance(total, dict):
+        raise IngestError('Malformed sample: network.total must be an object')
+    rates = total.get('rates') or {}
+    if not isinstance(rates, dict):
+        raise IngestError('Malformed sample: network.total.rates must be an object')
+    return {
+        'timestamp': min(number(sample['timestamp'], 'timestamp'), now),
+        'cpu': number(lookup(data, 'cpu'), 'cpu'),
+        'memory': number(lookup(data, 'memory', 'percent'), 'memory.percent'),
+        'disk': number(lookup(data, 'disk', 'percent'), 'disk.percent'),
+        'net_tx': number(rates.get('bytes_sent'), 'bytes_sent', optional=True),
+        'net_rx': number(rates.get('bytes_recv'), 'bytes_recv', optional=True),
+    }
+
+
+def host_to_dict(host, stale_after, now=None):
+    now = now or datetime.now()
+    sample = json.loads(host.last_sample) if host.last_sample else None
+    summary = None
+    if sample:
+        rates = sample['network']['total'].get('rates') or {}
+        summary = {
+            'cpu': sample['cpu'],
+            'memory': sample['memory']['percent'],
+            'disk': sample['disk']['percent'],
+            'net_tx': rates.get('bytes_sent'),
+            'net_rx': rates.get('bytes_recv'),
+        }
+    return {
+        'name': host.name,
+        'address': host.address,
+        'first_seen': host.first_seen.isoformat() if host.first_seen else None,
+        'last_seen': host.last_seen.isoformat() if host.last_seen else None,
+        'online': bool(host.last_seen and (now - host.last_seen).total_seconds() <= stale_after),
+        'summary': summary,
+    }
+
+
+def bucket_points(rows, start, end, max_points):
+    # rows: [(timestamp, value)] sorted by time -> [timestamp, min, avg, max, last]
+    # per bucket, the same shape /api/metrics/history returns
+    resolution = max(1, int((end - start) / max(1, max_points)) + 1)
+    points = []
+    current = None
+    for ts, value in rows:
+        if value is None:
+            continue
+        bucket = int(ts // resolution * resolution)
+        if current is None or current[0] != bucket:
+            if current is not None:
+                points.append([current[0], current[1], round(current[2] / current[4], 3), current[3], current[5]])
+            current = [bucket, value, 0.0, value, 0, value]
+        current[1] = min(current[1], value)
+        current[2] += value
+        current[3] = max(current[3], value)
+        current[4] += 1
+        current[5] = value
+    if current is not None:
+        points.append([current[0], current[1], round(current[2] / current[4], 3), current[3], current[5]])
+    return resolution, points
+
+
+# Remote hosts reported by agent.py. Each batch becomes one bulk INSERT of
+# flattened samples plus an update of the host's latest full sample, so any
+# worker can serve the per-host views straight from the database. Old samples
+# are pruned per host on a timer.
+class HostInventory:
+    def __init__(self):
+        self.app = None
+        self._last_prune = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['host_inventory'] = self
+
+    def ingest(self, payload, address=None):
+        from sqlalchemy.exc import IntegrityError
+        from models import Host, HostSample
+        from extensions import db
+
+        config = self.app.config
+        samples = payload['samples']
+        if len(samples) > config['INGEST_MAX_SAMPLES']:
+            raise IngestError(f"Too many samples in one batch (max {config['INGEST_MAX_SAMPLES']})", 413)
+        samples = [s for s in samples if isinstance(s, dict) and 'data' in s and 'timestamp' in s]
+        # Coerced before sorting: a batch mixing "123" and 123 must be a 400, not a TypeError
+        try:
+            stamps = [float(s['timestamp']) for s in samples]
+        except (TypeError, ValueError) as e:
+            raise IngestError(f'Invalid sample timestamp: {e}')
+        if not all(math.isfinite(ts) for ts in stamps):
+            raise IngestError('Invalid sample timestamp: not a finite number')
+        for sample, ts in zip(samples, stamps):
+            sample['timestamp'] = ts
+        samples.sort(key=lambda s: s['timestamp'])
+
+        # Validated before touching the session, so a bad batch writes nothing
+        now = time.time()
+        rows = [sample_row(sample, now) for sample in samples]
+
+        host = Host.query.filter_by(name=payload['host']).first()
+        if host is None:
+            host = Host(name=payload['host'], first_seen=datetime.now())
+            db.session.add(host)
+            try:
+                db.session.flush()
+            except IntegrityError:
+                # Another request registered the same new host first
+                db.session.rollback()
+                host = Host.query.filter_by(name=payload['host']).one()
+        host.address = address
+        host.last_seen = datetime.now()
+
+        for row in rows:
+            row['host_id'] = host.id
+        if rows:
+            db.session.execute(HostSample.__table__.insert(), rows)
+            host.last_sample = json.dumps(samples[-1]['data'])
+        db.session.commit()
+
+        if time.time() - self._last_prune > config['HOST_PRUNE_INTERVAL']:
+            self.prune()
+        return len(rows)
+
+    def prune(self):
+        from models import Host, HostSample
+        from extensions import db
+
+        with self._lock:
+            self._last_prune = time.time()
+            cutoff = time.time() - self.app.config['HOST_SAMPLE_RETENTION_HOURS'] * 3600
+            for host_id, in db.session.query(Host.id):
+                # Per host, so the (host_id, timestamp) index bounds each delete
+                HostSample.query.filter(HostSample.host_id == host_id, HostSample.timestamp < cutoff).delete()
+                db.session.commit()
+
+    def hosts(self):
+        from models import Host
+        stale_after = self.app.config['HOST_STALE_AFTER']
+        now = datetime.now()
+        return [host_to_dict(host, stale_after, now) for host in Host.query.order_by(Host.name).all()]
+
+    def history(self, host, series, start, end, max_points):
+        from models import HostSample
+        from extensions import db
+
+        result = {}
+        for name in series:
+            column = getattr(HostSample, name)
+            rows = (db.session.query(HostSample.timestamp, column)
+                    .filter(HostSample.host_id == host.id, HostSample.timestamp >= start, HostSample.timestamp <= end)
+                    .order_by(HostSample.timestamp)
+                    .all())
+            resolution, points = bucket_points(rows, start, end, max_points)
+            result[name] = {'resolution': resolution, 'points': points}
+        return result
@@ -0,0 +1,243 @@
+import http.client
+import socket
+import ssl
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urljoin, urlsplit
+
+from instrumentation import HTTP_PROBE_CONNECTIONS
+
+# Phase durations in milliseconds. dns/connect/tls are 0 when a pooled
+# connection was reused; ttfb runs from sending the request to the parsed
+# response headers.
+HttpResult = namedtuple('HttpResult', ['url', 'status_code', 'body', 'dns', 'connect', 'tls', 'ttfb', 'reused'])
+
+Exchange = namedtuple('Exchange', ['status', 'location', 'body', 'phases', 'ttfb', 'reused'])
+
+REDIRECTS = (301, 302, 303, 307, 308)
+
+# Raised by a stale keep-alive connection the server already closed
+STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionResetError,
+                BrokenPipeError, ConnectionAbortedError)
+
+
+def parse_status_codes(text):
+    # "200-299,301,404" -> [(200, 299), (301, 301), (404, 404)]
+    ranges = []
+    for part in (text or '').replace(' ', '').split(','):
+        if not part:
+            continue
+        low, _, high = part.partition('-')
+        try:
+            low, high = int(low), int(high or low)
+        except ValueError:
+            raise ValueError(f'Invalid status range: {part}')
+        if not 100 <= low <= high <= 599:
+            raise ValueError(f'Invalid status range: {part}')
+        ranges.append((low, high))
+    if not ranges:
+        raise ValueError('No status codes given')
+    return ranges
+
+
+def status_matches(ranges, code):
+    return any(low <= code <= high for low, high in ranges)
+
+
+# getaddrinfo results kept for a fixed TTL (the system resolver does not
+# expose record TTLs). Failures are not cached.
+class DnsCache:
+    def __init__(self, ttl=300.0):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, host, port):
+        now = time.monotonic()
+        key = (host, port)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        addresses = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        with self._lock:
+            self._entries[key] = (now + self.ttl, addresses)
+        return addresses
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# http.client connection whose connect() goes through the DNS cache, resumes
+# cached TLS sessions and records how long each phase took
+class ProbeConnection(http.client.HTTPConnection):
+    def __init__(self, engine, key, timeout):
+        scheme, host, port = key
+        # Plain HTTPConnection assumes 80: without this every HTTPS probe
+        # would send "Host: name:443"
+        self.default_port = 443 if scheme == 'https' else 80
+        super().__init__(host, port, timeout=timeout)
+        self.engine = engine
+        self.key = key
+        self.phases = None
+        self.idle_since = None
+
+    def connect(self):
+        scheme, host, port = self.key
+        started = time.perf_counter()
+        addresses = self.engine.dns.resolve(host, port)
+        resolved = time.perf_counter()
+
+        sock = None
+        error = None
+        for family, socktype, proto, _, address in addresses:
+            sock = socket.socket(family, socktype, proto)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(address)
+                break
+            except OSError as e:
+                sock.close()
+                sock = None
+                error = e
+        if sock is None:
+            raise error or OSError(f'No addresses for {host}')
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connected = time.perf_counter()
+
+        if scheme == 'https':
+            sock = self.engine.tls.wrap_socket(sock, server_hostname=host, session=self.engine.tls_session(self.key))
+        done = time.perf_counter()
+        self.sock = sock
+        self.phases = ((resolved - started) * 1000, (connected - resolved) * 1000, (done - connected) * 1000)
+        HTTP_PROBE_CONNECTIONS.labels('new').inc()
+
+
+# HTTP checks without a handshake per check: idle connections are pooled per
+# (scheme, host, port) and reused while the server keeps them alive, TLS
+# sessions are resumed on reconnect and name lookups are cached. Bodies are
+# only read up to `max_body` bytes; a response that was not read to the end
+# closes its connection instead of going back to the pool.
+class HttpProbe:
+    def __init__(self):
+        self.dns = DnsCache()
+        self.tls = ssl.create_default_context()
+        self.pool_size = 4
+        self.idle_timeout = 30.0
+        self.max_body = 64 * 1024
+        self.user_agent = 'NetDashboard'
+        self._idle = {}
+        self._sessions = {}
+        self._no_head = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.extensions['http_probe'] = self
+        self.dns.ttl = app.config['DNS_CACHE_TTL']
+        self.pool_size = app.config['HTTP_POOL_SIZE']
+        self.idle_timeout = app.config['HTTP_IDLE_TIMEOUT']
+        self.max_body = app.config['HTTP_MAX_BODY']
+
+    def tls_session(self, key):
+        with self._lock:
+            return self._sessions.get(key)
+
+    def _acquire(self, key, timeout):
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                conn = idle.pop()
+                if now - conn.idle_since < self.idle_timeout:
+                    conn.timeout = timeout
+                    conn.sock.settimeout(timeout)
+                    return conn
+                conn.close()
+        return ProbeConnection(self, key, timeout)
+
+    def _release(self, conn, response):
+        if isinstance(conn.sock, ssl.SSLSocket) and conn.sock.session is not None:
+            # Kept even when the connection closes, for the next handshake
+            with self._lock:
+                self._sessions[conn.key] = conn.sock.session
+        if response.will_close or not response.isclosed() or conn.sock is None:
+            conn.close()
+            return
+        conn.idle_since = time.monotonic()
+        with self._lock:
+            idle = self._idle.setdefault(conn.key, [])
+            if len(idle) < self.pool_size:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _request(self, key, method, target, headers, timeout, read_body):
+        # One request on a pooled connection; a connection the server closed
+        # while idle is retried once on a fresh one. For a new connection
+        # request() also connects, so ttfb never includes the handshakes.
+        for attempt in range(2):
+            conn = self._acquire(key, timeout)
+            reused = conn.sock is not None
+            conn.phases = None
+            try:
+                conn.request(method, target, headers=headers)
+                sent = time.perf_counter()
+                response = conn.getresponse()
+                ttfb = (time.perf_counter() - sent) * 1000
+                # Read up to the cap even when the body is not needed: a
+                # fully read response lets the connection go back to the pool
+                body = response.read(self.max_body)
+            except STALE_ERRORS:
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            phases = conn.phases
+            if phases is None:
+                HTTP_PROBE_CONNECTIONS.labels('reused').inc()
+            location = response.getheader('Location')
+            self._release(conn, response)
+            return Exchange(response.status, location, body if read_body else b'', phases or (0.0, 0.0, 0.0), ttfb,
+                            phases is None)
+        raise http.client.HTTPException('connection retry failed')
+
+    def probe(self, url, method='HEAD', timeout=5.0, read_body=False, max_redirects=5):
+        # Follows redirects like requests.get() did; phase times add up over
+        # every hop. HEAD falls back to GET (remembered per host) for servers
+        # that reject it.
+        if not url.startswith('http'):
+            url = 'http://' + url
+        totals = [0.0, 0.0, 0.0, 0.0]
+        reused = True
+        for _ in range(max_redirects + 1):
+            parts = urlsplit(url)
+            scheme = parts.scheme.lower()
+            if scheme not in ('http', 'https') or not parts.hostname:
+                raise ValueError(f'Unsupported URL: {url}')
+            key = (scheme, parts.hostname, parts.port or (443 if scheme == 'https' else 80))
+            target = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+            headers = {'User-Agent': self.user_agent, 'Accept-Encoding': 'identity'}
+
+            exchanges = []
+            if method == 'HEAD' and not read_body and key not in self._no_head:
+                exchanges.append(self._request(key, 'HEAD', target, headers, timeout, read_body))
+                if exchanges[-1].status in (405, 501):
+                    self._no_head.add(key)
+            if not exchanges or exchanges[-1].status in (405, 501):
+                exchanges.append(self._request(key, 'GET', target, headers, timeout, read_body))
+            for exchange in exchanges:
+                for i, value in enumerate(exchange.phases + (exchange.ttfb,)):
+                    totals[i] += value
+                reused = reused and exchange.reused
+
+            exchange = exchanges[-1]
+            if exchange.status in REDIRECTS and exchange.location:
+                url = urljoin(url, exchange.location)
+                continue
+            return HttpResult(url, exchange.status, exchange.body, *(round(t, 2) for t in totals), reused)
+        raise http.client.HTTPException(f'Too many redirects ({max_redirects})')
@@ -0,0 +1,266 @@
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+# Minimal Prometheus-style metrics (no client library needed). Each metric
+# holds one child per label combination; children are plain counters updated
+# under the metric's lock.
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _default(self):
+        # Unlabelled metrics are used directly: counter.inc()
+        return self.labels()
+
+    def collect(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            children = sorted(self._children.items())
+        for values, child in children:
+            lines.extend(self._samples(values, child))
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def _samples(self, values, child):
+        return [f'{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}']
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def dec(self, amount=1):
+        self._default().dec(amount)
+
+    def set(self, value):
+        self._default().set(value)
+
+    def _samples(self, values, child):
+        return [f'{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}']
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self, *values):
+        return self.labels(*values).time()
+
+    def _samples(self, values, child):
+        with child._lock:
+            counts, total, count = list(child.counts), child.sum, child.count
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float('inf'),), counts + [count - sum(counts)]):
+            cumulative += n
+            le = 'le="{}"'.format(_format_value(float(bound)))
+            lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}')
+        lines.append(f'{self.name}_sum{_format_labels(self.labelnames, values)} {_format_value(total)}')
+        lines.append(f'{self.name}_count{_format_labels(self.labelnames, values)} {count}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = Histogram('netdash_http_request_duration_seconds',
+                                 'Time to build the response, per route.', ['endpoint', 'method', 'status'])
+HTTP_REQUEST_SQL_QUERIES = Histogram('netdash_http_request_sql_queries',
+                                     'SQL statements executed per request.', ['endpoint'], buckets=COUNT_BUCKETS)
+HTTP_REQUEST_SQL_SECONDS = Histogram('netdash_http_request_sql_seconds',
+                                     'Time spent in SQL per request.', ['endpoint'])
+SQL_QUERY_SECONDS = Histogram('netdash_sql_query_duration_seconds',
+                              'SQL statement execution time (requests and background jobs).')
+PSUTIL_SECONDS = Histogram('netdash_psutil_call_duration_seconds', 'psutil call latency.', ['call'])
+COLLECTOR_SAMPLE_SECONDS = Histogram('netdash_collector_sample_duration_seconds',
+                                     'Time to take one full metrics sample.')
+SERVICE_CHECK_SECONDS = Histogram('netdash_service_check_duration_seconds',
+                                  'Service check latency (ping targets are probed as one batch).', ['type'])
+SERVICE_CHECKS = Counter('netdash_service_checks_total', 'Service check results.', ['type', 'status'])
+ALERT_SEND_SECONDS = Histogram('netdash_alert_send_duration_seconds', 'Alert delivery call latency.', ['channel'])
+ALERT_SENDS = Counter('netdash_alert_sends_total', 'Alert outbox rows by delivery outcome.', ['channel', 'outcome'])
+HTTP_PROBE_CONNECTIONS = Counter('netdash_http_probe_connections_total',
+                                 'HTTP check requests by connection (new handshake or pooled keep-alive).', ['connection'])
+STREAM_CLIENTS = Gauge('netdash_stream_clients', 'Open /api/stream connections.')
+INGEST_SAMPLES = Counter('netdash_ingest_samples_total', 'Samples received from remote agents.')
+
+
+def timed_call(call, function, *args, **kwargs):
+    with PSUTIL_SECONDS.time(call):
+        return function(*args, **kwargs)
+
+
+# Per-request accounting: route latency plus the SQL statements issued by the
+# request thread. Statements from background threads only feed the global
+# SQL histogram.
+class Instrumentation:
+    def __init__(self):
+        self._local = threading.local()
+
+    def init_app(self, app):
+        # Imported here so the metric types stay usable without Flask (agent.py)
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        app.extensions['instrumentation'] = self
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        for name, listener in (('before_cursor_execute', self._before_cursor_execute),
+                               ('after_cursor_execute', self._after_cursor_execute)):
+            if not event.contains(Engine, name, listener):
+                event.listen(Engine, name, listener)
+
+    def _before_request(self):
+        self._local.request = {'started': time.perf_counter(), 'queries': 0, 'sql': 0.0}
+
+    def _after_request(self, response):
+        from flask import request
+
+        stats = getattr(self._local, 'request', None)
+        self._local.request = None
+        if stats is None:
+            return response
+        # Route template, not the raw path, keeps label cardinality bounded.
+        # Streaming responses are timed up to the first byte.
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.labels(endpoint, request.method, response.status_code).observe(
+            time.perf_counter() - stats['started'])
+        HTTP_REQUEST_SQL_QUERIES.labels(endpoint).observe(stats['queries'])
+        HTTP_REQUEST_SQL_SECONDS.labels(endpoint).observe(stats['sql'])
+        return response
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        SQL_QUERY_SECONDS.observe(elapsed)
+        stats = getattr(self._local, 'request', None)
+        if stats is not None:
+            stats['queries'] += 1
+            stats['sql'] += elapsed
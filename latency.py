@@ -0,0 +1,89 @@
+import threading
+import time
+
+import prober
+
+
+# Pings the reference target on its own cadence in the background; /api/ping
+# and the event stream only read the latest result.
+class LatencyMonitor:
+    def __init__(self, target='8.8.8.8', interval=5.0, count=3):
+        self.target = target
+        self.interval = interval
+        self.count = count
+        self.app = None
+        self._latest = None
+        self._source = None
+        self._listeners = []
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.target = app.config.get('PING_TARGET', self.target)
+        self.interval = app.config.get('PING_INTERVAL', self.interval)
+        self.count = app.config.get('PING_COUNT', self.count)
+        app.extensions['latency_monitor'] = self
+
+    def add_listener(self, listener):
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='latency-monitor', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+        self._thread = None
+
+    def set_source(self, source):
+        self._source = source
+
+    def latest(self):
+        if self._source is not None:
+            shared = self._source()
+            if shared is not None:
+                return shared
+        if self._latest is None:
+            return {'status': 'pending', 'latency': -1, 'target': self.target}
+        return self._latest
+
+    def measure(self):
+        # Short in-process burst: exact RTT plus loss and jitter
+        try:
+            result = prober.probe([self.target], count=self.count, timeout=2.0, tcp_port=53)[self.target]
+        except Exception as e:
+            return {'status': 'error', 'latency': -1, 'target': self.target, 'error': str(e)}
+        if not result.received:
+            return {'status': 'error', 'latency': -1, 'target': self.target, 'loss': result.loss,
+                    'method': result.method, 'error': result.error}
+        return {'status': 'ok', 'latency': result.rtt_avg, 'target': self.target, 'min': result.rtt_min,
+                'max': result.rtt_max, 'jitter': result.jitter, 'loss': result.loss, 'method': result.method}
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            result = self.measure()
+            result['timestamp'] = time.time()
+            self._latest = result
+            with self.app.app_context():
+                for listener in self._listeners:
+                    try:
+                        listener(result)
+                    except Exception as e:
+                        print(f"Latency listener error: {e}")
+            next_tick += self.interval
+            now = time.monotonic()
+            if next_tick < now:
+                next_tick = now
+            self._stop.wait(next_tick - now)
@@ -21,14 +21,22 @@ class MonitoredService(db.Model):
     status = db.Column(db.String(20), default='Unknown') # Up, Down, Unknown
     last_checked = db.Column(db.DateTime)
     response_time = db.Column(db.Float, default=0.0)
+    check_interval = db.Column(db.Integer, default=60) # Seconds between checks
+    check_timeout = db.Column(db.Float, default=5.0) # Seconds per check
+    consecutive_failures = db.Column(db.Integer, default=0) # Drives backoff while Down
+    http_method = db.Column(db.String(10), default='HEAD') # HEAD, GET (GET si hay keyword)
+    expected_status = db.Column(db.String(50), default='200-299') # Ej. "200-299,301"
+    keyword = db.Column(db.String(200), nullable=True) # Texto que debe aparecer en la respuesta
 
 class Notification(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     message = db.Column(db.String(255), nullable=False)
     type = db.Column(db.String(20), default='info') # info, warning, danger
-    timestamp = db.Column(db.DateTime, default=db.func.now())
-    read = db.Column(db.Boolean, default=False)
+    timestamp = db.Column(db.DateTime, default=db.func.now(), index=True)
+    read = db.Column(db.Boolean, default=False, index=True)
+
+    __table_args__ = (db.Index('ix_notification_title_timestamp', 'title', 'timestamp'),)
 
 class AppSettings(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -42,3 +50,103 @@ class AppSettings(db.Model):
     notifications_enabled = db.Column(db.Boolean, default=True)
 
     user = db.relationship('User', backref=db.backref('settings', uselist=False))
+
+class AlertOutbox(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    channel = db.Column(db.String(20), nullable=False) # telegram, whatsapp
+    title = db.Column(db.String(100), nullable=False)
+    message = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(20), default='pending') # pending, sent, failed, cancelled
+    attempts = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=db.func.now())
+    next_attempt_at = db.Column(db.DateTime, default=db.func.now())
+    sent_at = db.Column(db.DateTime)
+    last_error = db.Column(db.String(255))
+
+    __table_args__ = (db.Index('ix_alert_outbox_due', 'status', 'next_attempt_at'),)
+
+class Device(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    ip = db.Column(db.String(45), unique=True, nullable=False)
+    mac = db.Column(db.String(32), nullable=True)
+    interface = db.Column(db.String(50), nullable=True)
+    first_seen = db.Column(db.DateTime, default=db.func.now())
+    last_seen = db.Column(db.DateTime, default=db.func.now(), index=True)
+
+class Host(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False) # Identificador enviado por el agente
+    address = db.Column(db.String(45), nullable=True)
+    first_seen = db.Column(db.DateTime, default=db.func.now())
+    last_seen = db.Column(db.DateTime, default=db.func.now())
+    last_sample = db.Column(db.Text, nullable=True) # JSON, mismo formato que /api/metrics
+
+class HostSample(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    host_id = db.Column(db.Integer, db.ForeignKey('host.id'), nullable=False)
+    timestamp = db.Column(db.Float, nullable=False) # Epoch (s)
+    cpu = db.Column(db.Float)
+    memory = db.Column(db.Float)
+    disk = db.Column(db.Float)
+    net_tx = db.Column(db.Float) # bytes/s
+    net_rx = db.Column(db.Float)
+
+    __table_args__ = (db.Index('ix_host_sample_host_timestamp', 'host_id', 'timestamp'),)
+
+class ServiceCheck(db.Model):
+    # Append-only log of every check; downsampled into ServiceRollup
+    id = db.Column(db.Integer, primary_key=True)
+    service_id = db.Column(db.Integer, db.ForeignKey('monitored_service.id'), nullable=False)
+    timestamp = db.Column(db.Float, nullable=False) # Epoch (s)
+    up = db.Column(db.Boolean, nullable=False)
+    response_time = db.Column(db.Float) # ms, solo si esta Up
+    error = db.Column(db.String(255))
+    dns_time = db.Column(db.Float) # ms, desglose de chequeos HTTP (0 si se reutilizo la conexion)
+    connect_time = db.Column(db.Float)
+    tls_time = db.Column(db.Float)
+    ttfb = db.Column(db.Float)
+
+    __table_args__ = (db.Index('ix_service_check_service_timestamp', 'service_id', 'timestamp'),)
+
+class ServiceRollup(db.Model):
+    # One row per service and hour
+    id = db.Column(db.Integer, primary_key=True)
+    service_id = db.Column(db.Integer, db.ForeignKey('monitored_service.id'), nullable=False)
+    bucket = db.Column(db.Integer, nullable=False) # Epoch del inicio de la hora
+    checks = db.Column(db.Integer, default=0)
+    up = db.Column(db.Integer, default=0)
+    response_sum = db.Column(db.Float, default=0.0) # ms
+    histogram = db.Column(db.Text) # Cuentas por LATENCY_BUCKETS (uptime.py)
+
+    __table_args__ = (db.Index('ix_service_rollup_service_bucket', 'service_id', 'bucket', unique=True),)
+
+class ServiceUptime(db.Model):
+    # Running totals per service and window (24h, 7d, 30d)
+    id = db.Column(db.Integer, primary_key=True)
+    service_id = db.Column(db.Integer, db.ForeignKey('monitored_service.id'), nullable=False)
+    window = db.Column(db.String(8), nullable=False)
+    checks = db.Column(db.Integer, default=0)
+    up = db.Column(db.Integer, default=0)
+    response_sum = db.Column(db.Float, default=0.0)
+    histogram = db.Column(db.Text)
+    expired_through = db.Column(db.Integer, nullable=False) # Horas <= este bucket ya descontadas
+
+    __table_args__ = (db.Index('ix_service_uptime_service_window', 'service_id', 'window', unique=True),)
+
+class AlertRule(db.Model):
+    # Evaluated by rules.py against every metrics sample and service sweep
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False) # Titulo de la notificacion
+    kind = db.Column(db.String(20), default='threshold') # threshold, ewma, rate, flapping
+    metric = db.Column(db.String(100), nullable=False) # cpu, memory, disk, net.<iface>.<campo>, service.<id>.status
+    operator = db.Column(db.String(2), default='>')
+    threshold = db.Column(db.Float, default=0.0) # Valor, sigmas (ewma) o unidades/s (rate)
+    duration = db.Column(db.Float, default=0.0) # La condicion debe mantenerse este tiempo (s)
+    alpha = db.Column(db.Float, default=0.05) # Suavizado de la media (ewma)
+    min_delta = db.Column(db.Float, default=0.0) # Desvio minimo absoluto (ewma)
+    window = db.Column(db.Float, default=600.0) # Ventana de flapping (s)
+    count = db.Column(db.Integer, default=4) # Cambios de estado dentro de la ventana (flapping)
+    severity = db.Column(db.String(20), default='warning') # info, warning, danger
+    message = db.Column(db.String(255)) # Plantilla: {value}, {label}, {threshold}, {duration}, {baseline}...
+    enabled = db.Column(db.Boolean, default=True)
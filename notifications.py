@@ -0,0 +1,144 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+def utcnow():
+    # Notification.timestamp defaults to SQLite's CURRENT_TIMESTAMP (naive UTC)
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# Keeps the hot notification reads out of the database: the unread counter
+# and the last time each title was raised (for de-duplication) live in
+# memory. Both are loaded once with indexed queries and then maintained on
+# insert (after the transaction commits) and on mark-read. A background
+# pass compacts old rows.
+class NotificationFeed:
+    def __init__(self):
+        self.app = None
+        self._unread = None
+        self._last_by_title = {}
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['notification_feed'] = self
+        for name, listener in (('after_flush', self._after_flush), ('after_commit', self._after_commit),
+                               ('after_rollback', self._after_rollback)):
+            if not event.contains(Session, name, listener):
+                event.listen(Session, name, listener)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='notification-compactor', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def _load(self):
+        from models import Notification
+        from extensions import db
+
+        window = self.app.config['NOTIFICATION_DEDUP_WINDOW']
+        since = utcnow() - timedelta(seconds=window)
+        recent = (db.session.query(Notification.title, db.func.max(Notification.timestamp))
+                  .filter(Notification.timestamp >= since)
+                  .group_by(Notification.title)
+                  .all())
+        self._last_by_title = {title: ts.replace(tzinfo=timezone.utc).timestamp() for title, ts in recent}
+        self._unread = Notification.query.filter_by(read=False).count()
+
+    def unread_count(self):
+        with self._lock:
+            if self._unread is None:
+                self._load()
+            return self._unread
+
+    def should_create(self, title):
+        # Prevent duplicate notifications in short time window. The slot is
+        # reserved immediately so several alerts raised in the same
+        # transaction (one sweep) still collapse into one.
+        now = time.time()
+        with self._lock:
+            if self._unread is None:
+                self._load()
+            last = self._last_by_title.get(title)
+            if last is not None and now - last < self.app.config['NOTIFICATION_DEDUP_WINDOW']:
+                return False
+            self._last_by_title[title] = now
+            return True
+
+    def resync(self):
+        # Rare writes (mark-read, compaction) just recount, which also
+        # absorbs anything inserted concurrently
+        from models import Notification
+        with self._lock:
+            self._unread = Notification.query.filter_by(read=False).count()
+
+    def _after_flush(self, session, flush_context):
+        from models import Notification
+        added = [obj for obj in session.new if isinstance(obj, Notification) and not obj.read]
+        if added:
+            session.info['unread_added'] = session.info.get('unread_added', 0) + len(added)
+
+    def _after_commit(self, session):
+        added = session.info.pop('unread_added', 0)
+        if added:
+            with self._lock:
+                if self._unread is not None:
+                    self._unread += added
+
+    def _after_rollback(self, session):
+        session.info.pop('unread_added', None)
+
+    def compact(self):
+        # Retention: read notifications go after NOTIFICATION_RETENTION_DAYS,
+        # everything after NOTIFICATION_MAX_AGE_DAYS. Deleted in chunks so a
+        # large backlog never holds the SQLite write lock for long.
+        from models import Notification
+        from extensions import db
+
+        config = self.app.config
+        now = utcnow()
+        rules = [
+            (Notification.read == True, now - timedelta(days=config['NOTIFICATION_RETENTION_DAYS'])),
+            (None, now - timedelta(days=config['NOTIFICATION_MAX_AGE_DAYS'])),
+        ]
+        deleted = 0
+        for condition, cutoff in rules:
+            while True:
+                query = db.session.query(Notification.id).filter(Notification.timestamp < cutoff)
+                if condition is not None:
+                    query = query.filter(condition)
+                ids = [row.id for row in query.limit(5000)]
+                if not ids:
+                    break
+                Notification.query.filter(Notification.id.in_(ids)).delete(synchronize_session=False)
+                db.session.commit()
+                deleted += len(ids)
+        if deleted:
+            # Unread rows may have aged out
+            self.resync()
+        return deleted
+
+    def _run(self):
+        while not self._stop.wait(self.app.config['NOTIFICATION_COMPACT_INTERVAL']):
+            try:
+                with self.app.app_context():
+                    self.compact()
+            except Exception as e:
+                print(f"Notification compaction error: {e}")
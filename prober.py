@@ -0,0 +1,221 @@
+import errno
+import itertools
+import os
+import selectors
+import socket
+import struct
+import time
+from collections import namedtuple
+
+# RTTs in milliseconds; loss in percent; jitter is the mean absolute
+# difference between consecutive RTTs
+ProbeResult = namedtuple('ProbeResult', ['target', 'method', 'sent', 'received', 'loss',
+                                         'rtt_min', 'rtt_avg', 'rtt_max', 'jitter', 'error'])
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+
+# Shared across calls so concurrent probes never reuse a live sequence number
+_sequence = itertools.count(int.from_bytes(os.urandom(2), 'big'))
+
+
+def summarize(target, method, sent, rtts, error=None):
+    received = len(rtts)
+    loss = round(100.0 * (sent - received) / sent, 1) if sent else 100.0
+    if not rtts:
+        return ProbeResult(target, method, sent, 0, loss, None, None, None, None, error or 'no reply')
+    jitter = sum(abs(b - a) for a, b in zip(rtts, rtts[1:])) / (len(rtts) - 1) if len(rtts) > 1 else 0.0
+    return ProbeResult(target, method, sent, received, loss, round(min(rtts), 3), round(sum(rtts) / received, 3),
+                       round(max(rtts), 3), round(jitter, 3), None)
+
+
+def split_target(target, default_port):
+    # "host", "host:port", "[v6]", "[v6]:port", a bare IPv6 address or a
+    # URL; returns (host, port)
+    host = target.replace('http://', '').replace('https://', '').split('/')[0]
+    if host.startswith('['):
+        host, _, rest = host[1:].partition(']')
+        port = rest[1:] if rest.startswith(':') else ''
+    elif host.count(':') == 1:
+        host, port = host.split(':')
+    else:
+        port = ''
+    return host, int(port) if port.isdigit() else default_port
+
+
+def resolve(host):
+    try:
+        return socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)[0][4][0]
+    except (socket.gaierror, UnicodeError, IndexError):
+        return None
+
+
+def checksum(data):
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+def icmp_packet(seq):
+    payload = b'NetDashboard'.ljust(32, b'.')
+    header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, 0, seq)
+    header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, checksum(header + payload), 0, seq)
+    return header + payload
+
+
+def icmp_socket():
+    # Unprivileged "ping socket": needs net.ipv4.ping_group_range to include
+    # our group on Linux. The kernel owns the ICMP identifier, so replies
+    # are only delivered to this socket and we match on sequence number.
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+    sock.setblocking(False)
+    return sock
+
+
+def icmp_available():
+    try:
+        icmp_socket().close()
+        return True
+    except OSError:
+        return False
+
+
+def probe_icmp(addresses, count, timeout, interval):
+    # All targets share one socket: requests are interleaved across targets
+    # and replies are collected with a single selector until every request
+    # is answered or `timeout` has passed since the last one was sent.
+    sock = icmp_socket()
+    selector = selectors.DefaultSelector()
+    selector.register(sock, selectors.EVENT_READ)
+    pending = {}
+    rtts = {address: [] for address in addresses}
+    sent = {address: 0 for address in addresses}
+    try:
+        def drain(wait):
+            for _ in selector.select(wait):
+                while True:
+                    try:
+                        data, (source, _port) = sock.recvfrom(1024)
+                    except (BlockingIOError, InterruptedError):
+                        break
+                    received_at = time.perf_counter()
+                    if len(data) < 8:
+                        continue
+                    icmp_type, _code, _sum, _ident, seq = struct.unpack('!BBHHH', data[:8])
+                    entry = pending.get(seq)
+                    if icmp_type == ICMP_ECHO_REPLY and entry and entry[0] == source:
+                        del pending[seq]
+                        rtts[source].append((received_at - entry[1]) * 1000)
+
+        for _ in range(count):
+            for address in addresses:
+                seq = next(_sequence) & 0xffff
+                sent[address] += 1
+                try:
+                    pending[seq] = (address, time.perf_counter())
+                    sock.sendto(icmp_packet(seq), (address, 0))
+                except OSError:
+                    # Unreachable network etc.: counts as a lost request
+                    pending.pop(seq, None)
+            drain(interval)
+
+        deadline = time.perf_counter() + timeout
+        while pending:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            drain(remaining)
+    finally:
+        selector.close()
+        sock.close()
+    return sent, rtts
+
+
+def probe_tcp(endpoints, count, timeout, interval):
+    # TCP connect time as RTT. A refused connection still proves the host
+    # answered (RST), so it counts as a reply. Each round opens one
+    # non-blocking connect per target and waits on all of them at once.
+    rtts = {endpoint: [] for endpoint in endpoints}
+    sent = {endpoint: 0 for endpoint in endpoints}
+    for round_no in range(count):
+        if round_no:
+            time.sleep(interval)
+        selector = selectors.DefaultSelector()
+        try:
+            for endpoint in endpoints:
+                address, port = endpoint
+                family = socket.AF_INET6 if ':' in address else socket.AF_INET
+                sock = socket.socket(family, socket.SOCK_STREAM)
+                sock.setblocking(False)
+                sent[endpoint] += 1
+                started = time.perf_counter()
+                code = sock.connect_ex((address, port))
+                if code in (0, errno.ECONNREFUSED):
+                    rtts[endpoint].append((time.perf_counter() - started) * 1000)
+                    sock.close()
+                elif code in (errno.EINPROGRESS, errno.EWOULDBLOCK, getattr(errno, 'WSAEWOULDBLOCK', -1)):
+                    selector.register(sock, selectors.EVENT_WRITE, (endpoint, started))
+                else:
+                    sock.close()
+
+            deadline = time.perf_counter() + timeout
+            while selector.get_map():
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                for key, _ in selector.select(remaining):
+                    endpoint, started = key.data
+                    finished = time.perf_counter()
+                    code = key.fileobj.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    if code in (0, errno.ECONNREFUSED):
+                        rtts[endpoint].append((finished - started) * 1000)
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+        finally:
+            for key in list(selector.get_map().values()):
+                key.fileobj.close()
+            selector.close()
+    return sent, rtts
+
+
+def probe(targets, count=3, timeout=1.0, interval=0.05, tcp_port=80, method='auto'):
+    # Measure RTT, loss and jitter for many targets at once, in-process.
+    # method: 'icmp', 'tcp' or 'auto' (ICMP when the kernel allows
+    # unprivileged ping sockets, TCP connect otherwise or for targets that
+    # never answered ICMP).
+    results = {}
+    addresses = {}
+    for target in targets:
+        host, port = split_target(target, tcp_port)
+        address = resolve(host)
+        if address is None:
+            results[target] = summarize(target, None, 0, [], 'unresolved')
+        else:
+            addresses[target] = (address, port)
+
+    use_icmp = method == 'icmp' or (method == 'auto' and icmp_available())
+    remaining = dict(addresses)
+    if use_icmp:
+        icmp_targets = {t: a for t, (a, _port) in addresses.items() if ':' not in a}
+        if icmp_targets:
+            try:
+                sent, rtts = probe_icmp(sorted(set(icmp_targets.values())), count, timeout, interval)
+                for target, address in icmp_targets.items():
+                    result = summarize(target, 'icmp', sent[address], rtts[address])
+                    if result.received or method == 'icmp':
+                        results[target] = result
+                        remaining.pop(target, None)
+            except OSError as e:
+                if method == 'icmp':
+                    for target in icmp_targets:
+                        results[target] = summarize(target, 'icmp', 0, [], str(e))
+                        remaining.pop(target, None)
+
+    if remaining:
+        sent, rtts = probe_tcp(sorted(set(remaining.values())), count, timeout, interval)
+        for target, endpoint in remaining.items():
+            results[target] = summarize(target, 'tcp', sent[endpoint], rtts[endpoint])
+    return results
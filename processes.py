@@ -0,0 +1,202 @@
+import heapq
+import threading
+import time
+from collections import Counter
+
+import psutil
+
+from instrumentation import PSUTIL_SECONDS, timed_call
+
+SORT_KEYS = {
+    'cpu': lambda p: p.cpu_percent or 0.0,
+    'memory': lambda p: p.rss or 0,
+    'io': lambda p: (p.read_rate or 0.0) + (p.write_rate or 0.0),
+    'connections': lambda p: p.connections or 0,
+}
+
+
+# One row of the persistent table. name/username/cmdline never change for a
+# given (pid, create_time), so they are read once; the counters are re-read
+# on every refresh and turned into per-second rates.
+class ProcessEntry:
+    __slots__ = ('key', 'name', 'username', 'cmdline', 'cpu_total', 'cpu_percent', 'rss', 'memory_percent',
+                 'io_total', 'read_rate', 'write_rate', 'threads', 'status', 'connections', 'sampled')
+
+    def __init__(self, key, process):
+        self.key = key
+        self.name = _safe(process.name)
+        self.username = _safe(process.username)
+        cmdline = _safe(process.cmdline)
+        self.cmdline = ' '.join(cmdline)[:200] if cmdline else None
+        self.cpu_total = None
+        self.cpu_percent = None
+        self.rss = None
+        self.memory_percent = None
+        self.io_total = None
+        self.read_rate = None
+        self.write_rate = None
+        self.threads = None
+        self.status = None
+        self.connections = None
+        self.sampled = None
+
+    @classmethod
+    def from_dict(cls, data):
+        # Counters are not published, only the rates computed from them
+        entry = cls.__new__(cls)
+        entry.key = (data['pid'], None)
+        entry.name = data['name']
+        entry.username = data['username']
+        entry.cmdline = data['cmdline']
+        entry.cpu_total = None
+        entry.cpu_percent = data['cpu_percent']
+        entry.rss = data['memory_rss']
+        entry.memory_percent = data['memory_percent']
+        entry.io_total = None
+        entry.read_rate = data['io_read_rate']
+        entry.write_rate = data['io_write_rate']
+        entry.threads = data['threads']
+        entry.status = data['status']
+        entry.connections = None
+        entry.sampled = None
+        return entry
+
+    def update(self, process, now, total_memory):
+        cpu = process.cpu_times()
+        memory = process.memory_info()
+        io = _safe(process.io_counters)
+        self.threads = _safe(process.num_threads)
+        self.status = _safe(process.status)
+        self.connections = None
+
+        cpu_total = cpu.user + cpu.system
+        elapsed = now - self.sampled if self.sampled is not None else None
+        if elapsed and self.cpu_total is not None:
+            # Same scale as top: 100% is one full core
+            self.cpu_percent = round(max(0.0, cpu_total - self.cpu_total) / elapsed * 100, 1)
+        if elapsed and io is not None and self.io_total is not None:
+            self.read_rate = round(max(0, io.read_bytes - self.io_total[0]) / elapsed, 1)
+            self.write_rate = round(max(0, io.write_bytes - self.io_total[1]) / elapsed, 1)
+        self.cpu_total = cpu_total
+        self.io_total = (io.read_bytes, io.write_bytes) if io is not None else None
+        self.rss = memory.rss
+        self.memory_percent = round(100.0 * memory.rss / total_memory, 2) if total_memory else None
+        self.sampled = now
+
+    def to_dict(self):
+        return {
+            'pid': self.key[0],
+            'name': self.name,
+            'username': self.username,
+            'cmdline': self.cmdline,
+            'status': self.status,
+            'threads': self.threads,
+            'cpu_percent': self.cpu_percent,
+            'memory_rss': self.rss,
+            'memory_percent': self.memory_percent,
+            'io_read_rate': self.read_rate,
+            'io_write_rate': self.write_rate,
+            'connections': self.connections,
+        }
+
+
+def _safe(getter):
+    try:
+        return getter()
+    except (psutil.AccessDenied, psutil.ZombieProcess, KeyError):
+        return None
+
+
+# Top-N process view. The table persists between refreshes and is updated
+# in place: one psutil.process_iter() pass reads each process's counters
+# under oneshot(), new processes are recognised by (pid, create_time) (a
+# recycled PID starts a fresh entry) and dead ones are dropped. Refreshes
+# are driven by the metrics collector, at most every
+# PROCESS_REFRESH_INTERVAL seconds, so CPU% and I/O rates are deltas
+# between collector ticks and a request only ranks the last table, picking
+# results with heapq.nlargest instead of a full sort. In cluster mode the
+# leader refreshes and publishes the table; followers rank the copy.
+class ProcessTable:
+    def __init__(self, interval=2.0):
+        self.interval = interval
+        self.tick = 2.0
+        self.max_results = 100
+        self._entries = {}
+        self._refreshed = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.extensions['process_table'] = self
+        self.interval = app.config['PROCESS_REFRESH_INTERVAL']
+        self.tick = app.config['METRICS_INTERVAL']
+        self.max_results = app.config['PROCESS_TOP_MAX']
+
+    def on_snapshot(self, snapshot):
+        # Collector listener. Ticks drift by a few milliseconds, so half a
+        # tick of slack keeps a 2 s table on a 2 s collector from skipping
+        # every other tick.
+        from extensions import cluster
+
+        now = time.monotonic()
+        if self._refreshed is not None and now - self._refreshed < self.interval - self.tick / 2:
+            return
+        self.refresh()
+        cluster.share_processes(self.export())
+
+    def refresh(self):
+        with self._lock:
+            now = time.monotonic()
+            total_memory = timed_call('virtual_memory', psutil.virtual_memory).total
+            seen = {}
+            with PSUTIL_SECONDS.time('process_iter'):
+                for process in psutil.process_iter():
+                    try:
+                        with process.oneshot():
+                            key = (process.pid, process.create_time())
+                            entry = self._entries.get(process.pid)
+                            if entry is None or entry.key != key:
+                                entry = ProcessEntry(key, process)
+                            entry.update(process, now, total_memory)
+                    except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                        continue
+                    except psutil.AccessDenied:
+                        # Listed but unreadable (other users without root)
+                        continue
+                    seen[process.pid] = entry
+            # Anything not listed this pass has exited
+            self._entries = seen
+            self._refreshed = now
+
+    def export(self):
+        with self._lock:
+            return [entry.to_dict() for entry in self._entries.values()]
+
+    def load(self, processes):
+        # A table published by the cluster leader
+        with self._lock:
+            self._entries = {p['pid']: ProcessEntry.from_dict(p) for p in processes}
+            self._refreshed = time.monotonic()
+
+    def _count_connections(self):
+        from extensions import connection_table
+
+        # Shares the connection table's cached read
+        _, rows = connection_table.rows(with_process=True)
+        counts = Counter(row['pid'] for row in rows if row['pid'])
+        for pid, entry in self._entries.items():
+            entry.connections = counts.get(pid, 0)
+
+    def top(self, sort='cpu', limit=20, with_connections=False):
+        if sort not in SORT_KEYS:
+            raise ValueError(f"sort must be one of {', '.join(SORT_KEYS)}")
+        limit = max(1, min(limit, self.max_results))
+        with self._lock:
+            if sort == 'connections' or with_connections:
+                self._count_connections()
+            entries = list(self._entries.values())
+            top = heapq.nlargest(limit, entries, key=SORT_KEYS[sort])
+            return {
+                'sort': sort,
+                'total': len(entries),
+                'processes': [entry.to_dict() for entry in top],
+            }
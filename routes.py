@@ -1,56 +1,26 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify
+from flask import (Blueprint, render_template, redirect, url_for, request, flash, jsonify, current_app,
+                   has_request_context, stream_with_context)
+from sqlalchemy import select
 from flask_login import login_user, logout_user, login_required, current_user
-from models import User, MonitoredService, Notification, AppSettings
-from extensions import db
-import psutil
-import socket
+from models import User, MonitoredService, Notification, AppSettings, Host, AlertRule, HostSample, ServiceCheck
+from extensions import (db, collector, scheduler, history, latency_monitor, events, alert_worker, notification_feed,
+                        connection_table, network_scanner, host_inventory, uptime, user_cache, anomaly_detector,
+                        process_table)
+from events import StreamState, format_event
+from collector import METRIC_FIELDS, select_metrics
+from instrumentation import REGISTRY, STREAM_CLIENTS, INGEST_SAMPLES
+from hosts import IngestError, decode_payload, host_to_dict
+from httpprobe import parse_status_codes
+from rules import read_stream, validate_rule
+from alerts import enqueue_alert
+from export import FORMATS, encode_rows, gzip_chunks, query_rows, history_rows
+import hmac
+import json
 import time
-import platform
-import subprocess
-import requests
-import re
+from datetime import datetime, timezone
 
 main_bp = Blueprint('main', __name__)
 
-def send_telegram_alert(user, title, message):
-    if not user.settings or not user.settings.telegram_bot_token or not user.settings.telegram_chat_id:
-        return
-    
-    token = user.settings.telegram_bot_token
-    chat_id = user.settings.telegram_chat_id
-    text = f"🚨 *{title}*\n\n{message}\n\n_NetDashboard Alert_"
-    
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    payload = {
-        'chat_id': chat_id,
-        'text': text,
-        'parse_mode': 'Markdown'
-    }
-    try:
-        requests.post(url, json=payload, timeout=5)
-    except Exception as e:
-        print(f"Telegram Error: {e}")
-
-def send_whatsapp_alert(user, title, message):
-    if not user.settings or not user.settings.whatsapp_phone or not user.settings.whatsapp_apikey:
-        return
-
-    phone = user.settings.whatsapp_phone
-    apikey = user.settings.whatsapp_apikey
-    text = f"🚨 *{title}*\n\n{message}\n\n_NetDashboard Alert_"
-    
-    # URL Encode the text
-    import urllib.parse
-    encoded_text = urllib.parse.quote(text)
-    
-    url = f"https://api.callmebot.com/whatsapp.php?phone={phone}&text={encoded_text}&apikey={apikey}"
-    
-    try:
-        requests.get(url, timeout=10)
-    except Exception as e:
-        print(f"WhatsApp Error: {e}")
-
-
 @main_bp.route('/')
 def index():
     if current_user.is_authenticated:
@@ -102,28 +72,31 @@ def logout():
     logout_user()
     return redirect(url_for('main.login'))
 
+def ensure_settings():
+    # current_user is a cached read-only snapshot (see usercache.py); the
+    # AppSettings row is created on first visit and the snapshot refreshed
+    if current_user.settings:
+        return current_user
+    if not AppSettings.query.filter_by(user_id=current_user.id).first():
+        db.session.add(AppSettings(user_id=current_user.id))
+        db.session.commit()
+    user_cache.invalidate(current_user.id)
+    return user_cache.get(current_user.id)
+
 @main_bp.route('/dashboard')
 @login_required
 def dashboard():
-    if not current_user.settings:
-        settings = AppSettings(user_id=current_user.id)
-        db.session.add(settings)
-        db.session.commit()
-        
+    user = ensure_settings()
     services = MonitoredService.query.all()
     # Get unread count
-    unread_count = Notification.query.filter_by(read=False).count()
+    unread_count = notification_feed.unread_count()
     notifications = Notification.query.order_by(Notification.timestamp.desc()).limit(10).all()
-    return render_template('dashboard.html', user=current_user, services=services, notifications=notifications, unread_count=unread_count)
+    return render_template('dashboard.html', user=user, services=services, notifications=notifications, unread_count=unread_count)
 
 @main_bp.route('/settings')
 @login_required
 def settings():
-    if not current_user.settings:
-        settings = AppSettings(user_id=current_user.id)
-        db.session.add(settings)
-        db.session.commit()
-    return render_template('settings.html', user=current_user)
+    return render_template('settings.html', user=ensure_settings())
 
 @main_bp.route('/about')
 def about():
@@ -133,20 +106,73 @@ def about():
 @login_required
 def update_settings():
     data = request.json
-    if not current_user.settings:
-        current_user.settings = AppSettings(user_id=current_user.id)
-    
-    current_user.settings.theme = data.get('theme', 'system')
-    current_user.settings.show_public_ip = data.get('show_public_ip', False)
-    current_user.settings.telegram_bot_token = data.get('telegram_bot_token', '')
-    current_user.settings.telegram_chat_id = data.get('telegram_chat_id', '')
-    current_user.settings.whatsapp_phone = data.get('whatsapp_phone', '')
-    current_user.settings.whatsapp_apikey = data.get('whatsapp_apikey', '')
-    current_user.settings.notifications_enabled = data.get('notifications_enabled', True)
-    
+    settings = AppSettings.query.filter_by(user_id=current_user.id).first()
+    if not settings:
+        settings = AppSettings(user_id=current_user.id)
+        db.session.add(settings)
+
+    settings.theme = data.get('theme', 'system')
+    settings.show_public_ip = data.get('show_public_ip', False)
+    settings.telegram_bot_token = data.get('telegram_bot_token', '')
+    settings.telegram_chat_id = data.get('telegram_chat_id', '')
+    settings.whatsapp_phone = data.get('whatsapp_phone', '')
+    settings.whatsapp_apikey = data.get('whatsapp_apikey', '')
+    settings.notifications_enabled = data.get('notifications_enabled', True)
+
     db.session.commit()
+    user_cache.invalidate(current_user.id)
     return jsonify({'status': 'success', 'message': 'Configuración guardada'})
 
+def service_to_dict(service, summary=None):
+    # summary: uptime/mean/p95 per window, from uptime.summaries()
+    return {
+        'id': service.id,
+        'name': service.name,
+        'url': service.url,
+        'type': service.type,
+        'status': service.status,
+        'response_time': service.response_time,
+        'last_checked': service.last_checked.isoformat() if service.last_checked else None,
+        'interval': service.check_interval,
+        'timeout': service.check_timeout,
+        'method': service.http_method,
+        'expected_status': service.expected_status,
+        'keyword': service.keyword,
+        'uptime': summary or {}
+    }
+
+def services_payload():
+    summaries = uptime.summaries()
+    return [service_to_dict(service, summaries.get(service.id)) for service in MonitoredService.query.all()]
+
+def parse_check_settings(data, service=None):
+    # Optional per-service interval/timeout, clamped to sane bounds; ValueError on bad input
+    interval = data.get('interval', service.check_interval if service else None)
+    timeout = data.get('timeout', service.check_timeout if service else None)
+    try:
+        interval = max(5, int(interval)) if interval else current_app.config['SERVICE_CHECK_INTERVAL']
+        timeout = min(max(0.5, float(timeout)), 60.0) if timeout else current_app.config['SERVICE_CHECK_TIMEOUT']
+    except (TypeError, ValueError):
+        raise ValueError('interval and timeout must be numbers')
+    return interval, timeout
+
+def parse_http_settings(data, service=None):
+    # HTTP method, accepted status codes and optional keyword; ValueError on bad input
+    method = (data.get('method') or (service.http_method if service else None) or 'HEAD').upper()
+    if method not in ('HEAD', 'GET'):
+        raise ValueError('method must be HEAD or GET')
+    expected = data.get('expected_status', service.expected_status if service else None) or '200-299'
+    if not isinstance(expected, (str, int)) or isinstance(expected, bool):
+        raise ValueError('expected_status must be a string like "200-299,301"')
+    expected = str(expected)
+    parse_status_codes(expected)
+    keyword = data.get('keyword', service.keyword if service else None) or None
+    if keyword is not None and not isinstance(keyword, str):
+        raise ValueError('keyword must be a string')
+    if keyword and len(keyword) > 200:
+        raise ValueError('keyword too long (max 200)')
+    return method, expected.replace(' ', ''), keyword
+
 @main_bp.route('/api/services', methods=['GET', 'POST', 'PUT'])
 @login_required
 def services():
@@ -156,9 +182,17 @@ def services():
         url = data.get('url')
         stype = data.get('type', 'http')
         if name and url:
-            new_service = MonitoredService(name=name, url=url, type=stype)
+            try:
+                interval, timeout = parse_check_settings(data)
+                method, expected, keyword = parse_http_settings(data)
+            except ValueError as e:
+                return jsonify({'status': 'error', 'message': str(e)}), 400
+            new_service = MonitoredService(name=name, url=url, type=stype, check_interval=interval, check_timeout=timeout,
+                                           http_method=method, expected_status=expected, keyword=keyword)
             db.session.add(new_service)
             db.session.commit()
+            scheduler.schedule(new_service.id)
+            publish_services()
             return jsonify({'status': 'success', 'message': 'Service added'})
         return jsonify({'status': 'error', 'message': 'Missing data'}), 400
     
@@ -167,107 +201,54 @@ def services():
         sid = data.get('id')
         service = MonitoredService.query.get(sid)
         if service:
+            try:
+                interval, timeout = parse_check_settings(data, service)
+                service.http_method, service.expected_status, service.keyword = parse_http_settings(data, service)
+            except ValueError as e:
+                return jsonify({'status': 'error', 'message': str(e)}), 400
             service.name = data.get('name', service.name)
             service.url = data.get('url', service.url)
             service.type = data.get('type', service.type)
+            service.check_interval, service.check_timeout = interval, timeout
+            service.consecutive_failures = 0
             db.session.commit()
+            scheduler.schedule(service.id)
+            publish_services()
             return jsonify({'status': 'success', 'message': 'Service updated'})
         return jsonify({'status': 'error', 'message': 'Service not found'}), 404
 
-    # Check services status
-    services = MonitoredService.query.all()
-    results = []
-    for service in services:
-        try:
-            start = time.time()
-            if service.type == 'ping':
-                # Ping Logic
-                param = '-n' if platform.system().lower() == 'windows' else '-c'
-                # Clean URL if it contains protocol
-                target = service.url.replace('http://', '').replace('https://', '').split('/')[0]
-                command = ['ping', param, '1', target]
-                output = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                if output.returncode == 0:
-                    service.status = 'Up'
-                    # Try to parse ms if possible, or use wall clock
-                    service.response_time = round((time.time() - start) * 1000, 2)
-                else:
-                    service.status = 'Down'
-                    service.response_time = 0
-            else:
-                # HTTP Logic
-                if not service.url.startswith('http'):
-                    target_url = 'http://' + service.url
-                else:
-                    target_url = service.url
-                response = requests.get(target_url, timeout=5)
-                service.status = 'Up' if response.status_code == 200 else 'Down'
-                service.response_time = round(response.elapsed.total_seconds() * 1000, 2)
-        except Exception as e:
-            service.status = 'Down'
-            service.response_time = 0
-        
-        # Check for Down status and alert
-        if service.status == 'Down':
-             create_anomaly_notification('Servicio Caído', f'El servicio {service.name} ({service.url}) no responde.', 'danger')
-
-        service.last_checked = db.func.now()
-        results.append({
-            'id': service.id,
-            'name': service.name,
-            'url': service.url,
-            'type': service.type,
-            'status': service.status,
-            'response_time': service.response_time
-        })
-    db.session.commit()
-    return jsonify(results)
+    # Checks run in the background scheduler; this only reads the latest
+    # state and the precomputed uptime rollups
+    return jsonify(services_payload())
 
 @main_bp.route('/api/network/scan')
 @login_required
 def network_scan():
-    # Simple ARP scan using system command
-    devices = []
-    try:
-        command = ['arp', '-a']
-        output = subprocess.check_output(command).decode('utf-8', errors='ignore')
-        
-        # Parse output (Windows format mostly)
-        # Interface: 192.168.1.10 --- 0x12
-        #   Internet Address      Physical Address      Type
-        #   192.168.1.1           00-11-22-33-44-55     dynamic
-        
-        lines = output.split('\n')
-        current_interface = ""
-        
-        for line in lines:
-            line = line.strip()
-            if not line: continue
-            
-            if line.startswith('Interface:'):
-                current_interface = line.split()[1]
-                continue
-                
-            # Match IP and MAC
-            # Simple regex for IP
-            parts = line.split()
-            if len(parts) >= 2:
-                ip = parts[0]
-                mac = parts[1]
-                # Validate IP structure
-                if re.match(r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$", ip):
-                    # Filter out multicast/broadcast if needed
-                    if not ip.startswith('224.') and not ip.startswith('239.') and ip != '255.255.255.255':
-                        devices.append({
-                            'ip': ip,
-                            'mac': mac,
-                            'type': parts[2] if len(parts) > 2 else 'unknown',
-                            'interface': current_interface
-                        })
-    except Exception as e:
-        print(f"Scan error: {e}")
-        
-    return jsonify(devices)
+    # Neighbour table + concurrent subnet sweep. With ?stream=1 each device
+    # is sent as one NDJSON line as soon as it is found; a device may appear
+    # again later with more detail (e.g. its MAC), clients merge by IP.
+    full = request.args.get('full') == '1'
+    if request.args.get('stream') == '1':
+        def generate():
+            count = 0
+            for device in network_scanner.scan(full=full):
+                count += 1
+                yield json.dumps(device) + '\n'
+            yield json.dumps({'done': True, 'count': count}) + '\n'
+
+        return current_app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson',
+                                          headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    devices = {}
+    for device in network_scanner.scan(full=full):
+        devices[device['ip']] = device
+    return jsonify(list(devices.values()))
+
+@main_bp.route('/api/network/devices')
+@login_required
+def network_devices():
+    # Inventory only, no probing
+    return jsonify(network_scanner.devices())
 
 @main_bp.route('/api/services/<int:id>', methods=['DELETE'])
 @login_required
@@ -275,180 +256,464 @@ def delete_service(id):
     service = MonitoredService.query.get_or_404(id)
     db.session.delete(service)
     db.session.commit()
+    scheduler.remove(id)
+    history.drop(f'service.{id}.')
+    uptime.drop(id)
+    publish_services()
     return jsonify({'status': 'success'})
 
+@main_bp.route('/api/services/<int:id>/history')
+@login_required
+def service_history(id):
+    # Hourly rollups (uptime, mean, p95) over ?range= seconds (default 24h);
+    # with ?raw=1 the individual checks instead, newest first
+    MonitoredService.query.get_or_404(id)
+    end = request.args.get('end', time.time(), type=float)
+    start = request.args.get('start', type=float)
+    if start is None:
+        start = end - request.args.get('range', 86400, type=float)
+    if request.args.get('raw') == '1':
+        limit = min(request.args.get('limit', 500, type=int), 5000)
+        return jsonify({'start': start, 'end': end, 'checks': uptime.checks(id, start, end, limit)})
+    return jsonify({'start': start, 'end': end, 'hours': uptime.hourly(id, start, end)})
+
 @main_bp.route('/api/metrics')
 @login_required
 def metrics():
-    # System Metrics (Keep them as summary)
-    cpu_percent = psutil.cpu_percent(interval=None)
-    memory = psutil.virtual_memory()
-    disk = psutil.disk_usage('/')
-
-    # Check for Anomalies (Simple Thresholds)
-    if cpu_percent > 90:
-        create_anomaly_notification('Alta Carga de CPU', f'La CPU está al {cpu_percent}%', 'danger')
-    if memory.percent > 90:
-        create_anomaly_notification('Uso de Memoria Crítico', f'La memoria está al {memory.percent}%', 'warning')
-    
-    # --- Advanced Network Metrics ---
-    
-    # 1. Per-Interface Traffic
-    net_io_per_nic = psutil.net_io_counters(pernic=True)
-    net_if_stats = psutil.net_if_stats()
-    net_if_addrs = psutil.net_if_addrs()
-    
-    interfaces_data = {}
-    for nic, stats in net_io_per_nic.items():
-        if_info = net_if_stats.get(nic)
-        if_addr = net_if_addrs.get(nic)
-        
-        # Only show interfaces that are UP to reduce clutter
-        if if_info and if_info.isup:
-            ip_address = "N/A"
-            if if_addr:
-                for addr in if_addr:
-                    if addr.family == socket.AF_INET:
-                        ip_address = addr.address
-                        break
-            
-            interfaces_data[nic] = {
-                'bytes_sent': stats.bytes_sent,
-                'bytes_recv': stats.bytes_recv,
-                'is_up': if_info.isup,
-                'speed': if_info.speed,
-                'ip': ip_address
-            }
-
-    # 2. Active Connections (Simplified for performance)
-    # Getting process names can be slow, so we limit to top 15 ESTABLISHED connections
-    connections = []
+    # Served straight from the collector's latest snapshot (pre-encoded JSON).
+    # ?fields=cpu,memory,disk,total,interfaces,connections and ?iface=eth0,...
+    # narrow the payload; the ETag only covers what was selected.
+    snapshot = collector.snapshot()
+    fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()]
+    interfaces = [i.strip() for i in request.args.get('iface', '').split(',') if i.strip()]
+    unknown = [f for f in fields if f not in METRIC_FIELDS]
+    if unknown:
+        return jsonify({'status': 'error', 'message': f"Unknown fields: {', '.join(unknown)}"}), 400
+
+    if fields or interfaces:
+        payload, etag = select_metrics(snapshot.data, snapshot.etags, fields, interfaces)
+        body = json.dumps(payload)
+    else:
+        body, etag = snapshot.body, snapshot.etags['*']
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+def record_metrics_history(snapshot):
+    data = snapshot.data
+    ts = snapshot.timestamp
+    history.record('cpu', data['cpu'], ts)
+    history.record('memory', data['memory']['percent'], ts)
+    history.record('disk', data['disk']['percent'], ts)
+    # Interface traffic is stored as bytes/s, as computed by the collector
+    interfaces = dict(data['network']['interfaces'], total=data['network']['total'])
+    # Interfaces come and go (docker veths, VPN tunnels): forget the ones gone
+    history.retain('net.', {f'net.{nic}.{way}' for nic in interfaces for way in ('tx', 'rx')})
+    for nic, info in interfaces.items():
+        rates = info.get('rates')
+        if not rates:
+            continue
+        if rates['bytes_sent'] is not None:
+            history.record(f'net.{nic}.tx', rates['bytes_sent'], ts)
+        if rates['bytes_recv'] is not None:
+            history.record(f'net.{nic}.rx', rates['bytes_recv'], ts)
+
+def record_services_history(services):
+    for service in services:
+        if service.status == 'Up':
+            history.record(f'service.{service.id}.response_time', service.response_time)
+
+@main_bp.route('/api/metrics/history')
+@login_required
+def metrics_history():
+    names = request.args.getlist('series')
+    if not names:
+        return jsonify({'series': history.names()})
+
+    now = time.time()
+    end = request.args.get('end', now, type=float)
+    start = request.args.get('start', type=float)
+    if start is None:
+        start = end - request.args.get('range', 3600, type=float)
+    max_points = min(request.args.get('points', 500, type=int), 5000)
+
+    result = {}
+    for name in names:
+        found = history.query(name, start, end, max_points)
+        if found is not None:
+            resolution, points = found
+            # Each point: [timestamp, min, avg, max, last]
+            result[name] = {'resolution': resolution, 'points': points}
+    return jsonify({'start': start, 'end': end, 'series': result})
+
+# --- Alert Rules ---
+
+def rule_to_dict(rule):
+    return {column.name: getattr(rule, column.name) for column in AlertRule.__table__.columns}
+
+@main_bp.route('/api/rules', methods=['GET', 'POST'])
+@login_required
+def alert_rules():
+    if request.method == 'POST':
+        try:
+            rule = AlertRule(**validate_rule(request.json or {}))
+        except (ValueError, TypeError) as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        db.session.add(rule)
+        db.session.commit()
+        anomaly_detector.invalidate()
+        return jsonify({'status': 'success', 'rule': rule_to_dict(rule)})
+    return jsonify([rule_to_dict(rule) for rule in AlertRule.query.order_by(AlertRule.id)])
+
+@main_bp.route('/api/rules/<int:id>', methods=['PUT', 'DELETE'])
+@login_required
+def alert_rule(id):
+    rule = AlertRule.query.get_or_404(id)
+    if request.method == 'DELETE':
+        db.session.delete(rule)
+    else:
+        # Partial updates: missing fields keep their current value
+        try:
+            values = validate_rule(dict(rule_to_dict(rule), **(request.json or {})))
+        except (ValueError, TypeError) as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        for field, value in values.items():
+            setattr(rule, field, value)
+    db.session.commit()
+    anomaly_detector.invalidate()
+    return jsonify({'status': 'success'})
+
+@main_bp.route('/api/rules/replay', methods=['POST'])
+@login_required
+def replay_rules():
+    # Body: NDJSON recorded with RULES_RECORD_FILE. Runs the enabled rules
+    # on a fresh engine and returns the alerts they would have raised;
+    # nothing is notified.
     try:
-        # Requires permissions on some OS, handles errors gracefully
-        conns = psutil.net_connections(kind='inet')
-        established_conns = [c for c in conns if c.status == 'ESTABLISHED']
-        
-        # Sort by most recent (not exactly possible with psutil, just take first few)
-        for c in established_conns[:15]: 
-            try:
-                process = psutil.Process(c.pid)
-                process_name = process.name()
-            except (psutil.NoSuchProcess, psutil.AccessDenied, AttributeError):
-                process_name = "Unknown/System"
-                
-            connections.append({
-                'fd': c.fd,
-                'family': c.family,
-                'type': c.type,
-                'laddr': f"{c.laddr.ip}:{c.laddr.port}" if c.laddr else "N/A",
-                'raddr': f"{c.raddr.ip}:{c.raddr.port}" if c.raddr else "N/A",
-                'status': c.status,
-                'pid': c.pid,
-                'process': process_name
-            })
-    except Exception as e:
-        print(f"Error getting connections: {e}")
-
-    # 3. Global Total
-    net_io_total = psutil.net_io_counters()
+        alerts = anomaly_detector.replay(read_stream(request.get_data(as_text=True).splitlines()))
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({'status': 'error', 'message': f'Invalid stream: {e}'}), 400
+    return jsonify([alert._asdict() for alert in alerts])
 
-    return jsonify({
-        'cpu': cpu_percent,
-        'memory': {
-            'total': memory.total,
-            'percent': memory.percent,
-            'used': memory.used
-        },
-        'disk': {
-            'percent': disk.percent,
-            'free': disk.free
-        },
-        'network': {
-            'total': {
-                'bytes_sent': net_io_total.bytes_sent,
-                'bytes_recv': net_io_total.bytes_recv
-            },
-            'interfaces': interfaces_data,
-            'connections': connections
-        }
+# --- Remote Hosts (agent.py) ---
+
+HOST_SERIES = ('cpu', 'memory', 'disk', 'net_tx', 'net_rx')
+
+@main_bp.route('/api/ingest', methods=['POST'])
+def ingest():
+    # Batches from remote agents: bearer token instead of a login session
+    token = current_app.config.get('INGEST_TOKEN')
+    if not token:
+        return jsonify({'status': 'error', 'message': 'Ingest disabled (INGEST_TOKEN not set)'}), 403
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify({'status': 'error', 'message': 'Unauthorized'}), 401
+    max_bytes = current_app.config['INGEST_MAX_BYTES']
+    if request.content_length and request.content_length > max_bytes:
+        return jsonify({'status': 'error', 'message': 'Payload too large'}), 413
+
+    try:
+        payload = decode_payload(request.get_data(), request.headers.get('Content-Encoding'), max_bytes)
+        accepted = host_inventory.ingest(payload, request.remote_addr)
+    except IngestError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), e.status
+    INGEST_SAMPLES.inc(accepted)
+    return jsonify({'status': 'success', 'accepted': accepted})
+
+@main_bp.route('/api/hosts')
+@login_required
+def list_hosts():
+    return jsonify(host_inventory.hosts())
+
+@main_bp.route('/api/hosts/<name>')
+@login_required
+def host_detail(name):
+    # Latest full sample, same shape as /api/metrics
+    host = Host.query.filter_by(name=name).first()
+    if not host:
+        return jsonify({'status': 'error', 'message': 'Host not found'}), 404
+    result = host_to_dict(host, current_app.config['HOST_STALE_AFTER'])
+    result['metrics'] = json.loads(host.last_sample) if host.last_sample else None
+    return jsonify(result)
+
+@main_bp.route('/api/hosts/<name>/history')
+@login_required
+def host_history(name):
+    host = Host.query.filter_by(name=name).first()
+    if not host:
+        return jsonify({'status': 'error', 'message': 'Host not found'}), 404
+    series = [s for s in request.args.getlist('series') if s in HOST_SERIES] or list(HOST_SERIES)
+    end = request.args.get('end', time.time(), type=float)
+    start = request.args.get('start', type=float)
+    if start is None:
+        start = end - request.args.get('range', 3600, type=float)
+    max_points = min(request.args.get('points', 500, type=int), 5000)
+    return jsonify({'start': start, 'end': end, 'series': host_inventory.history(host, series, start, end, max_points)})
+
+@main_bp.route('/api/connections')
+@login_required
+def connections():
+    # Full TCP/UDP socket table with server-side filtering (?proto=tcp|udp,
+    # state, process, port, cidr), sorting, paging and aggregation
+    # (?group=process|remote)
+    args = request.args
+    try:
+        result = connection_table.query(
+            state=args.get('state'),
+            process=args.get('process'),
+            port=args.get('port', type=int),
+            cidr=args.get('cidr'),
+            sort=args.get('sort'),
+            descending=args.get('order') == 'desc',
+            page=args.get('page', 1, type=int),
+            per_page=args.get('per_page', 50, type=int),
+            group=args.get('group'),
+            with_process=args.get('process_info', '1') != '0',
+            top=args.get('top', 20, type=int),
+            proto=args.get('proto'),
+        )
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return jsonify(result)
+
+@main_bp.route('/api/processes')
+@login_required
+def processes():
+    # Top-N processes by ?sort=cpu|memory|io|connections; the connection
+    # count is only computed when sorting by it or with ?connections=1
+    args = request.args
+    try:
+        result = process_table.top(
+            sort=args.get('sort', 'cpu'),
+            limit=args.get('limit', 20, type=int),
+            with_connections=args.get('connections') == '1',
+        )
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    result['timestamp'] = time.time()
+    return jsonify(result)
+
+# --- Export ---
+
+def export_range(default=86400):
+    end = request.args.get('end', time.time(), type=float)
+    start = request.args.get('start', type=float)
+    if start is None:
+        start = end - request.args.get('range', default, type=float)
+    return start, end
+
+def export_response(name, columns, rows):
+    # ?format=csv|ndjson, gzip'd on the fly unless ?gzip=0. The generator
+    # runs while the response is written, so memory does not grow with the
+    # number of rows.
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        return jsonify({'status': 'error', 'message': f"format must be one of {', '.join(FORMATS)}"}), 400
+    chunks = encode_rows(columns, rows, fmt)
+    filename = f'{name}-{time.strftime("%Y%m%d-%H%M%S")}.{fmt}'
+    if request.args.get('gzip', '1') != '0':
+        body = gzip_chunks(chunks)
+        mimetype = 'application/gzip'
+        filename += '.gz'
+    else:
+        body = (chunk.encode() for chunk in chunks)
+        mimetype = FORMATS[fmt]
+    return current_app.response_class(stream_with_context(body), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
     })
 
-def create_anomaly_notification(title, message, type):
-    # Prevent duplicate notifications in short time window (simple logic)
-    last_notif = Notification.query.filter_by(title=title).order_by(Notification.timestamp.desc()).first()
-    if last_notif:
-        # If less than 5 mins, skip
-        delta = time.time() - last_notif.timestamp.timestamp()
-        if delta < 300: 
-            return
+@main_bp.route('/api/export/metrics')
+@login_required
+def export_metrics():
+    # Local series from the in-memory history (?series=cpu&series=net.eth0.tx,
+    # all by default) or, with ?host=<name>, the raw samples sent by that
+    # remote agent
+    start, end = export_range()
+    name = request.args.get('host')
+    if name is None:
+        names = request.args.getlist('series') or history.names()
+        return export_response('metrics', ['series', 'resolution', 'timestamp', 'min', 'avg', 'max', 'last'],
+                               history_rows(history, names, start, end))
+
+    host = Host.query.filter_by(name=name).first()
+    if not host:
+        return jsonify({'status': 'error', 'message': 'Host not found'}), 404
+    series = [s for s in request.args.getlist('series') if s in HOST_SERIES] or list(HOST_SERIES)
+    statement = (select(HostSample.timestamp, *(getattr(HostSample, s) for s in series))
+                 .where(HostSample.host_id == host.id, HostSample.timestamp >= start, HostSample.timestamp <= end)
+                 .order_by(HostSample.timestamp))
+    return export_response(f'host-{host.name}', ['timestamp'] + series, query_rows(statement))
+
+@main_bp.route('/api/export/checks')
+@login_required
+def export_checks():
+    # Raw check results still within CHECK_RESULT_RETENTION_HOURS; filter
+    # with ?service_id= (repeatable)
+    start, end = export_range()
+    statement = (select(ServiceCheck.service_id, MonitoredService.name, ServiceCheck.timestamp, ServiceCheck.up,
+                        ServiceCheck.response_time, ServiceCheck.error, ServiceCheck.dns_time,
+                        ServiceCheck.connect_time, ServiceCheck.tls_time, ServiceCheck.ttfb)
+                 .join(MonitoredService, MonitoredService.id == ServiceCheck.service_id)
+                 .where(ServiceCheck.timestamp >= start, ServiceCheck.timestamp <= end)
+                 .order_by(ServiceCheck.service_id, ServiceCheck.timestamp))
+    service_ids = request.args.getlist('service_id', type=int)
+    if service_ids:
+        statement = statement.where(ServiceCheck.service_id.in_(service_ids))
+    return export_response('checks', ['service_id', 'service', 'timestamp', 'up', 'response_time', 'error',
+                                      'dns_time', 'connect_time', 'tls_time', 'ttfb'], query_rows(statement))
+
+@main_bp.route('/api/export/notifications')
+@login_required
+def export_notifications():
+    # ?type=info|warning|danger; timestamps are UTC like the stored rows
+    start, end = export_range(30 * 86400)
+    statement = (select(Notification.id, Notification.timestamp, Notification.type, Notification.title,
+                        Notification.message, Notification.read)
+                 .where(Notification.timestamp >= datetime.fromtimestamp(start, timezone.utc).replace(tzinfo=None),
+                        Notification.timestamp <= datetime.fromtimestamp(end, timezone.utc).replace(tzinfo=None))
+                 .order_by(Notification.timestamp))
+    if request.args.get('type'):
+        statement = statement.where(Notification.type == request.args['type'])
+    return export_response('notifications', ['id', 'timestamp', 'type', 'title', 'message', 'read'],
+                           query_rows(statement))
+
+def create_anomaly_notification(title, message, type, commit=True):
+    # Prevent duplicate notifications in short time window (in-memory index)
+    if not notification_feed.should_create(title):
+        return
 
     notif = Notification(title=title, message=message, type=type)
     db.session.add(notif)
-    db.session.commit()
-    
-    # Send Telegram Alert if enabled
-    if current_user.is_authenticated and current_user.settings and current_user.settings.notifications_enabled:
-        send_telegram_alert(current_user, title, message)
-        send_whatsapp_alert(current_user, title, message)
+
+    # Queue Telegram/WhatsApp alerts; the alert worker delivers them
+    if has_request_context():
+        recipients = [current_user] if current_user.is_authenticated else []
+    else:
+        # Background checks (collector) have no session user: alert everyone
+        recipients = User.query.join(AppSettings).filter(AppSettings.notifications_enabled == True).all()
+    enqueue_alert(recipients, title, message)
+
+    if commit:
+        db.session.commit()
+        publish_notifications()
+        alert_worker.wake()
 
 @main_bp.route('/api/notifications')
 @login_required
 def get_notifications():
-    notifications = Notification.query.order_by(Notification.timestamp.desc()).limit(10).all()
-    unread_count = Notification.query.filter_by(read=False).count()
+    since_id = request.args.get('since_id', type=int)
+    if since_id is None:
+        return jsonify(notifications_payload())
+
+    # Incremental feed: only rows newer than the client's cursor (PK scan)
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    notifications = Notification.query.filter(Notification.id > since_id).order_by(Notification.id).limit(limit).all()
     return jsonify({
-        'unread_count': unread_count,
-        'list': [{
-            'id': n.id,
-            'title': n.title,
-            'message': n.message,
-            'type': n.type,
-            'time': n.timestamp.strftime('%H:%M:%S'),
-            'read': n.read
-        } for n in notifications]
+        'unread_count': notification_feed.unread_count(),
+        'since_id': since_id,
+        'last_id': notifications[-1].id if notifications else since_id,
+        'list': [notification_to_dict(n) for n in notifications]
     })
 
+def notification_to_dict(n):
+    return {
+        'id': n.id,
+        'title': n.title,
+        'message': n.message,
+        'type': n.type,
+        'time': n.timestamp.strftime('%H:%M:%S'),
+        'read': n.read
+    }
+
+def notifications_payload():
+    notifications = Notification.query.order_by(Notification.timestamp.desc()).limit(10).all()
+    return {
+        'unread_count': notification_feed.unread_count(),
+        'last_id': max((n.id for n in notifications), default=0),
+        'list': [notification_to_dict(n) for n in notifications]
+    }
+
 @main_bp.route('/api/notifications/mark_read', methods=['POST'])
 @login_required
 def mark_notifications_read():
     Notification.query.filter_by(read=False).update({'read': True})
     db.session.commit()
+    notification_feed.resync()
+    publish_notifications()
     return jsonify({'status': 'success'})
 
 @main_bp.route('/api/ping')
 @login_required
 def ping_check():
-    target = "8.8.8.8" # Google DNS
-    try:
-        # Simple ping implementation
-        # Windows uses -n, Linux uses -c
-        param = '-n' if platform.system().lower() == 'windows' else '-c'
-        command = ['ping', param, '1', target]
-        
-        # Don't use start/end time for latency, use parsing
-        # Use cp850 for Windows encoding or utf-8 as fallback
+    # Latest result from the background latency monitor
+    return jsonify(latency_monitor.latest())
+
+def record_ping_history(result):
+    if result['status'] == 'ok':
+        history.record('ping.latency', result['latency'], result['timestamp'])
+
+# --- Event Stream ---
+
+def publish_metrics(snapshot):
+    events.publish('metrics', snapshot.data)
+
+def publish_ping(result):
+    events.publish('ping', result)
+
+def publish_services():
+    events.publish('services', services_payload())
+
+def publish_notifications():
+    events.publish('notifications', notifications_payload())
+
+def publish_service_updates(services):
+    # Scheduler sweeps may also have created "Servicio Caído" notifications
+    publish_services()
+    publish_notifications()
+
+@main_bp.route('/api/stream')
+@login_required
+def stream():
+    # One long-lived response per tab replaces the four polling loops.
+    # Typed events are pushed as data changes, as deltas against what this
+    # connection has already received.
+    def generate():
+        state = StreamState()
+        seq = 0
+        STREAM_CLIENTS.inc()
         try:
-            output = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding='cp850')
-        except:
-            output = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding='utf-8', errors='ignore')
-        
-        if output.returncode == 0:
-            # Parse output for time=XXms or tiempo=XXms
-            # Regex handles both English (time=) and Spanish (tiempo=) and < symbol
-            match = re.search(r'(?:time|tiempo)[=<]([\d\.]+)(?: ?ms)?', output.stdout, re.IGNORECASE)
-            if match:
-                latency_ms = float(match.group(1))
-            else:
-                # Fallback if parsing fails but ping succeeded (e.g. rare output format)
-                # Try to find any "ms" value
-                match_ms = re.search(r'([\d\.]+) ?ms', output.stdout)
-                if match_ms:
-                    latency_ms = float(match_ms.group(1))
-                else:
-                    latency_ms = 10.0 # Default fallback
-            
-            return jsonify({'status': 'ok', 'latency': latency_ms, 'target': target})
-        else:
-            return jsonify({'status': 'error', 'latency': -1, 'target': target})
-    except Exception as e:
-        return jsonify({'status': 'error', 'latency': -1, 'error': str(e)})
+            yield 'retry: 3000\n\n'
+            while True:
+                pending = events.wait(seq, timeout=15)
+                if not pending:
+                    yield ': keep-alive\n\n'
+                    continue
+                for event_seq, event, payload in pending:
+                    seq = max(seq, event_seq)
+                    delta = state.diff(event, payload)
+                    if delta is not None:
+                        yield format_event(event, delta)
+        finally:
+            STREAM_CLIENTS.dec()
+
+    # Seed anything not published yet in this process; everything else is
+    # replayed from the hub's latest state when the tab subscribes
+    if not events.has('metrics'):
+        publish_metrics(collector.snapshot())
+    if not events.has('services'):
+        publish_services()
+    if not events.has('notifications'):
+        publish_notifications()
+    return current_app.response_class(generate(), mimetype='text/event-stream',
+                                      headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@main_bp.route('/metrics')
+def prometheus_metrics():
+    # Prometheus text format: the dashboard's own cost. Open unless
+    # METRICS_TOKEN is set, then a matching bearer token is required.
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify({'status': 'error', 'message': 'Unauthorized'}), 401
+    return current_app.response_class(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
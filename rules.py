@@ -0,0 +1,409 @@
+import argparse
+import json
+import math
+import sys
+import threading
+import time
+from collections import deque, namedtuple
+
+KINDS = ('threshold', 'ewma', 'rate', 'flapping')
+OPERATORS = {
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+}
+SEVERITIES = ('info', 'warning', 'danger')
+
+# Plain copy of an AlertRule row, so the engine never touches the session
+Rule = namedtuple('Rule', ['id', 'name', 'kind', 'metric', 'operator', 'threshold', 'duration', 'alpha',
+                           'min_delta', 'window', 'count', 'severity', 'message'])
+
+Alert = namedtuple('Alert', ['rule_id', 'title', 'message', 'severity', 'key', 'value', 'timestamp'])
+
+# Replaces the old fixed "> 90" checks. Seeded once into an empty table.
+DEFAULT_RULES = (
+    {'name': 'Alta Carga de CPU', 'kind': 'threshold', 'metric': 'cpu', 'operator': '>', 'threshold': 85,
+     'duration': 120, 'severity': 'danger', 'message': 'La CPU está al {value:.1f}% desde hace {duration:.0f} s'},
+    {'name': 'Uso de Memoria Crítico', 'kind': 'threshold', 'metric': 'memory', 'operator': '>', 'threshold': 90,
+     'duration': 60, 'severity': 'warning', 'message': 'La memoria está al {value:.1f}% desde hace {duration:.0f} s'},
+    {'name': 'Disco casi lleno', 'kind': 'threshold', 'metric': 'disk', 'operator': '>', 'threshold': 90,
+     'duration': 0, 'severity': 'warning', 'message': 'El disco está al {value:.1f}%'},
+    {'name': 'Servicio inestable', 'kind': 'flapping', 'metric': 'service.*.status', 'window': 900, 'count': 4,
+     'severity': 'warning', 'message': '{label} cambió de estado {count} veces en {window:.0f} s'},
+    {'name': 'CPU fuera de lo normal', 'kind': 'ewma', 'metric': 'cpu', 'operator': '>', 'threshold': 4,
+     'alpha': 0.02, 'min_delta': 20, 'duration': 30, 'severity': 'info', 'enabled': False,
+     'message': 'CPU al {value:.1f}%, su media reciente es {baseline:.1f}%'},
+    {'name': 'Errores de red', 'kind': 'threshold', 'metric': 'net.*.errin', 'operator': '>', 'threshold': 10,
+     'duration': 30, 'severity': 'warning', 'enabled': False,
+     'message': '{label}: {value:.1f} errores de entrada por segundo'},
+    {'name': 'Tráfico de entrada elevado', 'kind': 'rate', 'metric': 'net.total.bytes_recv', 'operator': '>',
+     'threshold': 50e6, 'duration': 60, 'severity': 'warning', 'enabled': False,
+     'message': 'Entrando {value:.0f} B/s desde hace {duration:.0f} s'},
+)
+
+# Samples an EWMA rule needs before its baseline is trusted
+EWMA_WARMUP = 30
+
+
+def rule_from_model(model):
+    return Rule(model.id, model.name, model.kind, model.metric, model.operator or '>', model.threshold or 0.0,
+                model.duration or 0.0, model.alpha or 0.05, model.min_delta or 0.0, model.window or 600.0,
+                model.count or 4, model.severity or 'warning', model.message)
+
+
+def validate_rule(data):
+    # Normalises an API payload into AlertRule column values; ValueError on bad input
+    values = {}
+    values['name'] = str(data.get('name') or '').strip()[:100]
+    if not values['name']:
+        raise ValueError('name is required')
+    values['kind'] = data.get('kind', 'threshold')
+    if values['kind'] not in KINDS:
+        raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+    values['metric'] = str(data.get('metric') or '').strip()
+    if not parse_metric(values['metric']):
+        raise ValueError(f"Unknown metric: {values['metric']}")
+    values['operator'] = data.get('operator', '>')
+    if values['operator'] not in OPERATORS:
+        raise ValueError(f"operator must be one of {', '.join(OPERATORS)}")
+    values['severity'] = data.get('severity', 'warning')
+    if values['severity'] not in SEVERITIES:
+        raise ValueError(f"severity must be one of {', '.join(SEVERITIES)}")
+    for field, default in (('threshold', 0.0), ('duration', 0.0), ('alpha', 0.05), ('min_delta', 0.0),
+                           ('window', 600.0)):
+        values[field] = float(data.get(field, default))
+        if not math.isfinite(values[field]):
+            raise ValueError(f'{field} must be a number')
+    if not 0 < values['alpha'] <= 1:
+        raise ValueError('alpha must be in (0, 1]')
+    if values['duration'] < 0 or values['window'] <= 0:
+        raise ValueError('duration and window must be positive')
+    values['count'] = int(data.get('count', 4))
+    if values['count'] < 2:
+        raise ValueError('count must be at least 2')
+    values['message'] = (data.get('message') or '')[:255] or None
+    values['enabled'] = parse_bool(data.get('enabled', True), 'enabled')
+    return values
+
+
+def parse_bool(value, field):
+    # JSON booleans, 0/1 and the usual strings; bool("false") would be True
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in ('true', '1', 'yes', 'on'):
+        return True
+    if isinstance(value, str) and value.strip().lower() in ('false', '0', 'no', 'off'):
+        return False
+    raise ValueError(f'{field} must be true or false')
+
+
+def parse_metric(metric):
+    # "cpu" | "memory" | "disk" | "net.<iface|total|*>.<field>" |
+    # "service.<id|*>.<status|response_time>"
+    if metric in ('cpu', 'memory', 'disk'):
+        return ('system', metric)
+    parts = metric.split('.')
+    if len(parts) == 3 and parts[0] == 'net' and parts[1] and parts[2] in NET_FIELDS:
+        return ('net', parts[1], parts[2])
+    if len(parts) == 3 and parts[0] == 'service' and (parts[1] == '*' or parts[1].isdigit()) \
+            and parts[2] in ('status', 'response_time'):
+        return ('service', parts[1], parts[2])
+    return None
+
+
+# rx/tx are the collector's bytes/s; the rest are per-second rates of the
+# interface counters, except bytes_sent/bytes_recv which are the raw counters
+# (for "rate" rules)
+NET_FIELDS = ('rx', 'tx', 'bytes_sent', 'bytes_recv', 'packets_sent', 'packets_recv', 'errin', 'errout',
+              'dropin', 'dropout')
+RAW_COUNTERS = ('.bytes_sent', '.bytes_recv')
+
+
+def _net_value(info, field):
+    rates = info.get('rates') or {}
+    if field == 'rx':
+        return rates.get('bytes_recv')
+    if field == 'tx':
+        return rates.get('bytes_sent')
+    if field in ('bytes_sent', 'bytes_recv'):
+        return info.get(field)
+    return rates.get(field)
+
+
+def metric_values(parsed, data):
+    # Yields (key, label, value) for one metrics sample
+    if parsed[0] == 'system':
+        value = data['cpu'] if parsed[1] == 'cpu' else data[parsed[1]]['percent']
+        yield parsed[1], parsed[1], value
+        return
+    if parsed[0] != 'net':
+        return
+    network = data['network']
+    interfaces = dict(network['interfaces'], total=network['total'])
+    names = interfaces if parsed[1] == '*' else [parsed[1]]
+    for name in names:
+        info = interfaces.get(name)
+        if info is not None:
+            yield name, name, _net_value(info, parsed[2])
+
+
+def service_values(parsed, services):
+    # Yields (key, label, value) for the services of one check sweep
+    if parsed[0] != 'service':
+        return
+    for service in services:
+        if parsed[1] != '*' and int(parsed[1]) != service.id:
+            continue
+        if parsed[2] == 'status':
+            value = 1.0 if service.status == 'Up' else 0.0
+        else:
+            value = service.response_time if service.status == 'Up' else None
+        yield service.id, service.name, value
+
+
+# Per (rule, key) state. Everything is a handful of numbers plus, for
+# flapping, at most `count` timestamps, so each sample costs O(1).
+class RuleState:
+    __slots__ = ('since', 'fired', 'mean', 'var', 'samples', 'previous', 'previous_ts', 'transitions')
+
+    def __init__(self, rule):
+        self.since = None
+        self.fired = False
+        self.mean = None
+        self.var = 0.0
+        self.samples = 0
+        self.previous = None
+        self.previous_ts = None
+        self.transitions = deque(maxlen=rule.count) if rule.kind == 'flapping' else None
+
+
+# Evaluates rules against metrics samples and service sweeps. Pure: no
+# database and no clock of its own (timestamps come with the samples), so a
+# recorded stream replays exactly as it ran.
+class RuleEngine:
+    def __init__(self, rules=()):
+        self._rules = []
+        self._states = {}
+        self.set_rules(rules)
+
+    def set_rules(self, rules):
+        # State survives for rules whose definition did not change
+        compiled = [(rule, parse_metric(rule.metric)) for rule in rules]
+        self._rules = [(rule, parsed) for rule, parsed in compiled if parsed]
+        keep = {rule for rule, _ in self._rules}
+        self._states = {key: state for key, state in self._states.items() if key[0] in keep}
+
+    def evaluate_metrics(self, timestamp, data):
+        alerts = []
+        for rule, parsed in self._rules:
+            for key, label, value in metric_values(parsed, data):
+                self._step(rule, key, label, value, timestamp, alerts)
+        return alerts
+
+    def evaluate_services(self, timestamp, services):
+        alerts = []
+        for rule, parsed in self._rules:
+            for key, label, value in service_values(parsed, services):
+                self._step(rule, key, label, value, timestamp, alerts)
+        return alerts
+
+    def replay(self, stream):
+        # stream: iterable of {'timestamp': ..., 'metrics': data} or
+        # {'timestamp': ..., 'services': [{id, name, status, response_time}]}
+        alerts = []
+        for item in stream:
+            if 'metrics' in item:
+                alerts.extend(self.evaluate_metrics(item['timestamp'], item['metrics']))
+            elif 'services' in item:
+                services = [ServiceSample(s['id'], s.get('name', ''), s.get('status'), s.get('response_time'))
+                            for s in item['services']]
+                alerts.extend(self.evaluate_services(item['timestamp'], services))
+        return alerts
+
+    def _step(self, rule, key, label, value, ts, alerts):
+        if value is None:
+            return
+        state = self._states.get((rule, key))
+        if state is None:
+            state = self._states[(rule, key)] = RuleState(rule)
+        context = {'value': value, 'label': label, 'metric': rule.metric, 'threshold': rule.threshold,
+                   'duration': 0.0, 'window': rule.window, 'count': rule.count, 'baseline': value}
+
+        if rule.kind == 'flapping':
+            if state.previous is not None and value != state.previous:
+                state.transitions.append(ts)
+            state.previous = value
+            if len(state.transitions) == rule.count and ts - state.transitions[0] <= rule.window:
+                state.transitions.clear()
+                alerts.append(self._alert(rule, key, label, value, ts, context))
+            return
+
+        if rule.kind == 'rate':
+            previous, previous_ts = state.previous, state.previous_ts
+            state.previous, state.previous_ts = value, ts
+            if previous is None or ts <= previous_ts or value < previous and rule.metric.endswith(RAW_COUNTERS):
+                # First sample, or a counter reset
+                self._hold(state, False, ts)
+                return
+            value = context['value'] = (value - previous) / (ts - previous_ts)
+            condition = OPERATORS[rule.operator](value, rule.threshold)
+        elif rule.kind == 'ewma':
+            condition = False
+            if state.mean is None:
+                state.mean = value
+            else:
+                diff = value - state.mean
+                std = math.sqrt(state.var)
+                context['baseline'] = state.mean
+                if state.samples >= EWMA_WARMUP and abs(diff) >= rule.min_delta and std > 0:
+                    condition = OPERATORS[rule.operator](diff / std, rule.threshold)
+                # Anomalous samples still pull the mean (a lasting level
+                # shift becomes the new normal) but do not widen the variance
+                increment = rule.alpha * diff
+                state.mean += increment
+                if not condition:
+                    state.var = (1 - rule.alpha) * (state.var + diff * increment)
+            state.samples += 1
+        else:
+            condition = OPERATORS[rule.operator](value, rule.threshold)
+
+        if self._hold(state, condition, ts) and ts - state.since >= rule.duration:
+            state.fired = True
+            context['duration'] = ts - state.since
+            alerts.append(self._alert(rule, key, label, value, ts, context))
+
+    def _hold(self, state, condition, ts):
+        # Sustained-duration window: True while the condition holds and the
+        # rule has not fired yet for this episode
+        if not condition:
+            state.since = None
+            state.fired = False
+            return False
+        if state.since is None:
+            state.since = ts
+        return not state.fired
+
+    def _alert(self, rule, key, label, value, ts, context):
+        wildcard = '*' in rule.metric
+        title = f'{rule.name} ({label})' if wildcard else rule.name
+        message = rule.message or '{label}: {value:.2f} ({metric})'
+        try:
+            message = message.format(**context)
+        except (KeyError, ValueError, IndexError):
+            message = f'{label}: {value} ({rule.metric})'
+        return Alert(rule.id, title[:100], message[:255], rule.severity, key, value, ts)
+
+
+ServiceSample = namedtuple('ServiceSample', ['id', 'name', 'status', 'response_time'])
+
+
+# Runs the rule engine in the leader's background jobs: the collector feeds
+# every metrics sample and the scheduler every completed sweep, so alerts no
+# longer depend on someone polling. Rules are reloaded from AlertRule after
+# API changes and every RULES_RELOAD_INTERVAL (changes made through another
+# worker). With RULES_RECORD_FILE set, every evaluated input is appended as
+# NDJSON in the format RuleEngine.replay() reads.
+class AnomalyDetector:
+    def __init__(self):
+        self.app = None
+        self.engine = RuleEngine()
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['anomaly_detector'] = self
+
+    def seed_defaults(self):
+        from models import AlertRule
+        from extensions import db
+
+        if AlertRule.query.first() is None:
+            for values in DEFAULT_RULES:
+                db.session.add(AlertRule(**dict(validate_rule(values))))
+            db.session.commit()
+
+    def rules(self):
+        from models import AlertRule
+        return [rule_from_model(rule) for rule in AlertRule.query.filter_by(enabled=True).order_by(AlertRule.id)]
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def _refresh(self):
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.app.config['RULES_RELOAD_INTERVAL']:
+            return
+        self.engine.set_rules(self.rules())
+        self._loaded_at = time.monotonic()
+
+    def on_metrics(self, snapshot):
+        with self._lock:
+            self._refresh()
+            alerts = self.engine.evaluate_metrics(snapshot.timestamp, snapshot.data)
+        self._record({'timestamp': snapshot.timestamp, 'metrics': snapshot.data})
+        self._notify(alerts)
+
+    def on_services(self, services):
+        now = time.time()
+        with self._lock:
+            self._refresh()
+            alerts = self.engine.evaluate_services(now, services)
+        self._record({'timestamp': now, 'services': [
+            {'id': s.id, 'name': s.name, 'status': s.status, 'response_time': s.response_time} for s in services]})
+        self._notify(alerts)
+
+    def replay(self, stream, rules=None):
+        # Fresh engine: live state is left untouched
+        return RuleEngine(self.rules() if rules is None else rules).replay(stream)
+
+    def _notify(self, alerts):
+        from routes import create_anomaly_notification
+        for alert in alerts:
+            create_anomaly_notification(alert.title, alert.message, alert.severity)
+
+    def _record(self, item):
+        path = self.app.config.get('RULES_RECORD_FILE')
+        if path:
+            with open(path, 'a') as f:
+                f.write(json.dumps(item, separators=(',', ':')) + '\n')
+
+
+def read_stream(lines):
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def main(argv=None):
+    # Offline replay: python rules.py recorded.ndjson [--rules rules.json]
+    parser = argparse.ArgumentParser(description='Reproduce un flujo de muestras grabado contra las reglas de alerta')
+    parser.add_argument('stream', help='NDJSON grabado con RULES_RECORD_FILE ("-" para stdin)')
+    parser.add_argument('--rules', help='JSON con una lista de reglas; por defecto las de la base de datos')
+    args = parser.parse_args(argv)
+
+    if args.rules:
+        with open(args.rules) as f:
+            rules = [Rule(id=i, **{k: v for k, v in validate_rule(data).items() if k != 'enabled'})
+                     for i, data in enumerate(json.load(f), 1)]
+    else:
+        from app import create_app
+        app = create_app()
+        from extensions import anomaly_detector
+        with app.app_context():
+            rules = anomaly_detector.rules()
+
+    stream = sys.stdin if args.stream == '-' else open(args.stream)
+    with stream:
+        alerts = RuleEngine(rules).replay(read_stream(stream))
+    for alert in alerts:
+        print(json.dumps(alert._asdict(), ensure_ascii=False))
+    print(f'{len(alerts)} alertas', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
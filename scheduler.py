@@ -0,0 +1,177 @@
+import heapq
+import random
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from checks import CheckTarget, run_checks
+
+# What a sweep hands to its listeners: plain values copied before the commit,
+# so reading them does not reload every expired row
+ServiceState = namedtuple('ServiceState', ['id', 'name', 'url', 'type', 'status', 'response_time', 'last_checked',
+                                           'check_interval', 'consecutive_failures'])
+
+
+# Server-side service checker. Services sit in a min-heap keyed by their next
+# due time; the scheduler thread sleeps until the earliest one is due, checks
+# every service that is due in a single concurrent sweep and pushes each one
+# back with its own interval (plus jitter, plus backoff while Down).
+class CheckScheduler:
+    def __init__(self):
+        self.app = None
+        self._heap = []
+        self._versions = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['check_scheduler'] = self
+
+    def add_listener(self, listener):
+        # Called in the scheduler thread, inside an app context, with a
+        # ServiceState per service updated by each sweep (already committed).
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._load()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='check-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def schedule(self, service_id, delay=0.0):
+        with self._lock:
+            self._push(service_id, time.time() + delay)
+        self._wake.set()
+
+    def remove(self, service_id):
+        # Lazy deletion: stale heap entries are dropped when popped
+        with self._lock:
+            self._versions.pop(service_id, None)
+
+    def sync(self):
+        # Pick up services added or deleted by another worker process
+        from models import MonitoredService
+        from extensions import db
+        ids = {service_id for service_id, in db.session.query(MonitoredService.id)}
+        with self._lock:
+            for service_id in ids - set(self._versions):
+                self._push(service_id, time.time())
+            for service_id in set(self._versions) - ids:
+                self._versions.pop(service_id, None)
+        self._wake.set()
+
+    def _push(self, service_id, due):
+        version = self._versions.get(service_id, 0) + 1
+        self._versions[service_id] = version
+        heapq.heappush(self._heap, (due, service_id, version))
+
+    def _load(self):
+        from models import MonitoredService
+        now = time.time()
+        with self.app.app_context():
+            for service in MonitoredService.query.all():
+                # Resume where we left off after a restart, spreading the
+                # backlog of overdue services over their first interval.
+                interval = service.check_interval or self.app.config['SERVICE_CHECK_INTERVAL']
+                if service.last_checked:
+                    due = service.last_checked.timestamp() + self._next_delay(service)
+                else:
+                    due = now
+                if due <= now:
+                    due = now + random.uniform(0, min(interval, 10))
+                self._push(service.id, due)
+
+    def _pop_due(self, now):
+        due = {}
+        while self._heap and self._heap[0][0] <= now:
+            _, service_id, version = heapq.heappop(self._heap)
+            if self._versions.get(service_id) == version:
+                due[service_id] = version
+        return due
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                # Small look-ahead so services due within the same moment
+                # share one sweep instead of waking the thread repeatedly.
+                due = self._pop_due(time.time() + 0.5)
+                wait = self._heap[0][0] - time.time() if self._heap else None
+            if due:
+                try:
+                    self._sweep(due)
+                except Exception as e:
+                    print(f"Scheduler error: {e}")
+                continue
+            self._wake.wait(wait)
+            self._wake.clear()
+
+    def _sweep(self, due):
+        from models import MonitoredService
+        from extensions import db, uptime, http_probe
+        from routes import create_anomaly_notification
+
+        config = self.app.config
+        with self.app.app_context():
+            uptime.tick()
+            services = MonitoredService.query.filter(MonitoredService.id.in_(list(due))).all()
+            targets = [CheckTarget(s.id, s.type, s.url, s.check_timeout or config['SERVICE_CHECK_TIMEOUT'],
+                                   s.http_method, s.expected_status, s.keyword)
+                       for s in services]
+            checked = run_checks(targets, max_workers=config['SERVICE_CHECK_WORKERS'],
+                                 deadline=config['SERVICE_CHECK_DEADLINE'], engine=http_probe)
+
+            now = datetime.now()
+            for service in services:
+                result = checked[service.id]
+                service.status = result.status
+                service.response_time = result.response_time
+                service.last_checked = now
+                if service.status == 'Down':
+                    service.consecutive_failures = (service.consecutive_failures or 0) + 1
+                    create_anomaly_notification('Servicio Caído', f'El servicio {service.name} ({service.url}) no responde.', 'danger', commit=False)
+                else:
+                    service.consecutive_failures = 0
+            uptime.record(services, checked)
+            states = [ServiceState(s.id, s.name, s.url, s.type, s.status, s.response_time, s.last_checked,
+                                   s.check_interval, s.consecutive_failures) for s in services]
+            db.session.commit()
+
+            with self._lock:
+                for state in states:
+                    # Skip services deleted or rescheduled mid-sweep
+                    if self._versions.get(state.id) == due[state.id]:
+                        self._push(state.id, time.time() + self._next_delay(state))
+
+            for listener in self._listeners:
+                try:
+                    listener(states)
+                except Exception as e:
+                    print(f"Scheduler listener error: {e}")
+
+    def _next_delay(self, service):
+        config = self.app.config
+        interval = service.check_interval or config['SERVICE_CHECK_INTERVAL']
+        failures = service.consecutive_failures or 0
+        if failures > 1:
+            # Exponential backoff for services that stay Down
+            interval = min(interval * 2 ** min(failures - 1, 16), max(interval, config['SERVICE_CHECK_MAX_BACKOFF']))
+        jitter = config['SERVICE_CHECK_JITTER']
+        return interval * random.uniform(1 - jitter, 1 + jitter)
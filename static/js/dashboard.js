@@ -112,8 +112,7 @@ const pingChart = new Chart(pingCtx, {
 });
 
 // --- State Variables ---
-let prevNetData = {}; // Stores previous bytes per interface
-let lastFetchTime = Date.now();
+let metricsETag = null; // Last /api/metrics version rendered (polling)
 let selectedInterface = 'total'; // Default to total
 
 // --- Helper Functions ---
@@ -152,6 +151,7 @@ fetch('https://api.ipify.org?format=json')
 
 // --- Services Management ---
 let serviceModal = null;
+let servicesById = {};
 
 function resetServiceForm() {
     document.getElementById('serviceForm').reset();
@@ -159,11 +159,18 @@ function resetServiceForm() {
     document.getElementById('serviceModalLabel').innerText = 'Agregar Monitor';
 }
 
-function openEditService(id, name, url, type) {
+function openEditService(id, name, url, type, interval, timeout) {
     document.getElementById('serviceId').value = id;
     document.getElementById('serviceName').value = name;
     document.getElementById('serviceUrl').value = url;
     document.getElementById('serviceType').value = type;
+    document.getElementById('serviceInterval').value = interval || '';
+    document.getElementById('serviceTimeout').value = timeout || '';
+    // HTTP settings come from the last rendered list (free text, not inlined in onclick)
+    const svc = servicesById[id] || {};
+    document.getElementById('serviceMethod').value = svc.method || 'HEAD';
+    document.getElementById('serviceExpectedStatus').value = svc.expected_status || '';
+    document.getElementById('serviceKeyword').value = svc.keyword || '';
     document.getElementById('serviceModalLabel').innerText = 'Editar Monitor';
     
     // Open Modal
@@ -176,6 +183,11 @@ function saveService() {
     const name = document.getElementById('serviceName').value;
     const url = document.getElementById('serviceUrl').value;
     const type = document.getElementById('serviceType').value;
+    const interval = document.getElementById('serviceInterval').value;
+    const timeout = document.getElementById('serviceTimeout').value;
+    const httpMethod = document.getElementById('serviceMethod').value;
+    const expectedStatus = document.getElementById('serviceExpectedStatus').value.trim();
+    const keyword = document.getElementById('serviceKeyword').value;
 
     if (!name || !url) {
         alert("Por favor completa todos los campos.");
@@ -185,6 +197,13 @@ function saveService() {
     const method = id ? 'PUT' : 'POST';
     const body = { name, url, type };
     if (id) body.id = id;
+    if (interval) body.interval = parseInt(interval);
+    if (timeout) body.timeout = parseFloat(timeout);
+    if (type === 'http') {
+        body.method = httpMethod;
+        body.expected_status = expectedStatus;
+        body.keyword = keyword;
+    }
 
     fetch('/api/services', {
         method: method,
@@ -213,68 +232,118 @@ function deleteService(id) {
 function updateServices() {
     fetch('/api/services')
         .then(res => res.json())
-        .then(data => {
-            const tbody = document.getElementById('servicesTableBody');
-            tbody.innerHTML = '';
-            if (data.length === 0) {
-                tbody.innerHTML = '<tr><td colspan="6" class="text-center text-muted py-3">No hay servicios monitoreados.</td></tr>';
-                return;
-            }
-            data.forEach(svc => {
-                const statusBadge = svc.status === 'Up' 
-                    ? '<span class="badge bg-success">Online</span>' 
-                    : '<span class="badge bg-danger">Offline</span>';
-                
-                const typeIcon = svc.type === 'http' 
-                    ? '<i class="fa-solid fa-globe text-info" title="Web"></i>' 
-                    : '<i class="fa-solid fa-laptop text-warning" title="Dispositivo"></i>';
-
-                tbody.innerHTML += `
-                    <tr>
-                        <td class="ps-4 fw-bold text-white">${svc.name}</td>
-                        <td class="text-muted small text-truncate" style="max-width: 150px;">${svc.url}</td>
-                        <td class="text-center">${typeIcon}</td>
-                        <td>${statusBadge}</td>
-                        <td class="font-monospace small">${svc.response_time} ms</td>
-                        <td class="text-end pe-4">
-                            <button class="btn btn-sm btn-outline-primary border-0 me-1" onclick="openEditService('${svc.id}', '${svc.name}', '${svc.url}', '${svc.type}')"><i class="fa-solid fa-pen"></i></button>
-                            <button class="btn btn-sm btn-outline-danger border-0" onclick="deleteService(${svc.id})"><i class="fa-solid fa-trash"></i></button>
-                        </td>
-                    </tr>
-                `;
-            });
-        });
+        .then(data => renderServices(data));
+}
+
+function renderServices(data) {
+    const tbody = document.getElementById('servicesTableBody');
+    tbody.innerHTML = '';
+    servicesById = {};
+    data.forEach(svc => { servicesById[svc.id] = svc; });
+    if (data.length === 0) {
+        tbody.innerHTML = '<tr><td colspan="7" class="text-center text-muted py-3">No hay servicios monitoreados.</td></tr>';
+        return;
+    }
+    data.forEach(svc => {
+        const statusBadge = svc.status === 'Up' 
+            ? '<span class="badge bg-success">Online</span>' 
+            : '<span class="badge bg-danger">Offline</span>';
+        
+        const typeIcon = svc.type === 'http' 
+            ? '<i class="fa-solid fa-globe text-info" title="Web"></i>' 
+            : '<i class="fa-solid fa-laptop text-warning" title="Dispositivo"></i>';
+
+        const day = (svc.uptime || {})['24h'];
+        const uptime = day && day.uptime !== null
+            ? `${day.uptime.toFixed(2)}%<div class="text-muted">p95 ${day.p95_response_time ?? '-'} ms</div>`
+            : '<span class="text-muted">-</span>';
+
+        tbody.innerHTML += `
+            <tr>
+                <td class="ps-4 fw-bold text-white">${svc.name}</td>
+                <td class="text-muted small text-truncate" style="max-width: 150px;">${svc.url}</td>
+                <td class="text-center">${typeIcon}</td>
+                <td>${statusBadge}</td>
+                <td class="font-monospace small">${svc.response_time} ms</td>
+                <td class="font-monospace small" title="Últimas 24 h">${uptime}</td>
+                <td class="text-end pe-4">
+                    <button class="btn btn-sm btn-outline-primary border-0 me-1" onclick="openEditService('${svc.id}', '${svc.name}', '${svc.url}', '${svc.type}', ${svc.interval}, ${svc.timeout})"><i class="fa-solid fa-pen"></i></button>
+                    <button class="btn btn-sm btn-outline-danger border-0" onclick="deleteService(${svc.id})"><i class="fa-solid fa-trash"></i></button>
+                </td>
+            </tr>
+        `;
+    });
 }
 
 // --- Network Scanner ---
-function scanNetwork() {
+let scanDevices = {}; // ip -> device, merged as stream lines arrive
+
+function renderScan(scanning) {
     const tbody = document.getElementById('networkScanBody');
-    tbody.innerHTML = '<tr><td colspan="3" class="text-center text-info py-3"><i class="fa-solid fa-circle-notch fa-spin me-2"></i>Escaneando red local...</td></tr>';
-    
-    fetch('/api/network/scan')
-        .then(res => res.json())
-        .then(data => {
-            tbody.innerHTML = '';
-            if (data.length === 0) {
-                tbody.innerHTML = '<tr><td colspan="3" class="text-center text-muted py-3">No se encontraron dispositivos.</td></tr>';
-                return;
-            }
-            data.forEach(dev => {
-                tbody.innerHTML += `
-                    <tr>
-                        <td class="ps-4 font-monospace">${dev.ip}</td>
-                        <td class="text-muted small font-monospace">${dev.mac}</td>
-                        <td class="text-end pe-4">
-                            <button class="btn btn-sm btn-outline-success" onclick="addFromScan('${dev.ip}')" title="Monitorear">
-                                <i class="fa-solid fa-plus"></i>
-                            </button>
-                        </td>
-                    </tr>
-                `;
+    const devices = Object.values(scanDevices).sort((a, b) => {
+        const pa = a.ip.split('.').map(Number), pb = b.ip.split('.').map(Number);
+        for (let i = 0; i < 4; i++) if (pa[i] !== pb[i]) return pa[i] - pb[i];
+        return 0;
+    });
+    let html = '';
+    devices.forEach(dev => {
+        html += `
+            <tr>
+                <td class="ps-4 font-monospace">${dev.ip}</td>
+                <td class="text-muted small font-monospace">${dev.mac}</td>
+                <td class="text-end pe-4">
+                    <button class="btn btn-sm btn-outline-success" onclick="addFromScan('${dev.ip}')" title="Monitorear">
+                        <i class="fa-solid fa-plus"></i>
+                    </button>
+                </td>
+            </tr>
+        `;
+    });
+    if (scanning) {
+        html += '<tr><td colspan="3" class="text-center text-info py-3"><i class="fa-solid fa-circle-notch fa-spin me-2"></i>Escaneando red local...</td></tr>';
+    } else if (devices.length === 0) {
+        html = '<tr><td colspan="3" class="text-center text-muted py-3">No se encontraron dispositivos.</td></tr>';
+    }
+    tbody.innerHTML = html;
+}
+
+function mergeScanLine(line) {
+    if (!line.trim()) return;
+    const dev = JSON.parse(line);
+    if (dev.done) return;
+    const known = scanDevices[dev.ip];
+    // Later lines may add detail (MAC resolved after the sweep)
+    if (known && dev.mac === 'N/A') dev.mac = known.mac;
+    scanDevices[dev.ip] = dev;
+}
+
+function scanNetwork() {
+    scanDevices = {};
+    renderScan(true);
+
+    fetch('/api/network/scan?stream=1')
+        .then(res => {
+            if (!res.ok || !res.body) throw new Error('scan failed');
+            const reader = res.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            const pump = () => reader.read().then(({ done, value }) => {
+                if (done) {
+                    mergeScanLine(buffer);
+                    renderScan(false);
+                    return;
+                }
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
+                lines.forEach(mergeScanLine);
+                renderScan(true);
+                return pump();
             });
+            return pump();
         })
         .catch(err => {
-            tbody.innerHTML = '<tr><td colspan="3" class="text-center text-danger py-3">Error al escanear.</td></tr>';
+            document.getElementById('networkScanBody').innerHTML = '<tr><td colspan="3" class="text-center text-danger py-3">Error al escanear.</td></tr>';
         });
 }
 
@@ -288,72 +357,82 @@ function addFromScan(ip) {
 }
 
 let lastSeenNotifId = 0;
+let notifItems = []; // Newest first, as rendered in the dropdown
 
-function updateNotifications() {
-    fetch('/api/notifications')
+function updateNotifications(full) {
+    // After the first load only ask for rows newer than what we have
+    const url = (lastSeenNotifId && !full) ? `/api/notifications?since_id=${lastSeenNotifId}` : '/api/notifications';
+    fetch(url)
         .then(res => res.json())
-        .then(data => {
-            // Check if it's the new format {unread_count, list} or old array
-            const listData = data.list ? data.list : data; // Fallback
-            const unreadCount = data.unread_count !== undefined ? data.unread_count : 0;
-
-            // Update Badge
-            const badge = document.getElementById('notifBadge');
-            if (badge) {
-                if (unreadCount > 0) {
-                    badge.innerText = unreadCount;
-                    badge.style.display = 'block';
-                } else {
-                    badge.style.display = 'none';
-                }
-            }
-            
-            // Update List (Navbar Dropdown)
-            const list = document.getElementById('notifList');
-            if(list) {
-                // Keep header
-                const header = list.querySelector('.dropdown-header') ? list.querySelector('.dropdown-header').parentNode.outerHTML : '';
-                const divider = list.querySelector('.dropdown-divider') ? list.querySelector('.dropdown-divider').parentNode.outerHTML : '';
+        .then(data => renderNotifications(data));
+}
+
+function renderNotifications(data) {
+    // Check if it's the new format {unread_count, list} or old array
+    let listData = data.list ? data.list : data; // Fallback
+    if (data.since_id !== undefined) {
+        // Incremental response (oldest first): merge into what we show
+        listData = listData.slice().reverse().concat(notifItems).slice(0, 10);
+    }
+    notifItems = listData;
+    const unreadCount = data.unread_count !== undefined ? data.unread_count : 0;
+
+    // Update Badge
+    const badge = document.getElementById('notifBadge');
+    if (badge) {
+        if (unreadCount > 0) {
+            badge.innerText = unreadCount;
+            badge.style.display = 'block';
+        } else {
+            badge.style.display = 'none';
+        }
+    }
+    
+    // Update List (Navbar Dropdown)
+    const list = document.getElementById('notifList');
+    if(list) {
+        // Keep header
+        const header = list.querySelector('.dropdown-header') ? list.querySelector('.dropdown-header').parentNode.outerHTML : '';
+        const divider = list.querySelector('.dropdown-divider') ? list.querySelector('.dropdown-divider').parentNode.outerHTML : '';
+        
+        let itemsHtml = '';
+        if (listData.length === 0) {
+            itemsHtml = '<li class="text-center p-3 text-muted small">Sin notificaciones nuevas</li>';
+        } else {
+            listData.forEach(n => {
+                const icon = n.type === 'danger' ? 'fa-triangle-exclamation text-danger' : 
+                           (n.type === 'warning' ? 'fa-circle-exclamation text-warning' : 'fa-circle-info text-info');
+                const bgClass = n.read ? '' : 'bg-secondary bg-opacity-10';
                 
-                let itemsHtml = '';
-                if (listData.length === 0) {
-                    itemsHtml = '<li class="text-center p-3 text-muted small">Sin notificaciones nuevas</li>';
-                } else {
-                    listData.forEach(n => {
-                        const icon = n.type === 'danger' ? 'fa-triangle-exclamation text-danger' : 
-                                   (n.type === 'warning' ? 'fa-circle-exclamation text-warning' : 'fa-circle-info text-info');
-                        const bgClass = n.read ? '' : 'bg-secondary bg-opacity-10';
-                        
-                        itemsHtml += `
-                            <li class="${bgClass} border-bottom border-secondary border-opacity-10">
-                                <a class="dropdown-item py-2" href="#">
-                                    <div class="d-flex align-items-start">
-                                        <i class="fa-solid ${icon} mt-1 me-2"></i>
-                                        <div>
-                                            <small class="d-block fw-bold ${n.type === 'danger' ? 'text-danger' : 'text-light'}">${n.title}</small>
-                                            <small class="text-muted" style="font-size: 0.75rem;">${n.message}</small>
-                                            <div class="text-end"><small class="text-secondary" style="font-size: 0.65rem;">${n.time}</small></div>
-                                        </div>
-                                    </div>
-                                </a>
-                            </li>
-                        `;
-
-                        // Toast Logic
-                        if (!n.read && n.id > lastSeenNotifId && lastSeenNotifId !== 0) {
-                            showToast(n);
-                        }
-                    });
-                    
-                    // Update last ID
-                    if (listData.length > 0) {
-                        const maxId = Math.max(...listData.map(n => n.id));
-                        if (maxId > lastSeenNotifId) lastSeenNotifId = maxId;
-                    }
+                itemsHtml += `
+                    <li class="${bgClass} border-bottom border-secondary border-opacity-10">
+                        <a class="dropdown-item py-2" href="#">
+                            <div class="d-flex align-items-start">
+                                <i class="fa-solid ${icon} mt-1 me-2"></i>
+                                <div>
+                                    <small class="d-block fw-bold ${n.type === 'danger' ? 'text-danger' : 'text-light'}">${n.title}</small>
+                                    <small class="text-muted" style="font-size: 0.75rem;">${n.message}</small>
+                                    <div class="text-end"><small class="text-secondary" style="font-size: 0.65rem;">${n.time}</small></div>
+                                </div>
+                            </div>
+                        </a>
+                    </li>
+                `;
+
+                // Toast Logic
+                if (!n.read && n.id > lastSeenNotifId && lastSeenNotifId !== 0) {
+                    showToast(n);
                 }
-                list.innerHTML = (header || '') + (divider || '') + itemsHtml;
+            });
+            
+            // Update last ID
+            if (listData.length > 0) {
+                const maxId = Math.max(...listData.map(n => n.id));
+                if (maxId > lastSeenNotifId) lastSeenNotifId = maxId;
             }
-        });
+        }
+        list.innerHTML = (header || '') + (divider || '') + itemsHtml;
+    }
 }
 
 function showToast(n) {
@@ -390,7 +469,7 @@ function showToast(n) {
 
 function markAllRead() {
     fetch('/api/notifications/mark_read', { method: 'POST' })
-        .then(() => updateNotifications());
+        .then(() => updateNotifications(true));
 }
 
 function toggleIpVisibility() {
@@ -419,167 +498,224 @@ function toggleIpVisibility() {
 // --- Main Update Loop ---
 function updateDashboard() {
     // 1. Fetch Metrics
-    fetch('/api/metrics')
-        .then(response => response.json())
-        .then(data => {
-            const now = new Date();
-            const timeLabel = now.toLocaleTimeString();
-            const currentTime = Date.now();
-            const timeDiff = (currentTime - lastFetchTime) / 1000;
+    // Unchanged snapshot: the server answers 304 and nothing is re-rendered
+    const headers = metricsETag ? { 'If-None-Match': metricsETag } : {};
+    fetch('/api/metrics', { headers: headers, cache: 'no-store' })
+        .then(response => {
+            if (response.status === 304) return null;
+            metricsETag = response.headers.get('ETag');
+            return response.json();
+        })
+        .then(data => { if (data) renderMetrics(data); })
+        .catch(err => console.error('Metrics Error:', err));
+}
 
-            // Update System Summary (Top Right)
-            document.getElementById('cpuValue').innerText = data.cpu + '%';
-            document.getElementById('ramValue').innerText = data.memory.percent + '%';
+function renderMetrics(data) {
+    const now = new Date();
+    const timeLabel = now.toLocaleTimeString();
 
-            // --- Network Interfaces Handling ---
-            const interfaceSelect = document.getElementById('interfaceSelect');
-            
-            // Populate Dropdown if empty (first run)
-            if (interfaceSelect.options.length === 1) {
-                for (const [nic, info] of Object.entries(data.network.interfaces)) {
-                    const option = document.createElement('option');
-                    option.value = nic;
-                    option.text = nic + (info.ip !== 'N/A' ? ` (${info.ip})` : '');
-                    interfaceSelect.appendChild(option);
-                }
-            }
+    // Update System Summary (Top Right)
+    document.getElementById('cpuValue').innerText = data.cpu + '%';
+    document.getElementById('ramValue').innerText = data.memory.percent + '%';
 
-            // Get Current Interface Data
-            let currentBytesSent = 0;
-            let currentBytesRecv = 0;
-            let currentIP = 'IP: --';
-
-            if (selectedInterface === 'total') {
-                currentBytesSent = data.network.total.bytes_sent;
-                currentBytesRecv = data.network.total.bytes_recv;
-                currentIP = 'IP: Agregada';
-            } else if (data.network.interfaces[selectedInterface]) {
-                const nicData = data.network.interfaces[selectedInterface];
-                currentBytesSent = nicData.bytes_sent;
-                currentBytesRecv = nicData.bytes_recv;
-                currentIP = `IP: ${nicData.ip}`;
-            }
+    // --- Network Interfaces Handling ---
+    const interfaceSelect = document.getElementById('interfaceSelect');
+    
+    // Populate Dropdown if empty (first run)
+    if (interfaceSelect.options.length === 1) {
+        for (const [nic, info] of Object.entries(data.network.interfaces)) {
+            const option = document.createElement('option');
+            option.value = nic;
+            option.text = nic + (info.ip !== 'N/A' ? ` (${info.ip})` : '');
+            interfaceSelect.appendChild(option);
+        }
+    }
 
-            document.getElementById('interfaceIP').innerText = currentIP;
+    // Get Current Interface Data (rates are computed server-side)
+    let currentRates = null;
+    let currentIP = 'IP: --';
+
+    if (selectedInterface === 'total') {
+        currentRates = data.network.total.rates;
+        currentIP = 'IP: Agregada';
+    } else if (data.network.interfaces[selectedInterface]) {
+        const nicData = data.network.interfaces[selectedInterface];
+        currentRates = nicData.rates;
+        currentIP = `IP: ${nicData.ip}`;
+    }
 
-            // Calculate Speeds
-            if (prevNetData[selectedInterface] && timeDiff > 0) {
-                const prevSent = prevNetData[selectedInterface].sent;
-                const prevRecv = prevNetData[selectedInterface].recv;
+    document.getElementById('interfaceIP').innerText = currentIP;
 
-                const sentBps = (currentBytesSent - prevSent) / timeDiff;
-                const recvBps = (currentBytesRecv - prevRecv) / timeDiff;
+    // No rates yet on the first sample, or after a counter reset
+    if (currentRates && currentRates.bytes_sent !== null && currentRates.bytes_recv !== null) {
+        const sentKBps = (currentRates.bytes_sent / 1024).toFixed(2);
+        const recvKBps = (currentRates.bytes_recv / 1024).toFixed(2);
 
-                const sentKBps = (sentBps / 1024).toFixed(2);
-                const recvKBps = (recvBps / 1024).toFixed(2);
+        // Update Big Numbers with Animation
+        // Note: Simple text update for now to avoid flickering, Chart handles smooth lines
+        document.getElementById('globalUpload').innerText = sentKBps;
+        document.getElementById('globalDownload').innerText = recvKBps;
 
-                // Update Big Numbers with Animation
-                // Note: Simple text update for now to avoid flickering, Chart handles smooth lines
-                document.getElementById('globalUpload').innerText = sentKBps;
-                document.getElementById('globalDownload').innerText = recvKBps;
+        // Update Chart
+        if (networkChart.data.labels.length > 30) {
+            networkChart.data.labels.shift();
+            networkChart.data.datasets[0].data.shift();
+            networkChart.data.datasets[1].data.shift();
+        }
+        networkChart.data.labels.push(timeLabel);
+        networkChart.data.datasets[0].data.push(sentKBps);
+        networkChart.data.datasets[1].data.push(recvKBps);
+        networkChart.update(); // Chart.js handles animation based on config
+    }
 
-                // Update Chart
-                if (networkChart.data.labels.length > 30) {
-                    networkChart.data.labels.shift();
-                    networkChart.data.datasets[0].data.shift();
-                    networkChart.data.datasets[1].data.shift();
-                }
-                networkChart.data.labels.push(timeLabel);
-                networkChart.data.datasets[0].data.push(sentKBps);
-                networkChart.data.datasets[1].data.push(recvKBps);
-                networkChart.update(); // Chart.js handles animation based on config
-            }
+    // --- Update Connections Table ---
+    const tbody = document.getElementById('connectionsTableBody');
+    tbody.innerHTML = '';
+    
+    if (data.network.connections.length === 0) {
+        tbody.innerHTML = '<tr><td colspan="5" class="text-center text-muted">No hay conexiones activas reportadas o permisos insuficientes.</td></tr>';
+    } else {
+        data.network.connections.forEach(conn => {
+            const row = `
+                <tr>
+                    <td class="ps-4 fw-bold text-primary-accent">${conn.process}</td>
+                    <td class="text-secondary">${conn.pid}</td>
+                    <td class="font-monospace small">${conn.laddr}</td>
+                    <td class="font-monospace small">${conn.raddr}</td>
+                    <td><span class="badge bg-success bg-opacity-10 text-success border border-success border-opacity-25">${conn.status}</span></td>
+                </tr>
+            `;
+            tbody.innerHTML += row;
+        });
+    }
+}
 
-            // Store current data for next iteration
-            prevNetData[selectedInterface] = {
-                sent: currentBytesSent,
-                recv: currentBytesRecv
-            };
-            
-            // Also store 'total' if we are not viewing it, to keep history correct when switching
-            if (selectedInterface !== 'total') {
-                prevNetData['total'] = {
-                    sent: data.network.total.bytes_sent,
-                    recv: data.network.total.bytes_recv
-                };
-            }
-            // Store all other interfaces too to avoid spikes when switching
-             for (const [nic, info] of Object.entries(data.network.interfaces)) {
-                prevNetData[nic] = { sent: info.bytes_sent, recv: info.bytes_recv };
-             }
+// --- Ping Update Loop (Slower, every 5s) ---
+function updatePing() {
+    fetch('/api/ping')
+        .then(res => res.json())
+        .then(data => renderPing(data))
+        .catch(err => console.error('Ping Error:', err));
+}
 
+function renderPing(data) {
+    const now = new Date();
+    const timeLabel = now.toLocaleTimeString();
 
-            lastFetchTime = currentTime;
+    let latency = 0;
+    if (data.status === 'ok') {
+        latency = data.latency;
+        document.getElementById('pingValue').innerText = latency;
+        document.getElementById('pingValue').className = latency < 100 ? 'text-success' : (latency < 200 ? 'text-warning' : 'text-danger');
+    } else {
+        document.getElementById('pingValue').innerText = 'Err';
+        document.getElementById('pingValue').className = 'text-danger';
+    }
 
-            // --- Update Connections Table ---
-            const tbody = document.getElementById('connectionsTableBody');
-            tbody.innerHTML = '';
-            
-            if (data.network.connections.length === 0) {
-                tbody.innerHTML = '<tr><td colspan="5" class="text-center text-muted">No hay conexiones activas reportadas o permisos insuficientes.</td></tr>';
-            } else {
-                data.network.connections.forEach(conn => {
-                    const row = `
-                        <tr>
-                            <td class="ps-4 fw-bold text-primary-accent">${conn.process}</td>
-                            <td class="text-secondary">${conn.pid}</td>
-                            <td class="font-monospace small">${conn.laddr}</td>
-                            <td class="font-monospace small">${conn.raddr}</td>
-                            <td><span class="badge bg-success bg-opacity-10 text-success border border-success border-opacity-25">${conn.status}</span></td>
-                        </tr>
-                    `;
-                    tbody.innerHTML += row;
-                });
-            }
-        })
-        .catch(err => console.error('Metrics Error:', err));
+    // Update Ping Chart
+    if (pingChart.data.labels.length > 20) {
+        pingChart.data.labels.shift();
+        pingChart.data.datasets[0].data.shift();
+    }
+    pingChart.data.labels.push(timeLabel);
+    pingChart.data.datasets[0].data.push(latency);
+    pingChart.update();
 }
 
-// --- Ping Update Loop (Slower, every 5s) ---
-function updatePing() {
-    fetch('/api/ping')
+// --- History Prefill (server keeps the series, so a fresh tab starts with data) ---
+function loadHistory() {
+    const nic = selectedInterface;
+    const url = `/api/metrics/history?series=net.${nic}.tx&series=net.${nic}.rx&series=ping.latency&range=60&points=60`;
+    return fetch(url)
         .then(res => res.json())
         .then(data => {
-            const now = new Date();
-            const timeLabel = now.toLocaleTimeString();
-
-            let latency = 0;
-            if (data.status === 'ok') {
-                latency = data.latency;
-                document.getElementById('pingValue').innerText = latency;
-                document.getElementById('pingValue').className = latency < 100 ? 'text-success' : (latency < 200 ? 'text-warning' : 'text-danger');
-            } else {
-                document.getElementById('pingValue').innerText = 'Err';
-                document.getElementById('pingValue').className = 'text-danger';
+            // Points are [timestamp, min, avg, max, last]
+            const tx = data.series[`net.${nic}.tx`];
+            const rx = data.series[`net.${nic}.rx`];
+            if (tx && rx && networkChart.data.labels.length === 0) {
+                const rxByTs = new Map(rx.points.map(p => [p[0], p[2]]));
+                tx.points.slice(-30).forEach(p => {
+                    networkChart.data.labels.push(new Date(p[0] * 1000).toLocaleTimeString());
+                    networkChart.data.datasets[0].data.push((p[2] / 1024).toFixed(2));
+                    networkChart.data.datasets[1].data.push(((rxByTs.get(p[0]) || 0) / 1024).toFixed(2));
+                });
+                networkChart.update();
             }
 
-            // Update Ping Chart
-            if (pingChart.data.labels.length > 20) {
-                pingChart.data.labels.shift();
-                pingChart.data.datasets[0].data.shift();
+            const ping = data.series['ping.latency'];
+            if (ping && pingChart.data.labels.length === 0) {
+                ping.points.slice(-20).forEach(p => {
+                    pingChart.data.labels.push(new Date(p[0] * 1000).toLocaleTimeString());
+                    pingChart.data.datasets[0].data.push(p[2]);
+                });
+                pingChart.update();
             }
-            pingChart.data.labels.push(timeLabel);
-            pingChart.data.datasets[0].data.push(latency);
-            pingChart.update();
         })
-        .catch(err => console.error('Ping Error:', err));
+        .catch(err => console.error('History Error:', err));
 }
 
 // Event Listeners
 document.getElementById('interfaceSelect').addEventListener('change', (e) => {
     selectedInterface = e.target.value;
-    // Reset prev data to avoid calculation spikes
-    prevNetData[selectedInterface] = null; 
 });
 
-// Start Loops
-setInterval(updateDashboard, 2000); // Metrics every 2s
-setInterval(updatePing, 5000);      // Ping every 5s
-setInterval(updateServices, 10000); // Services every 10s
-setInterval(updateNotifications, 5000); // Notifications every 5s
+// --- Live Updates (Server-Sent Events, polling as fallback) ---
+let metricsState = null;
+const servicesState = new Map();
+let pollers = [];
+
+// The stream only carries what changed since the last event: merge it
+// into the local state before rendering.
+function applyMetricsDelta(delta) {
+    const previous = metricsState ? metricsState.network : { interfaces: {}, connections: [] };
+    const interfaces = Object.assign({}, previous.interfaces, delta.network.interfaces);
+    delta.network.removed.forEach(nic => delete interfaces[nic]);
+    metricsState = Object.assign({}, delta, {
+        network: {
+            total: delta.network.total,
+            interfaces: interfaces,
+            connections: delta.network.connections !== undefined ? delta.network.connections : previous.connections
+        }
+    });
+    return metricsState;
+}
+
+function applyServicesDelta(delta) {
+    delta.removed.forEach(id => servicesState.delete(id));
+    delta.changed.forEach(svc => servicesState.set(svc.id, svc));
+    return Array.from(servicesState.values()).sort((a, b) => a.id - b.id);
+}
+
+function startPolling() {
+    if (pollers.length > 0) return;
+    pollers = [
+        setInterval(updateDashboard, 2000), // Metrics every 2s
+        setInterval(updatePing, 5000),      // Ping every 5s
+        setInterval(updateServices, 10000), // Services every 10s
+        setInterval(updateNotifications, 5000) // Notifications every 5s
+    ];
+    updateDashboard();
+    updatePing();
+    updateServices();
+    updateNotifications();
+}
+
+function startStream() {
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+    const source = new EventSource('/api/stream');
+    source.addEventListener('metrics', e => renderMetrics(applyMetricsDelta(JSON.parse(e.data))));
+    source.addEventListener('ping', e => renderPing(JSON.parse(e.data)));
+    source.addEventListener('services', e => renderServices(applyServicesDelta(JSON.parse(e.data))));
+    source.addEventListener('notifications', e => renderNotifications(JSON.parse(e.data)));
+    source.onerror = () => {
+        // The browser reconnects on its own; a closed stream (e.g. expired
+        // session) means it gave up, so fall back to polling.
+        if (source.readyState === EventSource.CLOSED) startPolling();
+    };
+}
 
 // Initial Calls
-updateDashboard();
-updatePing();
-updateServices();
-updateNotifications();
+loadHistory().finally(startStream);
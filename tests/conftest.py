@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    # App on a throwaway SQLite file with no background threads
+    from app import create_app
+
+    def make(**config):
+        settings = {
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'test.sqlite3'),
+            'BACKGROUND_JOBS': False,
+            'TESTING': True,
+        }
+        settings.update(config)
+        return create_app(settings)
+    return make
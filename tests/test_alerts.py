@@ -0,0 +1,116 @@
+import json
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+TOKEN = '123456:SECRET-bot-token'
+
+
+# Fake Telegram API: records each message and answers with the next queued
+# status (200 once the queue is empty)
+class StubTelegram(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        server = self.server
+        with server.lock:
+            status = server.statuses.pop(0) if server.statuses else 200
+            server.requests.append((self.path, status, body['text']))
+        self.send_response(status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubTelegram)
+    server.lock = threading.Lock()
+    server.statuses = []
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def app(make_app, stub):
+    from extensions import db
+    from models import User, AppSettings
+
+    app = make_app(TELEGRAM_API_URL=f'http://127.0.0.1:{stub.server_port}', ALERT_COALESCE_WINDOW=0)
+    with app.app_context():
+        user = User(username='ops')
+        user.set_password('secret')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(AppSettings(user_id=user.id, telegram_bot_token=TOKEN, telegram_chat_id='42',
+                                   notifications_enabled=True))
+        db.session.commit()
+    return app
+
+
+def queue_alerts(app, count):
+    from alerts import enqueue_alert
+    from extensions import db
+    from models import User
+
+    with app.app_context():
+        users = User.query.all()
+        for i in range(count):
+            enqueue_alert(users, 'Servicio Caído', f'El servicio web-{i} (https://web-{i}.example.com) no responde.')
+        db.session.commit()
+
+
+def outbox(app):
+    from models import AlertOutbox
+    with app.app_context():
+        return [(row.status, row.attempts, row.last_error) for row in AlertOutbox.query.order_by(AlertOutbox.id)]
+
+
+def test_burst_is_split_under_telegram_limit(app, stub):
+    from alerts import MESSAGE_LIMITS
+    from extensions import alert_worker
+
+    queue_alerts(app, 200)
+    with app.app_context():
+        alert_worker.drain()
+
+    assert len(stub.requests) > 1
+    assert all(len(text) <= MESSAGE_LIMITS['telegram'] for _, _, text in stub.requests)
+    # Every alert delivered exactly once, across the chunks
+    delivered = sum(text.count('web-') // 2 for _, _, text in stub.requests)
+    assert delivered == 200
+    assert {status for status, _, _ in outbox(app)} == {'sent'}
+
+
+def test_failed_send_is_retried_and_redacted(app, stub):
+    from extensions import db, alert_worker
+    from models import AlertOutbox
+
+    stub.statuses = [500]
+    queue_alerts(app, 1)
+    with app.app_context():
+        alert_worker.drain()
+
+    [(status, attempts, error)] = outbox(app)
+    assert status == 'pending' and attempts == 1
+    assert '500' in error and TOKEN not in error
+
+    # Backoff not elapsed: nothing is sent
+    with app.app_context():
+        alert_worker.drain()
+    assert len(stub.requests) == 1
+
+    with app.app_context():
+        AlertOutbox.query.update({'next_attempt_at': datetime.now() - timedelta(seconds=1)})
+        db.session.commit()
+        alert_worker.drain()
+    assert len(stub.requests) == 2
+    assert outbox(app) == [('sent', 2, None)]
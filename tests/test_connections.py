@@ -0,0 +1,74 @@
+import os
+import socket
+
+import pytest
+
+import connections
+from connections import ConnectionTable, read_psutil
+
+needs_proc = pytest.mark.skipif(not connections.proc_net_available(), reason='needs /proc/net')
+
+
+@pytest.fixture
+def udp_socket():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    yield sock
+    sock.close()
+
+
+def own_row(rows, port):
+    return next(row for row in rows if row['lport'] == port)
+
+
+def test_psutil_reads_udp(udp_socket):
+    row = own_row(read_psutil(), udp_socket.getsockname()[1])
+    assert row['proto'] == 'udp'
+    assert row['pid'] == os.getpid()
+
+
+@needs_proc
+def test_proc_path_resolves_pids_by_default(udp_socket):
+    source, rows = ConnectionTable(ttl=0).rows(with_process=True)
+    assert source == 'proc'
+    row = own_row(rows, udp_socket.getsockname()[1])
+    assert row['proto'] == 'udp'
+    assert row['status'] == 'NONE'
+    assert row['pid'] == os.getpid()
+    assert row['process']
+
+
+@needs_proc
+def test_known_sockets_skip_the_fd_walk(udp_socket, monkeypatch):
+    walks = []
+    real = connections.socket_owners
+
+    def counting():
+        walks.append(1)
+        return real()
+    monkeypatch.setattr(connections, 'socket_owners', counting)
+
+    table = ConnectionTable(ttl=0)
+    table.rows(with_process=True)
+    table.rows(with_process=True)
+    assert len(walks) == 1
+
+    other = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    other.bind(('127.0.0.1', 0))
+    try:
+        _, rows = table.rows(with_process=True)
+        assert len(walks) == 2
+        assert own_row(rows, other.getsockname()[1])['pid'] == os.getpid()
+    finally:
+        other.close()
+
+
+def test_proto_filter(udp_socket):
+    table = ConnectionTable(ttl=0)
+    port = udp_socket.getsockname()[1]
+    udp = table.query(proto='udp', port=port)
+    assert udp['total'] == 1
+    assert udp['items'][0]['proto'] == 'udp'
+    assert table.query(proto='tcp', port=port)['total'] == 0
+    with pytest.raises(ValueError):
+        table.query(proto='sctp')
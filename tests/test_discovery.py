@@ -0,0 +1,58 @@
+import time
+from types import SimpleNamespace
+
+from sqlalchemy import event
+
+import discovery
+
+
+def test_sweep_refills_window_as_probes_finish(monkeypatch):
+    # One slow host must not hold back the rest: with a window of 2, the
+    # other slot keeps cycling through the fast hosts
+    def fake_probe(host, timeout, tcp_port):
+        time.sleep(0.6 if host == 'slow' else 0.01)
+        return host, SimpleNamespace(received=1)
+
+    monkeypatch.setattr(discovery, 'probe_host', fake_probe)
+    hosts = ['slow'] + [f'10.0.0.{i}' for i in range(20)]
+    started = time.monotonic()
+    seen = {}
+    for batch in discovery.sweep(hosts, window=2, flush_every=0.05):
+        for host, _ in batch:
+            seen[host] = time.monotonic() - started
+    assert set(seen) == set(hosts)
+    assert max(t for host, t in seen.items() if host != 'slow') < 0.5
+
+
+def test_sweep_localhost():
+    import socket
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(8)
+    target = f'127.0.0.1:{listener.getsockname()[1]}'
+    try:
+        found = [host for batch in discovery.sweep([target], window=4, timeout=1.0) for host, _ in batch]
+    finally:
+        listener.close()
+    assert found == [target]
+
+
+def test_upsert_does_not_reload_devices(make_app):
+    from extensions import db, network_scanner
+
+    app = make_app()
+    entries = {f'10.1.0.{i}': {'mac': f'00:00:00:00:00:{i:02x}', 'interface': 'eth0'} for i in range(50)}
+    with app.app_context():
+        network_scanner._upsert(entries, discovery.datetime.now(), 'arp')
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            devices = network_scanner._upsert(entries, discovery.datetime.now(), 'arp')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+    assert len(devices) == 50 and devices[0]['mac'] == '00:00:00:00:00:00'
+    assert len(statements) <= 5
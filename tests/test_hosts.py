@@ -0,0 +1,70 @@
+import time
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+TOKEN = 'agent-token'
+
+
+def batch(host='web-1', **data):
+    sample = {'cpu': 12.5, 'memory': {'percent': 40.0}, 'disk': {'percent': 70.0},
+              'network': {'total': {'rates': {'bytes_sent': 100.0, 'bytes_recv': 200.0}}}}
+    sample.update(data)
+    return {'host': host, 'samples': [{'timestamp': time.time(), 'data': sample}]}
+
+
+@pytest.fixture
+def client(make_app):
+    return make_app(INGEST_TOKEN=TOKEN).test_client()
+
+
+def post(client, payload):
+    return client.post('/api/ingest', json=payload, headers={'Authorization': f'Bearer {TOKEN}'})
+
+
+def test_ingest_accepts_valid_batch(client):
+    assert post(client, batch()).status_code == 200
+
+
+@pytest.mark.parametrize('data', [
+    {'network': {'total': []}},
+    {'network': {'total': {'rates': 'fast'}}},
+    {'cpu': {'value': 1}},
+    {'cpu': 'high'},
+    {'memory': {'percent': [1]}},
+    {'disk': {}},
+    {'network': {'total': {'rates': {'bytes_sent': 'x'}}}},
+])
+def test_ingest_rejects_malformed_samples(client, data):
+    response = post(client, batch(**data))
+    assert response.status_code == 400
+    assert response.get_json()['status'] == 'error'
+
+
+def test_numeric_strings_are_stored_as_floats(client):
+    from extensions import db
+    from models import HostSample
+
+    assert post(client, batch(cpu='12.5')).status_code == 200
+    with client.application.app_context():
+        assert db.session.query(HostSample.cpu).scalar() == 12.5
+
+
+def test_concurrent_first_batch_for_new_host(client):
+    # Another worker registers the host between our SELECT and our INSERT
+    from extensions import db
+    from models import Host
+
+    app = client.application
+    with app.app_context():
+        engine = db.engine
+
+    def register_elsewhere(session, context, instances):
+        with engine.begin() as connection:
+            connection.execute(Host.__table__.insert().values(name='web-2'))
+
+    event.listen(Session, 'before_flush', register_elsewhere, once=True)
+    assert post(client, batch('web-2')).status_code == 200
+    with app.app_context():
+        assert Host.query.filter_by(name='web-2').count() == 1
@@ -0,0 +1,21 @@
+from httpprobe import HttpProbe, ProbeConnection, parse_status_codes, status_matches
+
+
+def host_header(key):
+    conn = ProbeConnection(HttpProbe(), key, timeout=1.0)
+    # putrequest only buffers the request line and headers, nothing is sent
+    conn.putrequest('GET', '/')
+    return [line for line in conn._buffer if line.startswith(b'Host:')][0]
+
+
+def test_host_header_omits_default_port():
+    assert host_header(('https', 'example.com', 443)) == b'Host: example.com'
+    assert host_header(('http', 'example.com', 80)) == b'Host: example.com'
+    assert host_header(('https', 'example.com', 8443)) == b'Host: example.com:8443'
+    assert host_header(('http', 'example.com', 443)) == b'Host: example.com:443'
+
+
+def test_status_codes():
+    ranges = parse_status_codes('200-299, 301')
+    assert status_matches(ranges, 204) and status_matches(ranges, 301)
+    assert not status_matches(ranges, 302)
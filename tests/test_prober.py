@@ -0,0 +1,60 @@
+import socket
+
+import pytest
+
+from prober import probe, split_target
+
+
+def test_split_target():
+    assert split_target('example.com', 80) == ('example.com', 80)
+    assert split_target('example.com:8080', 80) == ('example.com', 8080)
+    assert split_target('https://example.com:8443/health', 80) == ('example.com', 8443)
+    assert split_target('[::1]:8080', 80) == ('::1', 8080)
+    assert split_target('[::1]', 80) == ('::1', 80)
+    assert split_target('::1', 80) == ('::1', 80)
+
+
+def test_tcp_probe_localhost():
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(8)
+    port = listener.getsockname()[1]
+    try:
+        results = probe([f'127.0.0.1:{port}'], count=3, timeout=1.0, interval=0.01, method='tcp')
+    finally:
+        listener.close()
+    result = results[f'127.0.0.1:{port}']
+    assert result.method == 'tcp'
+    assert result.sent == 3 and result.received == 3 and result.loss == 0.0
+    assert 0 <= result.rtt_min <= result.rtt_avg <= result.rtt_max
+    assert result.error is None
+
+
+def test_tcp_probe_refused_port_counts_as_reply():
+    # An RST still proves the host is up
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    result = probe([f'127.0.0.1:{port}'], count=2, timeout=1.0, interval=0.01, method='tcp')[f'127.0.0.1:{port}']
+    assert result.received == 2
+
+
+def test_unresolved_target():
+    result = probe(['no-such-host.invalid'], count=1, timeout=0.2, method='tcp')['no-such-host.invalid']
+    assert result.error == 'unresolved' and result.received == 0
+
+
+def test_tcp_probe_bracketed_ipv6():
+    try:
+        listener = socket.socket(socket.AF_INET6)
+        listener.bind(('::1', 0))
+    except OSError:
+        pytest.skip('no IPv6 loopback')
+    listener.listen(8)
+    target = f'[::1]:{listener.getsockname()[1]}'
+    try:
+        result = probe([target], count=2, timeout=1.0, interval=0.01, method='tcp')[target]
+    finally:
+        listener.close()
+    assert result.error is None and result.received == 2
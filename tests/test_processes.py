@@ -0,0 +1,75 @@
+import os
+import threading
+import time
+
+from processes import ProcessTable
+
+
+def own_entry(result):
+    return next(p for p in result['processes'] if p['pid'] == os.getpid())
+
+
+def test_cpu_is_the_delta_between_refreshes():
+    table = ProcessTable()
+    table.max_results = 10000
+    table.refresh()
+
+    stop = threading.Event()
+
+    def spin():
+        while not stop.is_set():
+            pass
+
+    thread = threading.Thread(target=spin)
+    thread.start()
+    try:
+        time.sleep(0.3)
+        table.refresh()
+    finally:
+        stop.set()
+        thread.join()
+    result = table.top('cpu', limit=10000)
+    assert own_entry(result)['cpu_percent'] > 30
+    measured = [p for p in result['processes'] if p['cpu_percent'] is not None]
+    # Only processes started between the two refreshes may lack a value
+    assert len(measured) >= len(result['processes']) - 2
+
+
+def test_top_only_ranks_the_last_table():
+    table = ProcessTable()
+    assert table.top('cpu')['processes'] == []
+    table.refresh()
+    refreshes = []
+    table.refresh = lambda: refreshes.append(1)
+    assert table.top('cpu')['processes']
+    assert refreshes == []
+
+
+def test_collector_ticks_respect_the_interval():
+    table = ProcessTable(interval=2.0)
+    table.tick = 2.0
+    table.on_snapshot(None)
+    table.on_snapshot(None)
+    assert table.top('cpu')['total']
+    refreshes = []
+    table.refresh = lambda: refreshes.append(1)
+    table.on_snapshot(None)
+    assert refreshes == []
+
+
+def test_follower_ranks_the_published_table():
+    leader = ProcessTable()
+    leader.refresh()
+    time.sleep(0.05)
+    leader.refresh()
+    follower = ProcessTable()
+    follower.load(leader.export())
+    expected = leader.top('memory', limit=5)['processes']
+    assert follower.top('memory', limit=5)['processes'] == expected
+
+
+def test_sort_by_memory():
+    table = ProcessTable()
+    table.refresh()
+    rss = [p['memory_rss'] for p in table.top('memory', limit=5)['processes']]
+    assert rss == sorted(rss, reverse=True)
@@ -0,0 +1,23 @@
+import pytest
+
+from rules import validate_rule
+
+BASE = {'name': 'CPU alta', 'metric': 'cpu', 'threshold': 90}
+
+
+@pytest.mark.parametrize('value, expected', [
+    (True, True), (False, False), (1, True), (0, False),
+    ('true', True), ('false', False), ('0', False), ('1', True), ('No', False),
+])
+def test_enabled_parsing(value, expected):
+    assert validate_rule(dict(BASE, enabled=value))['enabled'] is expected
+
+
+@pytest.mark.parametrize('value', ['maybe', 2, None, [], {}])
+def test_enabled_rejects_other_values(value):
+    with pytest.raises(ValueError):
+        validate_rule(dict(BASE, enabled=value))
+
+
+def test_enabled_defaults_to_true():
+    assert validate_rule(BASE)['enabled'] is True
@@ -0,0 +1,47 @@
+import random
+
+from timeseries import RollupRing, TimeSeriesStore
+
+
+def test_ring_grows_lazily_and_matches_full_ring():
+    ring = RollupRing(1, 3600)
+    assert ring.size < 3600
+    values = {}
+    for ts in range(1000, 1100):
+        ring.add(ts + 0.5, float(ts))
+        values[ts] = float(ts)
+    assert ring.size == 128
+    points = ring.query(0, 2000)
+    assert [p[0] for p in points] == list(range(1000, 1100))
+    assert all(p[4] == values[p[0]] for p in points)
+
+
+def test_ring_keeps_capacity_semantics():
+    rng = random.Random(1)
+    ring = RollupRing(1, 64)
+    stamps = sorted(rng.sample(range(10000), 500))
+    for ts in stamps:
+        ring.add(ts, float(ts))
+    assert ring.size == 64
+    newest = stamps[-1]
+    expected = [ts for ts in stamps if ts > newest - 64]
+    assert [p[0] for p in ring.query(0, newest)] == expected
+
+
+def test_retain_drops_vanished_series():
+    store = TimeSeriesStore()
+    for name in ('net.eth0.tx', 'net.veth1.tx', 'net.veth1.rx', 'cpu'):
+        store.record(name, 1.0)
+    store.retain('net.', {'net.eth0.tx', 'net.eth0.rx'})
+    assert store.names() == ['cpu', 'net.eth0.tx']
+
+
+def test_grow_skips_expired_buckets():
+    # Last growth step 2048 -> 3600 is not a doubling: a bucket outside the
+    # retention must not overwrite a live one on rehash
+    ring = RollupRing(1, 3600)
+    for ts in range(1025):
+        ring.add(ts, float(ts))
+    ring.add(4600, 4600.0)
+    ring.add(6648, 6648.0)
+    assert [p[0] for p in ring.query(3049, 6648)] == [4600, 6648]
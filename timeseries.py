@@ -0,0 +1,141 @@
+import threading
+import time
+from array import array
+
+# (resolution in seconds, number of buckets): 1 hour at 1s, 24 hours at 1m
+# and 30 days at 1h. A series never costs more than this fixed amount of
+# memory, and much less until its rings fill up.
+DEFAULT_LEVELS = ((1, 3600), (60, 1440), (3600, 720))
+
+
+# One resolution of a series: ring of min/max/sum/count/last buckets stored
+# in flat typed arrays. A slot is reused when the ring wraps; `bucket`
+# records which absolute bucket a slot currently holds, so stale slots are
+# recognised without ever clearing the ring. The arrays start small and
+# double (up to `capacity`) only when a bucket still inside the retention
+# would be overwritten, so short-lived series stay cheap.
+class RollupRing:
+    INITIAL_SIZE = 16
+
+    def __init__(self, resolution, capacity):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.newest = -1
+        self._allocate(min(self.INITIAL_SIZE, capacity))
+
+    def _allocate(self, size):
+        self.size = size
+        self.bucket = array('q', [-1]) * size
+        self.min = array('d', [0.0]) * size
+        self.max = array('d', [0.0]) * size
+        self.sum = array('d', [0.0]) * size
+        self.last = array('d', [0.0]) * size
+        self.count = array('L', [0]) * size
+
+    def _grow(self):
+        old = (self.bucket, self.min, self.max, self.sum, self.last, self.count)
+        self._allocate(min(self.size * 2, self.capacity))
+        for j, b in enumerate(old[0]):
+            # Buckets already out of the retention could land on a fresh
+            # bucket's slot when the new size is not a multiple of the old
+            if b >= 0 and b > self.newest - self.capacity:
+                i = b % self.size
+                self.bucket[i] = b
+                self.min[i], self.max[i], self.sum[i], self.last[i], self.count[i] = (column[j] for column in old[1:])
+
+    def add(self, ts, value):
+        b = int(ts // self.resolution)
+        i = b % self.size
+        while self.size < self.capacity and self.bucket[i] not in (-1, b) and self.bucket[i] > b - self.capacity:
+            self._grow()
+            i = b % self.size
+        if self.bucket[i] != b:
+            self.bucket[i] = b
+            self.min[i] = self.max[i] = self.sum[i] = self.last[i] = value
+            self.count[i] = 1
+        else:
+            if value < self.min[i]:
+                self.min[i] = value
+            if value > self.max[i]:
+                self.max[i] = value
+            self.sum[i] += value
+            self.last[i] = value
+            self.count[i] += 1
+        if b > self.newest:
+            self.newest = b
+
+    def span(self):
+        return self.resolution * self.capacity
+
+    def query(self, start, end):
+        # Walk only the buckets inside [start, end], never raw samples
+        first = max(int(start // self.resolution), self.newest - self.capacity + 1)
+        last = min(int(end // self.resolution), self.newest)
+        points = []
+        for b in range(first, last + 1):
+            i = b % self.size
+            if self.bucket[i] == b:
+                points.append([b * self.resolution, self.min[i], self.sum[i] / self.count[i], self.max[i], self.last[i]])
+        return points
+
+
+class TimeSeries:
+    def __init__(self, levels=DEFAULT_LEVELS):
+        self.levels = [RollupRing(resolution, capacity) for resolution, capacity in levels]
+
+    def add(self, ts, value):
+        for level in self.levels:
+            level.add(ts, value)
+
+    def pick_level(self, start, end, max_points, now):
+        # Finest resolution that still reaches back to `start` and returns
+        # at most `max_points` buckets; otherwise the coarsest one.
+        for level in self.levels:
+            if start >= now - level.span() - level.resolution and (end - start) / level.resolution <= max_points:
+                return level
+        return self.levels[-1]
+
+    def query(self, start, end, max_points=500, now=None):
+        level = self.pick_level(start, end, max_points, now or time.time())
+        return level.resolution, level.query(start, end)
+
+
+# Named series behind a single lock.
+class TimeSeriesStore:
+    def __init__(self, levels=DEFAULT_LEVELS):
+        self.levels = levels
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name):
+        series = self._series.get(name)
+        if series is None:
+            series = self._series[name] = TimeSeries(self.levels)
+        return series
+
+    def record(self, name, value, ts=None):
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            self._get(name).add(ts, float(value))
+
+    def names(self):
+        with self._lock:
+            return sorted(self._series)
+
+    def query(self, name, start, end, max_points=500):
+        with self._lock:
+            series = self._series.get(name)
+            if series is None:
+                return None
+            return series.query(start, end, max_points)
+
+    def retain(self, prefix, keep):
+        # Drop series under `prefix` not named in `keep` (e.g. vanished NICs)
+        with self._lock:
+            for name in [n for n in self._series if n.startswith(prefix) and n not in keep]:
+                del self._series[name]
+
+    def drop(self, prefix):
+        with self._lock:
+            for name in [n for n in self._series if n.startswith(prefix)]:
+                del self._series[name]
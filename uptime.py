@@ -0,0 +1,253 @@
+import time
+
+# Response time histogram bounds (ms); the last slot counts anything slower.
+# p95 is interpolated inside its bucket, so it is exact to the bucket width.
+LATENCY_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 400, 500, 750, 1000, 1500, 2000, 3000, 5000,
+                   10000, 30000, 60000)
+
+# (name, hours): each window holds the current hour plus the previous ones
+WINDOWS = (('24h', 24), ('7d', 24 * 7), ('30d', 24 * 30))
+
+HOUR = 3600
+
+
+def parse_histogram(text):
+    if not text:
+        return [0] * (len(LATENCY_BUCKETS) + 1)
+    return [int(n) for n in text.split(',')]
+
+
+def format_histogram(counts):
+    return ','.join(str(n) for n in counts)
+
+
+def bucket_index(response_time):
+    for i, bound in enumerate(LATENCY_BUCKETS):
+        if response_time <= bound:
+            return i
+    return len(LATENCY_BUCKETS)
+
+
+def histogram_percentile(counts, q):
+    total = sum(counts)
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for i, n in enumerate(counts):
+        if n and seen + n >= rank:
+            if i == len(LATENCY_BUCKETS):
+                return float(LATENCY_BUCKETS[-1])
+            lower = LATENCY_BUCKETS[i - 1] if i else 0
+            return round(lower + (LATENCY_BUCKETS[i] - lower) * (rank - seen) / n, 2)
+        seen += n
+    return float(LATENCY_BUCKETS[-1])
+
+
+def add_check(row, up, response_time):
+    row.checks = (row.checks or 0) + 1
+    if up:
+        row.up = (row.up or 0) + 1
+        row.response_sum = (row.response_sum or 0.0) + response_time
+        counts = parse_histogram(row.histogram)
+        counts[bucket_index(response_time)] += 1
+        row.histogram = format_histogram(counts)
+
+
+def subtract_rollup(row, rollup):
+    row.checks = max(0, (row.checks or 0) - rollup.checks)
+    row.up = max(0, (row.up or 0) - rollup.up)
+    row.response_sum = max(0.0, (row.response_sum or 0.0) - rollup.response_sum)
+    counts = parse_histogram(row.histogram)
+    for i, n in enumerate(parse_histogram(rollup.histogram)):
+        counts[i] = max(0, counts[i] - n)
+    row.histogram = format_histogram(counts)
+
+
+def summarize(row):
+    # Works for both ServiceRollup (one hour) and ServiceUptime (one window)
+    counts = parse_histogram(row.histogram)
+    responses = sum(counts)
+    return {
+        'checks': row.checks or 0,
+        'uptime': round(100.0 * row.up / row.checks, 3) if row.checks else None,
+        'avg_response_time': round(row.response_sum / responses, 2) if responses else None,
+        'p95_response_time': histogram_percentile(counts, 0.95),
+    }
+
+
+# Check history for the service scheduler. Every sweep appends its results to
+# ServiceCheck and folds them into the hour's ServiceRollup row and into the
+# running ServiceUptime totals of each window, all in the sweep's own
+# transaction. When the hour changes, the rollups that fell out of a window
+# are subtracted from its totals, so reading uptime/mean/p95 is one row per
+# service and window no matter how many checks it covers. Raw checks older
+# than CHECK_RESULT_RETENTION_HOURS are deleted (the hourly rollups are
+# their downsampled form) and rollups go after CHECK_ROLLUP_RETENTION_DAYS.
+class UptimeTracker:
+    def __init__(self):
+        self.app = None
+        self._hour = None
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['uptime'] = self
+
+    def tick(self, now=None):
+        # Called by the scheduler at the start of each sweep; the expiry and
+        # retention passes run once per hour
+        now = time.time() if now is None else now
+        hour = int(now // HOUR * HOUR)
+        if hour != self._hour:
+            self.expire(hour)
+            self.compact(now)
+            self._hour = hour
+
+    def record(self, services, results, now=None):
+        # Called by the scheduler before it commits the sweep
+        from models import ServiceCheck, ServiceRollup, ServiceUptime
+        from extensions import db
+
+        if not services:
+            return
+        now = time.time() if now is None else now
+        hour = int(now // HOUR * HOUR)
+
+        rows = []
+        for service in services:
+            result = results[service.id]
+            up = result.status == 'Up'
+            timings = result.timings or {}
+            rows.append({
+                'service_id': service.id,
+                'timestamp': now,
+                'up': up,
+                'response_time': result.response_time if up else None,
+                'error': (result.error or '')[:255] or None,
+                'dns_time': timings.get('dns'),
+                'connect_time': timings.get('connect'),
+                'tls_time': timings.get('tls'),
+                'ttfb': timings.get('ttfb'),
+            })
+        db.session.execute(ServiceCheck.__table__.insert(), rows)
+
+        ids = [service.id for service in services]
+        rollups = {r.service_id: r for r in ServiceRollup.query.filter(ServiceRollup.service_id.in_(ids),
+                                                                       ServiceRollup.bucket == hour)}
+        windows = {(w.service_id, w.window): w for w in ServiceUptime.query.filter(ServiceUptime.service_id.in_(ids))}
+        for row in rows:
+            service_id = row['service_id']
+            rollup = rollups.get(service_id)
+            if rollup is None:
+                rollup = rollups[service_id] = ServiceRollup(service_id=service_id, bucket=hour)
+                db.session.add(rollup)
+            targets = [rollup]
+            for name, hours in WINDOWS:
+                window = windows.get((service_id, name))
+                if window is None:
+                    window = windows[(service_id, name)] = ServiceUptime(
+                        service_id=service_id, window=name, expired_through=hour - hours * HOUR)
+                    db.session.add(window)
+                targets.append(window)
+            for target in targets:
+                add_check(target, row['up'], row['response_time'])
+
+    def expire(self, hour):
+        # Subtract the hourly rollups that left each window since the last
+        # pass. Idempotent thanks to expired_through, so a new leader (or a
+        # restart after downtime) simply catches up.
+        from models import ServiceRollup, ServiceUptime
+        from extensions import db
+
+        for name, hours in WINDOWS:
+            cutoff = hour - hours * HOUR
+            windows = ServiceUptime.query.filter(ServiceUptime.window == name,
+                                                 ServiceUptime.expired_through < cutoff).all()
+            if not windows:
+                continue
+            oldest = min(w.expired_through for w in windows)
+            expired = (ServiceRollup.query
+                       .filter(ServiceRollup.service_id.in_([w.service_id for w in windows]),
+                               ServiceRollup.bucket > oldest, ServiceRollup.bucket <= cutoff)
+                       .all())
+            by_service = {}
+            for rollup in expired:
+                by_service.setdefault(rollup.service_id, []).append(rollup)
+            for window in windows:
+                for rollup in by_service.get(window.service_id, []):
+                    if rollup.bucket > window.expired_through:
+                        subtract_rollup(window, rollup)
+                window.expired_through = cutoff
+        db.session.commit()
+
+    def compact(self, now=None):
+        # Retention, in chunks so a large backlog never holds the SQLite
+        # write lock for long. Rollups are kept at least as long as the
+        # longest window, which still needs them to expire.
+        from models import ServiceCheck, ServiceRollup
+        from extensions import db
+
+        config = self.app.config
+        now = time.time() if now is None else now
+        longest = max(hours for _, hours in WINDOWS) * HOUR
+        rules = [
+            (ServiceCheck, ServiceCheck.timestamp, now - config['CHECK_RESULT_RETENTION_HOURS'] * HOUR),
+            (ServiceRollup, ServiceRollup.bucket, now - max(config['CHECK_ROLLUP_RETENTION_DAYS'] * 24 * HOUR,
+                                                            longest + 2 * HOUR)),
+        ]
+        deleted = 0
+        for model, column, cutoff in rules:
+            while True:
+                ids = [row.id for row in db.session.query(model.id).filter(column < cutoff).limit(5000)]
+                if not ids:
+                    break
+                model.query.filter(model.id.in_(ids)).delete(synchronize_session=False)
+                db.session.commit()
+                deleted += len(ids)
+        return deleted
+
+    def summaries(self, service_ids=None):
+        # {service_id: {'24h': {...}, '7d': {...}, '30d': {...}}}
+        from models import ServiceUptime
+
+        query = ServiceUptime.query
+        if service_ids is not None:
+            query = query.filter(ServiceUptime.service_id.in_(list(service_ids)))
+        result = {}
+        for window in query:
+            result.setdefault(window.service_id, {})[window.window] = summarize(window)
+        return result
+
+    def hourly(self, service_id, start, end):
+        from models import ServiceRollup
+
+        rollups = (ServiceRollup.query
+                   .filter(ServiceRollup.service_id == service_id,
+                           ServiceRollup.bucket >= start // HOUR * HOUR, ServiceRollup.bucket <= end)
+                   .order_by(ServiceRollup.bucket))
+        return [dict(summarize(rollup), timestamp=rollup.bucket) for rollup in rollups]
+
+    def checks(self, service_id, start, end, limit=500):
+        from models import ServiceCheck
+
+        checks = (ServiceCheck.query
+                  .filter(ServiceCheck.service_id == service_id,
+                          ServiceCheck.timestamp >= start, ServiceCheck.timestamp <= end)
+                  .order_by(ServiceCheck.timestamp.desc())
+                  .limit(limit))
+        return [{
+            'timestamp': check.timestamp,
+            'status': 'Up' if check.up else 'Down',
+            'response_time': check.response_time,
+            'error': check.error,
+            'timings': {'dns': check.dns_time, 'connect': check.connect_time, 'tls': check.tls_time,
+                        'ttfb': check.ttfb} if check.ttfb is not None else None,
+        } for check in checks]
+
+    def drop(self, service_id):
+        from models import ServiceCheck, ServiceRollup, ServiceUptime
+        from extensions import db
+
+        for model in (ServiceCheck, ServiceRollup, ServiceUptime):
+            model.query.filter(model.service_id == service_id).delete(synchronize_session=False)
+        db.session.commit()
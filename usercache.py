@@ -0,0 +1,82 @@
+import threading
+import time
+
+from flask_login import UserMixin
+
+SETTINGS_FIELDS = ('theme', 'show_public_ip', 'telegram_bot_token', 'telegram_chat_id', 'whatsapp_phone',
+                   'whatsapp_apikey', 'notifications_enabled')
+
+
+# Read-only copies of a User row and its AppSettings, detached from any
+# session so one instance can be shared by every request thread
+class CachedSettings:
+    def __init__(self, settings):
+        self.id = settings.id
+        self.user_id = settings.user_id
+        for field in SETTINGS_FIELDS:
+            setattr(self, field, getattr(settings, field))
+
+
+class CachedUser(UserMixin):
+    def __init__(self, user, settings):
+        self.id = user.id
+        self.username = user.username
+        self.settings = CachedSettings(settings) if settings is not None else None
+
+
+# Flask-Login's user_loader runs on every authenticated request. Snapshots
+# are kept per user id for USER_CACHE_TTL seconds, so polling endpoints do
+# not touch the database to identify the caller. Writers invalidate the
+# entry after committing (update_settings, first visit creating the
+# AppSettings row); in cluster mode the other workers drop their copies too.
+class UserCache:
+    def __init__(self):
+        self.app = None
+        self.ttl = 60.0
+        self._entries = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['user_cache'] = self
+        self.ttl = app.config['USER_CACHE_TTL']
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            generation = self._generation
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        from models import User, AppSettings
+        from extensions import db
+
+        row = (db.session.query(User, AppSettings)
+               .outerjoin(AppSettings, AppSettings.user_id == User.id)
+               .filter(User.id == user_id)
+               .first())
+        if row is None:
+            return None
+        snapshot = CachedUser(*row)
+        with self._lock:
+            # Skip caching if an invalidation raced with this read
+            if generation == self._generation:
+                if len(self._entries) >= 10000:
+                    self._entries.clear()
+                self._entries[user_id] = (now + self.ttl, snapshot)
+        return snapshot
+
+    def invalidate(self, user_id):
+        from extensions import cluster
+
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(user_id, None)
+        cluster.share_event('users', {'user_id': user_id})
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
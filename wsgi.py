@@ -0,0 +1,9 @@
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+# Several workers share one elected collector/scheduler (see cluster.py)
+import os
+
+os.environ.setdefault('NETDASH_CLUSTER', '1')
+
+from app import create_app  # noqa: E402
+
+app = create_app()